@@ -1,46 +1,56 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+import math
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from pydantic import ValidationError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.settings import settings
 from app.database import get_db
 from app.database.models.user import User
-from app.database.schema.user import TokenPayload
+from app.database.models.wallet_pass import WalletPass
+from app.database.tenancy import set_tenant
+from app.services.rate_limit import RateLimitExceeded, tenant_rate_limiter
+from app.services.tokens import TokenError, decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+class TokenUser:
     """
-    Get the current authenticated user.
-    
-    Args:
-        db: Database session dependency
-        token: JWT token from OAuth2 scheme
-        
-    Returns:
-        User: Current authenticated user
-        
-    Raises:
-        HTTPException: If authentication fails
+    The user an access token was issued to, as described by its claims.
+
+    Has the `id`, `organization_id` and `is_superuser` attributes most
+    routes check, without loading the user.
     """
+
+    __slots__ = ("id", "organization_id", "is_superuser")
+
+    def __init__(self, id: str, organization_id: Optional[str], is_superuser: bool):
+        self.id = id
+        self.organization_id = organization_id
+        self.is_superuser = is_superuser
+
+
+def _access_token_claims(token: str) -> Dict[str, Any]:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=["HS256"]
-        )
-        token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
+        claims = decode_token(token)
+    except TokenError:
+        claims = {}
+    # Refresh and scanner tokens are signed with the same key
+    if not isinstance(claims.get("sub"), str) or claims.get("refresh") or claims.get("scope"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = await User.get_by_id(db, token_data.sub)
+    return claims
+
+
+async def _load_user(db: AsyncSession, claims: Dict[str, Any]) -> User:
+    user = await User.get_by_id(db, claims["sub"])
     
     if not user:
         raise HTTPException(
@@ -50,10 +60,79 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
+    # Revoked by a password or permission change since it was issued
+    if claims.get("ver", 0) != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Queries on the request's session only see the user's organization
+    if not user.is_superuser:
+        set_tenant(db, user.organization_id)
         
     return user
 
 
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """
+    Get the current authenticated user.
+    
+    Scopes the request's database session to the user's organization (see
+    `app.database.tenancy`); superusers stay unscoped. Tokens revoked by a
+    newer token version are rejected.
+    
+    Args:
+        db: Database session dependency
+        token: JWT token from OAuth2 scheme
+        
+    Returns:
+        User: Current authenticated user
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    return await _load_user(db, _access_token_claims(token))
+
+
+async def get_token_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> TokenUser:
+    """
+    Get the current authenticated user from the access token alone.
+    
+    For routes that only check the user's id, organization or superuser
+    flag. The token's `org` and `su` claims are trusted until it expires
+    (ACCESS_TOKEN_EXPIRE_MINUTES): a deactivated or demoted user keeps
+    access that long, while refreshing fails at once. Tokens without these
+    claims (issued before them, or to users without an organization) fall
+    back to loading the user.
+    
+    Args:
+        db: Database session dependency
+        token: JWT token from OAuth2 scheme
+        
+    Returns:
+        TokenUser: Current authenticated user
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    claims = _access_token_claims(token)
+    su = claims.get("su")
+    if "ver" not in claims or (not su and not claims.get("org")):
+        user = await _load_user(db, claims)
+        return TokenUser(user.id, user.organization_id, bool(user.is_superuser))
+    
+    # Queries on the request's session only see the user's organization
+    if not su:
+        set_tenant(db, claims["org"])
+    return TokenUser(claims["sub"], claims.get("org"), bool(su))
+
+
 async def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -74,4 +153,129 @@ async def get_current_active_superuser(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+async def get_authenticated_pass(
+    pass_type_identifier: str,
+    serial_number: str,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+) -> WalletPass:
+    """
+    Get the wallet pass a device is acting for.
+    
+    Devices authenticate with the pass' own token, sent as
+    `Authorization: ApplePass <authenticationToken>`.
+    
+    Args:
+        pass_type_identifier: Pass type identifier from the path
+        serial_number: Pass serial number from the path
+        authorization: Authorization header
+        db: Database session dependency
+        
+    Returns:
+        WalletPass: The authenticated pass
+        
+    Raises:
+        HTTPException: If the pass does not exist or the token does not match
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    db_pass = (
+        await db.execute(
+            select(WalletPass).filter_by(
+                serial_number=serial_number, pass_type_identifier=pass_type_identifier
+            )
+        )
+    ).scalar()
+    if (
+        db_pass is None
+        or scheme != "ApplePass"
+        or not hmac.compare_digest(token.encode(), db_pass.authentication_token.encode())
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid pass authentication token",
+        )
+    return db_pass
+
+
+async def get_scanner_organization(
+    template_id: str,
+    authorization: Optional[str] = Header(None),
+) -> str:
+    """
+    Get the organization a door scanner is scanning for.
+    
+    Scanners authenticate with the token returned when a template is opened
+    for scanning, sent as `Authorization: Bearer <token>`. The token is
+    verified from its signature alone, so validating a scan needs no user
+    or session lookup.
+    
+    Args:
+        template_id: Template being scanned, from the path
+        authorization: Authorization header
+        
+    Returns:
+        str: Id of the organization that opened the template
+        
+    Raises:
+        HTTPException: If the token is invalid, expired or for another template
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    try:
+        payload = decode_token(token)
+    except TokenError:
+        payload = {}
+    if (
+        scheme.lower() != "bearer"
+        or payload.get("scope") != "scan"
+        or payload.get("sub") != template_id
+        or not payload.get("org")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid scanner token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload["org"]
+
+
+def rate_limited(limit_class: str):
+    """
+    Build a dependency enforcing per-organization limits on a class of endpoints.
+    
+    Each organization gets a token bucket and a cap on requests in flight,
+    scaled by its subscription tier. Requests over either limit are rejected
+    immediately with 429 and a Retry-After header rather than queued.
+    
+    Args:
+        limit_class: Key of `LIMIT_CLASSES` ("write" or "bulk")
+        
+    Returns:
+        Callable: A dependency for the route's `dependencies` list
+    """
+    async def dependency(
+        current_user: TokenUser = Depends(get_token_user),
+        db: AsyncSession = Depends(get_db),
+    ):
+        organization_id = current_user.organization_id
+        if not settings.RATE_LIMIT_ENABLED or current_user.is_superuser or not organization_id:
+            yield
+            return
+        
+        tier = await tenant_rate_limiter.get_tier(db, organization_id)
+        try:
+            lease = await tenant_rate_limiter.acquire(organization_id, tier, limit_class)
+        except RateLimitExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Too many requests: {e.reason} limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+        try:
+            yield
+        finally:
+            await tenant_rate_limiter.release(organization_id, limit_class, lease)
+    
+    return dependency
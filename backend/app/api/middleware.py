@@ -0,0 +1,229 @@
+import asyncio
+import time
+from typing import Tuple
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import replace_params
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database.instrumentation import (
+    QueryStats,
+    reset_query_stats,
+    start_query_stats,
+)
+from app.services.loop_monitor import active_requests
+from app.services.metrics import (
+    http_request_duration,
+    http_requests_in_flight,
+    registry,
+)
+
+
+# Requests that did not match any route are grouped under a single label to
+# keep metric cardinality bounded (e.g. scanners probing random URLs).
+UNMATCHED_ROUTE = "<unmatched>"
+# Scope key caching the route template once the request was routed
+ROUTE_TEMPLATE_KEY = "app.route_template"
+
+db_statements_per_request = registry.histogram(
+    "db_statements_per_request",
+    "Number of SQL statements executed per request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds",
+    "Total time spent executing SQL statements per request.",
+    ["route"],
+)
+db_rows_returned_total = registry.counter(
+    "db_rows_returned_total",
+    "Rows returned or affected by SQL statements.",
+    ["route"],
+)
+
+
+# Allowance for the multipart boundaries and part headers around an uploaded file
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+def route_template(scope: Scope) -> str:
+    """Return the path template of the route that handled the request (e.g. `/api/v1/passes/{pass_id}`)."""
+    template = scope.get(ROUTE_TEMPLATE_KEY)
+    if template is not None:
+        return template
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if not path:
+        return UNMATCHED_ROUTE
+
+    # A route of an included router only knows its own path (`/{pass_id}`):
+    # the part of the request path before the route's match is the prefix
+    template = path
+    path_format = getattr(route, "path_format", None)
+    convertors = getattr(route, "param_convertors", None)
+    if path_format is not None and convertors is not None:
+        try:
+            matched, _ = replace_params(path_format, convertors, dict(scope.get("path_params") or {}))
+        except (AssertionError, KeyError, TypeError, ValueError):
+            matched = None
+        request_path = scope.get("path", "")
+        if matched and request_path.endswith(matched):
+            template = request_path[: len(request_path) - len(matched)] + path
+    scope[ROUTE_TEMPLATE_KEY] = template
+    return template
+
+
+def _server_timing(stats: QueryStats) -> bytes:
+    parts = [
+        f'db;dur={stats.total_time * 1000:.2f};desc="{stats.statement_count} queries, {stats.rows} rows"'
+    ]
+    if stats.slowest_statement is not None:
+        parts.append(
+            f'db-slowest;dur={stats.slowest_time * 1000:.2f};desc="{stats.slowest_fingerprint}"'
+        )
+    return ", ".join(parts).encode("latin-1")
+
+
+class QueryStatsMiddleware:
+    """
+    Collect per-request database statistics.
+
+    Statement count, DB time and rows returned are recorded as Prometheus
+    metrics per route template. When `server_timing` is enabled (development),
+    they are also exposed on the response as `Server-Timing` and `X-DB-*`
+    headers so N+1 patterns are visible from the browser devtools.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_query_stats(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if self.server_timing and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stats)))
+                headers.append((b"x-db-query-count", str(stats.statement_count).encode()))
+                headers.append((b"x-db-rows", str(stats.rows).encode()))
+                if stats.slowest_statement is not None:
+                    headers.append((b"x-db-slowest-query", stats.slowest_fingerprint.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_query_stats(token)
+            route = route_template(scope)
+            db_statements_per_request.observe(stats.statement_count, route)
+            db_time_per_request.observe(stats.total_time, route)
+            if stats.rows:
+                db_rows_returned_total.inc(stats.rows, route)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record request latency by route template and the number of in-flight requests.
+
+    Implemented as a pure ASGI middleware: per request it costs two
+    `perf_counter` calls, a gauge update and one histogram observation.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route_template(scope),
+                str(status_code),
+            )
+
+
+class BlockingCallAttributionMiddleware:
+    """Remember which request each task is serving so the loop watchdog can name the route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        active_requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            active_requests.pop(task, None)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Cap the request body of upload routes before it is parsed.
+
+    Starlette spools a multipart body to temporary files before the route
+    runs, so a size check in the route only happens after the whole body was
+    received. This middleware answers 413 at once when `Content-Length` is
+    over the cap, and stops reading a chunked body as soon as it passes it.
+    nginx enforces the same cap (`client_max_body_size`) in production.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_suffixes: Tuple[str, ...]):
+        self.app = app
+        self.max_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+        self.path_suffixes = path_suffixes
+        self.detail = f"Upload exceeds the maximum size of {max_bytes} bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].endswith(self.path_suffixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                response = JSONResponse({"detail": self.detail}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                # FastAPI re-raises HTTPExceptions from body parsing as responses
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self.detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
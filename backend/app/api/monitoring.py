@@ -0,0 +1,99 @@
+import asyncio
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.services.metrics import registry
+from app.services.redis import get_redis
+
+router = APIRouter()
+
+VERSION = "0.1.0"
+
+db_pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Database connection pool statistics by state.",
+    ["state"],
+    callback=lambda: {(state,): value for state, value in sessionmanager.pool_status().items()},
+)
+db_compiled_cache = registry.gauge(
+    "db_compiled_cache",
+    "Compiled statement cache usage (entries, capacity); hits and misses are in cache_requests_total.",
+    ["stat"],
+    callback=lambda: {(stat,): value for stat, value in sessionmanager.compiled_cache_status().items()},
+)
+
+
+async def _check_database() -> None:
+    async with sessionmanager.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def _check_redis() -> None:
+    await get_redis().ping()
+
+
+async def _run_check(check) -> str:
+    try:
+        await asyncio.wait_for(check(), timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception as e:
+        return f"error: {e.__class__.__name__}"
+    return "ok"
+
+
+@router.get("/health/live")
+async def liveness() -> Dict[str, Any]:
+    """
+    Liveness probe: the process is up and the event loop is responsive.
+
+    Deliberately touches no dependencies, so a database outage does not cause
+    the orchestrator to restart healthy API workers.
+    """
+    return {"status": "alive", "version": VERSION}
+
+
+@router.get("/health/ready")
+async def readiness() -> Response:
+    """
+    Readiness probe: the database and Redis are reachable within the configured timeout.
+    """
+    database, redis = await asyncio.gather(
+        _run_check(_check_database), _run_check(_check_redis)
+    )
+    checks = {"database": database, "redis": redis}
+    ready = all(result == "ok" for result in checks.values())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "unavailable",
+            "checks": checks,
+            "version": VERSION,
+        },
+    )
+
+
+@router.get("/health")
+async def health() -> Response:
+    """
+    Backwards compatible health check (same as the readiness probe).
+    """
+    return await readiness()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Expose metrics in the Prometheus text exposition format.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,117 @@
+from typing import Any, List, Optional
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import TokenUser, get_token_user, rate_limited
+from app.database import get_db
+from app.database.models.analytics import CampaignDailyStats
+from app.database.models.campaign import Campaign
+from app.settings import settings
+from app.services.analytics import event_row, insert_events
+from app.database.schema.analytics import (
+    AnalyticsEventBatch,
+    CampaignDailyStats as CampaignDailyStatsSchema,
+)
+
+router = APIRouter()
+
+
+@router.post(
+    "/events",
+    response_model=dict,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(rate_limited("write"))],
+)
+async def ingest_events(
+    batch_in: AnalyticsEventBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Record a batch of analytics events.
+    
+    Events are appended as-is and counted into campaign stats by the next
+    rollup, so they show up in dashboards within a rollup interval.
+    """
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must be part of an organization",
+        )
+    
+    if len(batch_in.events) > settings.MAX_ANALYTICS_INGEST_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.MAX_ANALYTICS_INGEST_EVENTS} events",
+        )
+    
+    # Events may only be counted towards the organization's own campaigns
+    campaign_ids = {event.campaign_id for event in batch_in.events if event.campaign_id}
+    if campaign_ids:
+        owned = set(
+            (
+                await db.execute(
+                    select(Campaign.id).where(
+                        Campaign.id.in_(campaign_ids),
+                        Campaign.organization_id == current_user.organization_id,
+                    )
+                )
+            ).scalars()
+        )
+        if owned != campaign_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Campaign not found or not accessible",
+            )
+    
+    rows = [
+        event_row(
+            event.event_type.value,
+            current_user.organization_id,
+            campaign_id=event.campaign_id,
+            wallet_pass_id=event.wallet_pass_id,
+            customer_id=event.customer_id,
+            occurred_at=event.occurred_at,
+            data=event.data,
+        )
+        for event in batch_in.events
+    ]
+    accepted = await insert_events(db, rows)
+    return {"accepted": accepted}
+
+
+@router.get("/campaigns/{campaign_id}/daily", response_model=List[CampaignDailyStatsSchema])
+async def read_campaign_daily_stats(
+    campaign_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get a campaign's event counts per day, from the rolled-up stats.
+    """
+    campaign = await Campaign.get_by_id(db, campaign_id)
+    if not campaign:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campaign not found",
+        )
+    
+    # Check if user has access to this campaign
+    if campaign.organization_id != current_user.organization_id and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    
+    query = select(CampaignDailyStats).where(CampaignDailyStats.campaign_id == campaign_id)
+    if start_date:
+        query = query.where(CampaignDailyStats.day >= start_date)
+    if end_date:
+        query = query.where(CampaignDailyStats.day <= end_date)
+    result = await db.execute(query.order_by(CampaignDailyStats.day))
+    return result.scalars().all()
@@ -1,54 +1,70 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from passlib.context import CryptContext
 
 from app.settings import settings
 from app.database import get_db
 from app.database.models.user import User
 from app.database.schema.user import Token, RefreshToken, UserCreate, User as UserSchema
+from app.services.tokens import TokenError, decode_token, encode_token
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def password_context():
+    """Create the password hashing context (passlib and bcrypt load on first use)."""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
-    return pwd_context.hash(password)
+    return password_context().hash(password)
+
 
+def create_access_token(user: User, expires_delta: timedelta = None) -> str:
+    """
+    Create JWT access token.
 
-def create_access_token(subject: str, expires_delta: timedelta = None) -> str:
-    """Create JWT access token."""
+    Besides the user id (`sub`) it carries the organization (`org`), the
+    superuser flag (`su`) and the user's token version (`ver`), so most
+    requests are authorized from the token alone.
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": subject}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+    to_encode = {
+        "exp": expire,
+        "sub": user.id,
+        "org": user.organization_id,
+        "su": bool(user.is_superuser),
+        "ver": user.token_version or 0,
+    }
+    return encode_token(to_encode)
 
 
-def create_refresh_token(subject: str, expires_delta: timedelta = None) -> str:
+def create_refresh_token(user: User, expires_delta: timedelta = None) -> str:
     """Create JWT refresh token."""
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode = {"exp": expire, "sub": subject, "refresh": True}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+    to_encode = {"exp": expire, "sub": user.id, "ver": user.token_version or 0, "refresh": True}
+    return encode_token(to_encode)
 
 
 @router.post("/login", response_model=Token)
@@ -59,7 +75,10 @@ async def login_access_token(
     OAuth2 compatible token login, get an access token for future requests.
     """
     user = await User.get(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not user or not await run_in_threadpool(
+        verify_password, form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -74,9 +93,9 @@ async def login_access_token(
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
     return {
-        "access_token": create_access_token(user.id, expires_delta=access_token_expires),
+        "access_token": create_access_token(user, expires_delta=access_token_expires),
         "token_type": "bearer",
-        "refresh_token": create_refresh_token(user.id, expires_delta=refresh_token_expires),
+        "refresh_token": create_refresh_token(user, expires_delta=refresh_token_expires),
     }
 
 
@@ -88,9 +107,7 @@ async def refresh_token(
     Refresh access token.
     """
     try:
-        payload = jwt.decode(
-            refresh_token.refresh_token, settings.SECRET_KEY, algorithms=["HS256"]
-        )
+        payload = decode_token(refresh_token.refresh_token)
         
         # Check if it's a refresh token
         if "refresh" not in payload or not payload["refresh"]:
@@ -101,7 +118,7 @@ async def refresh_token(
             )
             
         token_data = {"sub": payload["sub"]}
-    except jwt.JWTError:
+    except TokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -118,14 +135,21 @@ async def refresh_token(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
+    # Revoked by a password or permission change since it was issued
+    if payload.get("ver", 0) != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
         
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
     return {
-        "access_token": create_access_token(user.id, expires_delta=access_token_expires),
+        "access_token": create_access_token(user, expires_delta=access_token_expires),
         "token_type": "bearer",
-        "refresh_token": create_refresh_token(user.id, expires_delta=refresh_token_expires),
+        "refresh_token": create_refresh_token(user, expires_delta=refresh_token_expires),
     }
 
 
@@ -145,7 +169,7 @@ async def register_user(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user_in.password)
     user_data = user_in.model_dump(exclude={"password"})
     user_data["hashed_password"] = hashed_password
     
@@ -3,13 +3,14 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import TokenUser, get_token_user, rate_limited
 from app.database import get_db
 from app.database.models.campaign import Campaign
 from app.database.models.customer import Customer
 from app.database.models.location import Location
 from app.database.models.wallet_pass_template import WalletPassTemplate
-from app.database.models.user import User
+from app.services.metrics import campaign_executions_total
+from app.services.quotas import QuotaExceeded, counts_as_campaign, release, reserve
 from app.database.schema.campaign import (
     Campaign as CampaignSchema,
     CampaignCreate,
@@ -28,7 +29,7 @@ async def read_campaigns(
     limit: int = 100,
     status: Optional[str] = None,
     campaign_type: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve campaigns.
@@ -49,11 +50,11 @@ async def read_campaigns(
     return campaigns
 
 
-@router.post("/", response_model=CampaignSchema)
+@router.post("/", response_model=CampaignSchema, dependencies=[Depends(rate_limited("write"))])
 async def create_campaign(
     campaign_in: CampaignCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Create new campaign.
@@ -87,6 +88,14 @@ async def create_campaign(
     campaign_data["organization_id"] = current_user.organization_id
     campaign_data["created_by_id"] = current_user.id
     
+    if counts_as_campaign(campaign_data.get("status")):
+        try:
+            await reserve(db, current_user.organization_id, "campaigns")
+        except QuotaExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e),
+            )
     campaign = await Campaign.create(db, **campaign_data)
     return campaign
 
@@ -95,7 +104,7 @@ async def create_campaign(
 async def read_campaign(
     campaign_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific campaign by id.
@@ -124,12 +133,16 @@ async def read_campaign(
     return campaign_dict
 
 
-@router.put("/{campaign_id}", response_model=CampaignSchema)
+@router.put(
+    "/{campaign_id}",
+    response_model=CampaignSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def update_campaign(
     campaign_id: str,
     campaign_in: CampaignUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update a campaign.
@@ -166,17 +179,34 @@ async def update_campaign(
                 detail="Template not found or not accessible",
             )
     
-    campaign = await campaign.update(
-        db, **campaign_in.model_dump(exclude_unset=True)
-    )
+    update_data = campaign_in.model_dump(exclude_unset=True)
+    if "status" in update_data:
+        was_counted = counts_as_campaign(campaign.status)
+        now_counted = counts_as_campaign(update_data["status"])
+        if was_counted and not now_counted:
+            await release(db, campaign.organization_id, "campaigns")
+        elif now_counted and not was_counted:
+            try:
+                await reserve(db, campaign.organization_id, "campaigns")
+            except QuotaExceeded as e:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=str(e),
+                )
+    
+    campaign = await campaign.update(db, **update_data)
     return campaign
 
 
-@router.delete("/{campaign_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{campaign_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def delete_campaign(
     campaign_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> None:
     """
     Delete a campaign.
@@ -196,15 +226,21 @@ async def delete_campaign(
         )
     
     # Update status instead of deleting
+    if counts_as_campaign(campaign.status):
+        await release(db, campaign.organization_id, "campaigns")
     await campaign.update(db, status="cancelled", is_active=False)
 
 
-@router.post("/{campaign_id}/execute", response_model=dict)
+@router.post(
+    "/{campaign_id}/execute",
+    response_model=dict,
+    dependencies=[Depends(rate_limited("bulk"))],
+)
 async def execute_campaign(
     campaign_id: str,
     execution: CampaignExecute,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Execute a campaign to send passes to customers.
@@ -240,6 +276,8 @@ async def execute_campaign(
     if not execution.test_mode:
         await campaign.update(db, status="active", is_active=True)
     
+    campaign_executions_total.inc(1, "test" if execution.test_mode else "live")
+    
     return {
         "message": "Campaign execution started",
         "test_mode": execution.test_mode,
@@ -248,12 +286,16 @@ async def execute_campaign(
     }
 
 
-@router.post("/{campaign_id}/add-customers", response_model=dict)
+@router.post(
+    "/{campaign_id}/add-customers",
+    response_model=dict,
+    dependencies=[Depends(rate_limited("bulk"))],
+)
 async def add_customers_to_campaign(
     campaign_id: str,
     customer_ids: List[str],
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Add specific customers to a campaign.
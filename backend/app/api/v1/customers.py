@@ -3,10 +3,10 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import TokenUser, get_token_user, rate_limited
 from app.database import get_db
 from app.database.models.customer import Customer
-from app.database.models.user import User
+from app.services.quotas import QuotaExceeded, release, reserve
 from app.database.schema.customer import (
     Customer as CustomerSchema,
     CustomerCreate,
@@ -24,7 +24,7 @@ async def read_customers(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve customers.
@@ -41,11 +41,11 @@ async def read_customers(
     return customers
 
 
-@router.post("/", response_model=CustomerSchema)
+@router.post("/", response_model=CustomerSchema, dependencies=[Depends(rate_limited("write"))])
 async def create_customer(
     customer_in: CustomerCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Create new customer.
@@ -70,15 +70,26 @@ async def create_customer(
     customer_data = customer_in.model_dump()
     customer_data["organization_id"] = current_user.organization_id
     
+    try:
+        await reserve(db, current_user.organization_id, "customers")
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e),
+        )
     customer = await Customer.create(db, **customer_data)
     return customer
 
 
-@router.post("/import", response_model=List[CustomerSchema])
+@router.post(
+    "/import",
+    response_model=List[CustomerSchema],
+    dependencies=[Depends(rate_limited("bulk"))],
+)
 async def import_customers(
     customers_in: CustomerImport,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Import multiple customers.
@@ -102,6 +113,13 @@ async def import_customers(
         customer_dict = customer_data.model_dump()
         customer_dict["organization_id"] = current_user.organization_id
         
+        try:
+            await reserve(db, current_user.organization_id, "customers")
+        except QuotaExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=str(e),
+            )
         customer = await Customer.create(db, **customer_dict)
         imported_customers.append(customer)
     
@@ -112,7 +130,7 @@ async def import_customers(
 async def read_customer(
     customer_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific customer by id.
@@ -142,12 +160,16 @@ async def read_customer(
     return customer_dict
 
 
-@router.put("/{customer_id}", response_model=CustomerSchema)
+@router.put(
+    "/{customer_id}",
+    response_model=CustomerSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def update_customer(
     customer_id: str,
     customer_in: CustomerUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update a customer.
@@ -172,11 +194,15 @@ async def update_customer(
     return customer
 
 
-@router.delete("/{customer_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{customer_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def delete_customer(
     customer_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> None:
     """
     Delete a customer.
@@ -195,14 +221,16 @@ async def delete_customer(
             detail="Not enough permissions",
         )
     
-    await customer.delete(db)
+    # Soft delete: passes and campaign links still reference the customer
+    await release(db, customer.organization_id, "customers")
+    await customer.soft_delete(db)
 
 
-@router.post("/upload-csv", response_model=dict)
+@router.post("/upload-csv", response_model=dict, dependencies=[Depends(rate_limited("bulk"))])
 async def upload_customers_csv(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Upload a CSV file with customer data.
@@ -0,0 +1,28 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.dependencies import TokenUser, get_token_user
+from app.database.schema.job import Job as JobSchema
+from app.services.jobs import get_job
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def read_job(
+    job_id: str,
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get the status, progress and result of a background job.
+    """
+    job = await get_job(job_id)
+    if not job or (
+        job.organization_id != current_user.organization_id and not current_user.is_superuser
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job.to_dict()
@@ -3,10 +3,9 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import TokenUser, get_token_user, rate_limited
 from app.database import get_db
 from app.database.models.location import Location
-from app.database.models.user import User
 from app.database.schema.location import (
     Location as LocationSchema,
     LocationCreate,
@@ -21,7 +20,7 @@ async def read_locations(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve locations.
@@ -36,11 +35,11 @@ async def read_locations(
     return locations
 
 
-@router.post("/", response_model=LocationSchema)
+@router.post("/", response_model=LocationSchema, dependencies=[Depends(rate_limited("write"))])
 async def create_location(
     location_in: LocationCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Create new location.
@@ -63,7 +62,7 @@ async def create_location(
 async def read_location(
     location_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific location by id.
@@ -85,12 +84,16 @@ async def read_location(
     return location
 
 
-@router.put("/{location_id}", response_model=LocationSchema)
+@router.put(
+    "/{location_id}",
+    response_model=LocationSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def update_location(
     location_id: str,
     location_in: LocationUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update a location.
@@ -115,11 +118,15 @@ async def update_location(
     return location
 
 
-@router.delete("/{location_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{location_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def delete_location(
     location_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> None:
     """
     Delete a location.
@@ -147,7 +154,7 @@ async def delete_location(
             detail="Cannot delete location that is used by campaigns",
         )
     
-    await location.delete(db)
+    await location.soft_delete(db)
 
 
 @router.get("/nearby/{latitude}/{longitude}", response_model=List[LocationSchema])
@@ -156,7 +163,7 @@ async def find_nearby_locations(
     longitude: float,
     radius: Optional[float] = 1000.0,  # 1km default radius
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Find locations near the specified coordinates.
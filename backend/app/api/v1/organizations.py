@@ -3,7 +3,7 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user, get_current_active_superuser
+from app.api.dependencies import TokenUser, get_current_active_superuser, get_current_user, get_token_user
 from app.database import get_db
 from app.database.models.organisation import Organization
 from app.database.models.user import User
@@ -12,6 +12,8 @@ from app.database.schema.organisation import (
     OrganizationCreate,
     OrganizationUpdate,
 )
+from app.database.schema.stats import OrganizationStats
+from app.services.stats import get_organization_stats
 
 router = APIRouter()
 
@@ -21,7 +23,7 @@ async def read_organizations(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve organizations.
@@ -74,7 +76,7 @@ async def create_organization(
 @router.get("/my-organization", response_model=OrganizationSchema)
 async def read_my_organization(
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get current user's organization.
@@ -99,7 +101,7 @@ async def read_my_organization(
 async def read_organization(
     organization_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific organization by id.
@@ -121,12 +123,50 @@ async def read_organization(
     return organization
 
 
+@router.get("/{organization_id}/stats", response_model=OrganizationStats)
+async def read_organization_stats(
+    organization_id: str,
+    hours: int = 48,
+    days: int = 30,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get dashboard statistics: usage totals, hourly and daily event counts
+    and the best performing campaigns.
+    
+    Served from pre-aggregated counters and rollups, refreshed every rollup
+    interval and cached for a few seconds.
+    """
+    # Normal users can only access their own organization
+    if not current_user.is_superuser and current_user.organization_id != organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    
+    if not 1 <= hours <= 168 or not 1 <= days <= 90:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="hours must be between 1 and 168 and days between 1 and 90",
+        )
+    
+    organization = await Organization.get_by_id(db, organization_id)
+    if not organization:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found",
+        )
+    
+    return await get_organization_stats(db, organization_id, hours=hours, days=days)
+
+
 @router.put("/{organization_id}", response_model=OrganizationSchema)
 async def update_organization(
     organization_id: str,
     organization_in: OrganizationUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update an organization.
@@ -9,6 +9,10 @@ from . import (
     customers,
     campaigns,
     locations,
+    wallet_devices,
+    jobs,
+    analytics,
+    scans,
 )
 
 api_router = APIRouter()
@@ -39,4 +43,16 @@ api_router.include_router(customers.router, prefix="/customers", tags=["customer
 api_router.include_router(campaigns.router, prefix="/campaigns", tags=["campaigns"])
 
 # Location management
-api_router.include_router(locations.router, prefix="/locations", tags=["locations"])
\ No newline at end of file
+api_router.include_router(locations.router, prefix="/locations", tags=["locations"])
+
+# Apple Wallet device registrations (pass web service)
+api_router.include_router(wallet_devices.router, prefix="/devices", tags=["wallet devices"])
+
+# Background job status
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
+# Campaign analytics
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+
+# Door scanning
+api_router.include_router(scans.router, prefix="/scans", tags=["scans"])
\ No newline at end of file
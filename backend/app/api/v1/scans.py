@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import TokenUser, get_scanner_organization, get_token_user, rate_limited
+from app.database import get_db
+from app.database.models.wallet_pass_template import WalletPassTemplate
+from app.settings import settings
+from app.services import redemption
+from app.services.scans import scan_validator
+from app.services.snapshots import get_delta, get_snapshot, sign_snapshot
+from app.services.tokens import encode_token
+from app.utils import UUIDStr
+from app.database.schema.scan import ScanResult, ScanSession, ScanSnapshotDelta, ScanValidate
+from app.database.schema.wallet_pass import WalletPassBatchRedeem, WalletPassBatchRedeemResult
+
+router = APIRouter()
+
+
+def create_scanner_token(template_id: str, organization_id: str, expire: datetime) -> str:
+    """Create a JWT scanner token for one template."""
+    to_encode = {"exp": expire, "sub": template_id, "org": organization_id, "scope": "scan"}
+    return encode_token(to_encode)
+
+
+async def _get_own_template(db: AsyncSession, template_id: str, current_user: TokenUser) -> WalletPassTemplate:
+    template = await WalletPassTemplate.get_by_id(db, template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found",
+        )
+
+    # Scanner tokens act for the template's organization, so only its members can open it
+    if template.organization_id != current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return template
+
+
+@router.post(
+    "/{template_id}/open",
+    response_model=ScanSession,
+    dependencies=[Depends(rate_limited("bulk"))],
+)
+async def open_scanning(
+    template_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Open a template (event) for door scanning.
+
+    Loads the serial numbers of its redeemable passes into the scan cache
+    and returns a token for the scanners. Opening it again reloads the
+    cache and issues a new token; earlier tokens stay valid until they expire.
+    """
+    template = await _get_own_template(db, template_id, current_user)
+
+    preloaded = await scan_validator.open(db, template.id)
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.SCAN_TOKEN_EXPIRE_MINUTES)
+    return {
+        "template_id": template.id,
+        "scanner_token": create_scanner_token(template.id, template.organization_id, expires_at),
+        "expires_at": expires_at,
+        "preloaded": preloaded,
+    }
+
+
+@router.post("/{template_id}/close", status_code=status.HTTP_204_NO_CONTENT)
+async def close_scanning(
+    template_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> None:
+    """
+    Drop a template's scan cache. Scans keep working against the database
+    until the scanner tokens expire.
+    """
+    template = await _get_own_template(db, template_id, current_user)
+    await scan_validator.close(template.id)
+
+
+@router.post("/{template_id}/validate", response_model=ScanResult)
+async def validate_scan(
+    template_id: str,
+    scan_in: ScanValidate,
+    organization_id: str = Depends(get_scanner_organization),
+) -> Any:
+    """
+    Validate and redeem a scanned pass.
+
+    Authenticated with a scanner token and answered from the scan cache when
+    the template is open, without touching the database; the redemption is
+    written shortly after. Every scan gets a result; `valid` tells the
+    scanner whether to let the holder in.
+    """
+    result = await scan_validator.validate(
+        organization_id, template_id, scan_in.serial_number, scan_in.scanned_at
+    )
+    return {**result, "valid": result["status"] == redemption.REDEEMED}
+
+
+@router.get("/{template_id}/snapshot", response_class=Response)
+async def read_scan_snapshot(
+    template_id: str,
+    request: Request,
+    campaign_id: Optional[UUIDStr] = None,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    organization_id: str = Depends(get_scanner_organization),
+) -> Any:
+    """
+    Download the passes a scanner may accept, for validating offline.
+    
+    The body is a sorted array of 64-bit serial hashes with expiry times
+    (see `app.services.snapshots`). `X-Snapshot-Tag` is the tag to fetch
+    deltas from, and `X-Snapshot-Signature` an HMAC-SHA256 of the body keyed
+    with the scanner token, which scanners check before trusting a stored
+    snapshot.
+    """
+    snapshot = await get_snapshot(db, template_id, campaign_id)
+    
+    headers = {
+        "ETag": f'"{snapshot["tag"] or 0}-{snapshot["count"]}"',
+        "Cache-Control": "private, no-cache",
+        "X-Snapshot-Tag": snapshot["tag"],
+        "X-Snapshot-Count": str(snapshot["count"]),
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    token = authorization.partition(" ")[2]
+    headers["X-Snapshot-Signature"] = await run_in_threadpool(sign_snapshot, snapshot["body"], token)
+    return Response(content=snapshot["body"], media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/{template_id}/snapshot/delta", response_model=ScanSnapshotDelta)
+async def read_scan_snapshot_delta(
+    template_id: str,
+    since: str,
+    campaign_id: Optional[UUIDStr] = None,
+    db: AsyncSession = Depends(get_db),
+    organization_id: str = Depends(get_scanner_organization),
+) -> Any:
+    """
+    Get the passes that changed since a snapshot or delta tag.
+    
+    Applying a change sets the pass' entry, so deltas can be applied more
+    than once. When `reset` is set the scanner downloads a new snapshot.
+    """
+    return await get_delta(db, template_id, since, campaign_id)
+
+
+@router.post("/{template_id}/redemptions", response_model=WalletPassBatchRedeemResult)
+async def upload_scan_redemptions(
+    template_id: str,
+    batch_in: WalletPassBatchRedeem,
+    db: AsyncSession = Depends(get_db),
+    organization_id: str = Depends(get_scanner_organization),
+) -> Any:
+    """
+    Upload the scans a scanner accepted while offline.
+    
+    Each serial number is redeemed at most once, at its earliest scan time.
+    Passes already redeemed elsewhere come back as `already_redeemed`, for
+    the venue to follow up on.
+    """
+    if len(batch_in.scans) > settings.MAX_BATCH_REDEMPTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.MAX_BATCH_REDEMPTIONS} scans",
+        )
+    
+    results = await redemption.redeem_scans(
+        db,
+        organization_id,
+        [(scan.serial_number, scan.scanned_at) for scan in batch_in.scans],
+        template_id=template_id,
+    )
+    await db.commit()
+    
+    redeemed = [result for result in results if result["status"] == redemption.REDEEMED]
+    for result in redeemed:
+        await scan_validator.forget(template_id, result["serial_number"], result["wallet_pass_id"])
+    return {"redeemed": len(redeemed), "results": results}
@@ -1,9 +1,10 @@
 from typing import Any, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user, get_current_active_superuser
+from app.api.dependencies import TokenUser, get_current_user, get_current_active_superuser, get_token_user
 from app.database import get_db
 from app.database.models.user import User
 from app.database.schema.user import User as UserSchema, UserCreate, UserUpdate
@@ -30,7 +31,9 @@ async def update_user_me(
     """
     Update own user.
     """
-    user = await current_user.update(db, **user_in.model_dump(exclude_unset=True))
+    update_data = user_in.model_dump(exclude_unset=True)
+    _revoke_tokens_on_change(current_user, update_data)
+    user = await current_user.update(db, **update_data)
     return user
 
 
@@ -38,7 +41,7 @@ async def update_user_me(
 async def read_user_by_id(
     user_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific user by id.
@@ -95,7 +98,7 @@ async def create_user(
     from app.api.v1.auth import get_password_hash
     
     user_in_data = user_in.model_dump(exclude={"password"})
-    user_in_data["hashed_password"] = get_password_hash(user_in.password)
+    user_in_data["hashed_password"] = await run_in_threadpool(get_password_hash, user_in.password)
     user = await User.create(db, **user_in_data)
     return user
 
@@ -121,9 +124,20 @@ async def update_user(
     if "password" in update_data and update_data["password"]:
         from app.api.v1.auth import get_password_hash
         
-        hashed_password = get_password_hash(update_data["password"])
+        hashed_password = await run_in_threadpool(get_password_hash, update_data["password"])
         del update_data["password"]
         update_data["hashed_password"] = hashed_password
     
+    _revoke_tokens_on_change(user, update_data)
     user = await user.update(db, **update_data)
-    return user
\ No newline at end of file
+    return user
+
+
+def _revoke_tokens_on_change(user: User, update_data: dict) -> None:
+    # Tokens carry the old claims: a new version makes them fail verification.
+    # A new password always counts, since each hash is salted differently.
+    if "hashed_password" in update_data or any(
+        field in update_data and update_data[field] != getattr(user, field)
+        for field in User.TOKEN_CLAIM_FIELDS
+    ):
+        update_data["token_version"] = (user.token_version or 0) + 1
\ No newline at end of file
@@ -0,0 +1,113 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Response, status
+from sqlalchemy import and_, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import get_authenticated_pass
+from app.database import get_db
+from app.database.models.device_registration import DeviceRegistration
+from app.database.models.wallet_pass import WalletPass
+from app.database.schema.device_registration import (
+    DeviceRegistrationCreate,
+    UpdatedSerialNumbers,
+)
+
+# Apple Wallet web service endpoints. Devices call these after adding a pass
+# and after receiving a push notification; they authenticate with the pass'
+# authentication token rather than a user session.
+router = APIRouter()
+
+
+@router.post("/{device_id}/registrations/{pass_type_identifier}/{serial_number}")
+async def register_device(
+    device_id: str,
+    registration_in: DeviceRegistrationCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    db_pass: WalletPass = Depends(get_authenticated_pass),
+) -> None:
+    """
+    Register a device to receive push updates for a pass.
+    """
+    registration = (
+        await db.execute(
+            select(DeviceRegistration).filter_by(
+                device_library_identifier=device_id, wallet_pass_id=db_pass.id
+            )
+        )
+    ).scalar()
+    if registration:
+        # Push tokens can change, e.g. after a device restore
+        if registration.push_token != registration_in.push_token:
+            await registration.update(db, push_token=registration_in.push_token)
+        response.status_code = status.HTTP_200_OK
+        return None
+
+    await DeviceRegistration.create(
+        db,
+        device_library_identifier=device_id,
+        push_token=registration_in.push_token,
+        pass_type_identifier=db_pass.pass_type_identifier,
+        wallet_pass_id=db_pass.id,
+        organization_id=db_pass.organization_id,
+    )
+    response.status_code = status.HTTP_201_CREATED
+    return None
+
+
+@router.delete("/{device_id}/registrations/{pass_type_identifier}/{serial_number}")
+async def unregister_device(
+    device_id: str,
+    db: AsyncSession = Depends(get_db),
+    db_pass: WalletPass = Depends(get_authenticated_pass),
+) -> None:
+    """
+    Stop sending push updates for a pass to a device.
+    """
+    await db.execute(
+        delete(DeviceRegistration).where(
+            DeviceRegistration.device_library_identifier == device_id,
+            DeviceRegistration.wallet_pass_id == db_pass.id,
+        )
+    )
+    await db.commit()
+    return None
+
+
+@router.get(
+    "/{device_id}/registrations/{pass_type_identifier}",
+    response_model=UpdatedSerialNumbers,
+    response_model_by_alias=True,
+)
+async def read_updated_serial_numbers(
+    device_id: str,
+    pass_type_identifier: str,
+    passesUpdatedSince: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """
+    List the serial numbers of a device's passes updated since the given tag.
+    """
+    query = (
+        select(WalletPass.serial_number, WalletPass.last_updated_tag)
+        .join(
+            DeviceRegistration,
+            and_(
+                DeviceRegistration.wallet_pass_id == WalletPass.id,
+                DeviceRegistration.device_library_identifier == device_id,
+            ),
+        )
+        .where(WalletPass.pass_type_identifier == pass_type_identifier)
+    )
+    if passesUpdatedSince:
+        query = query.where(WalletPass.last_updated_tag > passesUpdatedSince)
+
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return UpdatedSerialNumbers(
+        serial_numbers=[row.serial_number for row in rows],
+        last_updated=max((row.last_updated_tag or "" for row in rows), default=None) or None,
+    )
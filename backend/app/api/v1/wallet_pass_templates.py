@@ -1,12 +1,20 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import TokenUser, get_token_user, rate_limited
 from app.database import get_db
 from app.database.models.wallet_pass_template import WalletPassTemplate
-from app.database.models.user import User
+from app.services.images import ImageTooLargeError, ImageUploadError, process_pass_image
+from app.services.previews import ensure_template_preview, preview_path, preview_url
+from app.services.propagation import (
+    diff_template,
+    notify_template_change,
+    propagate_template_change,
+    template_snapshot,
+)
 from app.database.schema.wallet_pass_template import (
     WalletPassTemplate as WalletPassTemplateSchema,
     WalletPassTemplateCreate,
@@ -21,7 +29,7 @@ async def read_pass_templates(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve pass templates.
@@ -35,11 +43,15 @@ async def read_pass_templates(
     return templates
 
 
-@router.post("/", response_model=WalletPassTemplateSchema)
+@router.post(
+    "/",
+    response_model=WalletPassTemplateSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def create_pass_template(
     template_in: WalletPassTemplateCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Create new pass template.
@@ -63,7 +75,7 @@ async def create_pass_template(
 async def read_pass_template(
     template_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific pass template by id.
@@ -85,12 +97,16 @@ async def read_pass_template(
     return template
 
 
-@router.put("/{template_id}", response_model=WalletPassTemplateSchema)
+@router.put(
+    "/{template_id}",
+    response_model=WalletPassTemplateSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def update_pass_template(
     template_id: str,
     template_in: WalletPassTemplateUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update a pass template.
@@ -109,17 +125,27 @@ async def update_pass_template(
             detail="Not enough permissions",
         )
     
-    template = await template.update(
-        db, **template_in.model_dump(exclude_unset=True)
+    # Bump the update tag of affected passes in the same transaction
+    before = template_snapshot(template)
+    await template.update(db, commit=False, **template_in.model_dump(exclude_unset=True))
+    tag = await propagate_template_change(
+        db, template.id, diff_template(before, template_snapshot(template))
     )
+    await db.commit()
+    await db.refresh(template)
+    notify_template_change(template.id, tag)
     return template
 
 
-@router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{template_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def delete_pass_template(
     template_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> None:
     """
     Delete a pass template.
@@ -142,13 +168,17 @@ async def delete_pass_template(
     await template.update(db, is_archived=True)
 
 
-@router.post("/{template_id}/upload-image", response_model=WalletPassTemplateSchema)
+@router.post(
+    "/{template_id}/upload-image",
+    response_model=WalletPassTemplateSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def upload_template_image(
     template_id: str,
     image_type: str,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Upload an image for a pass template.
@@ -175,38 +205,45 @@ async def upload_template_image(
             detail=f"Invalid image type. Must be one of: {', '.join(valid_image_types)}",
         )
     
-    # Save file to static folder
-    import os
-    import aiofiles
-    from app.settings import settings
-    
-    # Create directory if it doesn't exist
-    organization_dir = f"app/static/organizations/{template.organization_id}"
-    template_dir = f"{organization_dir}/templates/{template_id}"
-    os.makedirs(template_dir, exist_ok=True)
-    
-    # Save file
-    file_extension = os.path.splitext(file.filename)[1]
-    file_name = f"{image_type}{file_extension}"
-    file_path = f"{template_dir}/{file_name}"
-    
-    async with aiofiles.open(file_path, "wb") as f:
-        content = await file.read()
-        await f.write(content)
+    # Stream the upload to disk and render the @1x/@2x/@3x variants off the event loop
+    try:
+        variants = await process_pass_image(file, image_type)
+    except ImageTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e),
+        )
+    except ImageUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     
-    # Update template with new image path
-    file_url = f"/static/organizations/{template.organization_id}/templates/{template_id}/{file_name}"
-    update_data = {f"{image_type}_image": file_url}
+    # Update template with the @1x image path and keep all variants in the design
+    design = dict(template.design or {})
+    design["images"] = {**design.get("images", {}), image_type: variants}
+    update_data = {f"{image_type}_image": variants["1x"], "design": design}
     
-    template = await template.update(db, **update_data)
+    before = template_snapshot(template)
+    await template.update(db, commit=False, **update_data)
+    tag = await propagate_template_change(
+        db, template.id, diff_template(before, template_snapshot(template))
+    )
+    await db.commit()
+    await db.refresh(template)
+    notify_template_change(template.id, tag)
     return template
 
 
-@router.post("/{template_id}/preview", response_model=dict)
+@router.post(
+    "/{template_id}/preview",
+    response_model=dict,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def preview_pass_template(
     template_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Generate a preview of the pass template.
@@ -225,9 +262,42 @@ async def preview_pass_template(
             detail="Not enough permissions",
         )
     
-    # In a real implementation, this would generate a pass preview
-    # For now, we'll just return the template data
+    # Previews are cached by a hash of the design inputs and only re-rendered
+    # after the template's design changes
+    digest = await ensure_template_preview(template)
     return {
-        "preview_url": f"/api/v1/templates/{template_id}/preview-image",
+        "preview_url": preview_url(digest),
+        "preview_hash": digest,
         "template": template.to_dict(),
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/{template_id}/preview-image", response_class=FileResponse)
+async def read_pass_template_preview_image(
+    template_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get the rendered preview image of a pass template.
+    """
+    template = await WalletPassTemplate.get_by_id(db, template_id)
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found",
+        )
+    
+    # Check if user has access to this template
+    if template.organization_id != current_user.organization_id and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    
+    digest = await ensure_template_preview(template)
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(preview_path(digest), media_type="image/png", headers=headers)
\ No newline at end of file
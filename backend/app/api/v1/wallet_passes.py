@@ -2,21 +2,38 @@ from typing import Any, List, Optional
 import uuid
 import json
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import TokenUser, get_authenticated_pass, get_token_user, rate_limited
 from app.database import get_db
 from app.database.enums import WalletPassType
 from app.database.models.wallet_pass import WalletPass
 from app.database.models.wallet_pass_template import WalletPassTemplate
 from app.database.models.customer import Customer
-from app.database.models.user import User
 from app.settings import settings
+from app.services.analytics import analytics_buffer
+from app.services.metrics import Timer, pass_generation_duration
+from app.services.pass_bundles import get_pass_bundle
+from app.services.push import push_dispatcher
+from app.services.quotas import QuotaExceeded, release, remaining_quota, reserve
+from app.services import redemption
+from app.services.scans import scan_validator
+from app.utils import UUIDStr, generate_update_tag, update_tag_to_http_date
 from app.database.schema.wallet_pass import (
     WalletPass as WalletPassSchema,
     WalletPassCreate,
     WalletPassUpdate,
+    WalletPassBatchCreate,
+    WalletPassBatchJob,
+    WalletPassBatchRedeem,
+    WalletPassBatchRedeemResult,
+)
+from app.services.jobs import get_job
+from app.services.pass_issuance import (
+    batch_job_status,
+    count_eligible_customers,
+    start_batch_issue,
 )
 
 router = APIRouter()
@@ -27,10 +44,10 @@ async def read_passes(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    template_id: Optional[str] = None,
-    customer_id: Optional[str] = None,
-    campaign_id: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    template_id: Optional[UUIDStr] = None,
+    customer_id: Optional[UUIDStr] = None,
+    campaign_id: Optional[UUIDStr] = None,
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Retrieve passes.
@@ -53,11 +70,11 @@ async def read_passes(
     return passes
 
 
-@router.post("/", response_model=WalletPassSchema)
+@router.post("/", response_model=WalletPassSchema, dependencies=[Depends(rate_limited("write"))])
 async def create_pass(
     pass_in: WalletPassCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Create a new pass for a customer using a template.
@@ -95,10 +112,27 @@ async def create_pass(
         "serial_number": serial_number,
         "pass_type_identifier": settings.APPLE_PASS_TYPE_IDENTIFIER,
         "authentication_token": authentication_token,
+        "last_updated_tag": generate_update_tag(),
     })
     
+    # Count the pass against the organization's quota in the same transaction
+    try:
+        await reserve(db, current_user.organization_id, "passes")
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e),
+        )
+    
     # Create pass in the database
     db_pass = await WalletPass.create(db, **pass_data)
+    analytics_buffer.record(
+        "send",
+        db_pass.organization_id,
+        campaign_id=db_pass.campaign_id,
+        wallet_pass_id=db_pass.id,
+        customer_id=db_pass.customer_id,
+    )
     
     # In a real implementation, this would generate actual Apple/Google wallet passes
     # For now, we'll just return the database record
@@ -106,11 +140,93 @@ async def create_pass(
     return db_pass
 
 
+@router.post(
+    "/batch",
+    response_model=WalletPassBatchJob,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(rate_limited("bulk"))],
+)
+async def create_passes_batch(
+    batch_in: WalletPassBatchCreate,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Issue passes from a template to a list of customers or an audience query.
+    
+    Ownership is validated up front; the passes are inserted by a background
+    job with multi-row INSERTs and progress is reported by the returned job.
+    Retrying a request with the same `Idempotency-Key` header returns the
+    original job.
+    """
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must be part of an organization",
+        )
+    
+    if (batch_in.customer_ids is None) == (batch_in.audience is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either customer_ids or audience",
+        )
+    if batch_in.customer_ids is not None:
+        if len(batch_in.customer_ids) > settings.MAX_BATCH_PASSES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A batch can contain at most {settings.MAX_BATCH_PASSES} customers",
+            )
+        batch_in.customer_ids = list(dict.fromkeys(batch_in.customer_ids))
+    
+    # Validate template, campaign and customers in one query
+    total = await count_eligible_customers(db, current_user.organization_id, batch_in)
+    if total == 0:
+        template = await WalletPassTemplate.get_by_id(db, batch_in.template_id)
+        if not template or template.organization_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Template not found or not accessible",
+            )
+    
+    # Fail fast when the batch cannot fit; the job reserves quota per chunk
+    remaining = await remaining_quota(db, current_user.organization_id, "passes")
+    if remaining is not None and total > remaining:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Batch of {total} passes exceeds the {remaining} passes your organization has left",
+        )
+    
+    job = await start_batch_issue(
+        current_user.organization_id, batch_in, total, idempotency_key=idempotency_key
+    )
+    return batch_job_status(job)
+
+
+@router.get("/batch/{job_id}", response_model=WalletPassBatchJob)
+async def read_passes_batch(
+    job_id: str,
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get the progress of a batch issuance job.
+    """
+    job = await get_job(job_id)
+    if not job or job.name != "passes.batch_issue" or (
+        job.organization_id != current_user.organization_id and not current_user.is_superuser
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch job not found",
+        )
+    return batch_job_status(job)
+
+
 @router.get("/{pass_id}", response_model=WalletPassSchema)
 async def read_pass(
     pass_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Get a specific pass by id.
@@ -132,12 +248,16 @@ async def read_pass(
     return db_pass
 
 
-@router.put("/{pass_id}", response_model=WalletPassSchema)
+@router.put(
+    "/{pass_id}",
+    response_model=WalletPassSchema,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def update_pass(
     pass_id: str,
     pass_in: WalletPassUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Update a pass.
@@ -156,21 +276,38 @@ async def update_pass(
             detail="Not enough permissions",
         )
     
-    db_pass = await db_pass.update(
-        db, **pass_in.model_dump(exclude_unset=True)
-    )
+    # Voiding a pass frees its quota; restoring one takes it again
+    update_data = pass_in.model_dump(exclude_unset=True)
+    if "is_voided" in update_data and bool(update_data["is_voided"]) != bool(db_pass.is_voided):
+        if update_data["is_voided"]:
+            await release(db, db_pass.organization_id, "passes")
+            await scan_validator.forget(db_pass.template_id, db_pass.serial_number)
+        else:
+            try:
+                await reserve(db, db_pass.organization_id, "passes")
+            except QuotaExceeded as e:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=str(e),
+                )
     
-    # In a real implementation, this would update the actual Apple/Google wallet passes
-    # For now, we'll just return the database record
+    db_pass = await db_pass.update(db, last_updated_tag=generate_update_tag(), **update_data)
+    
+    # Devices fetch the new version from the wallet web service after the push
+    push_dispatcher.notify_passes([db_pass.id])
     
     return db_pass
 
 
-@router.delete("/{pass_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{pass_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limited("write"))],
+)
 async def delete_pass(
     pass_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> None:
     """
     Delete a pass.
@@ -190,7 +327,10 @@ async def delete_pass(
         )
     
     # Mark pass as voided instead of deleting
-    await db_pass.update(db, is_voided=True)
+    if not db_pass.is_voided:
+        await release(db, db_pass.organization_id, "passes")
+        await scan_validator.forget(db_pass.template_id, db_pass.serial_number)
+    await db_pass.update(db, is_voided=True, last_updated_tag=generate_update_tag())
 
 
 @router.get("/{pass_id}/download", response_class=Response)
@@ -198,7 +338,7 @@ async def download_pass(
     pass_id: str,
     pass_type: WalletPassType = WalletPassType.APPLE,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Download a pass file for Apple or Google Wallet.
@@ -212,64 +352,185 @@ async def download_pass(
     
     # In a real implementation, this would generate and return the actual pass file
     # For now, we'll just return a placeholder message
-    
-    if pass_type == WalletPassType.APPLE:
-        return Response(
-            content=json.dumps({"message": "This is a placeholder for an Apple Wallet pass file"}),
-            media_type="application/vnd.apple.pkpass",
-            headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.pkpass"}
-        )
-    elif pass_type == WalletPassType.GOOGLE:
-        return Response(
-            content=json.dumps({"message": "This is a placeholder for a Google Wallet pass file"}),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.json"}
-        )
-    elif pass_type == WalletPassType.SAMSUNG:
-        return Response(
-            content=json.dumps({"message": "This is a placeholder for a Samsung Wallet pass file"}),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.json"}
-        )
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid pass type. Must be one of: [{', '.join([t.value for t in WalletPassType])}]",
-        )
+    with Timer(pass_generation_duration, pass_type.value):
+        if pass_type == WalletPassType.APPLE:
+            template = await WalletPassTemplate.get_by_id(db, db_pass.template_id)
+            return Response(
+                content=await get_pass_bundle(db_pass, template),
+                media_type="application/vnd.apple.pkpass",
+                headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.pkpass"}
+            )
+        elif pass_type == WalletPassType.GOOGLE:
+            return Response(
+                content=json.dumps({"message": "This is a placeholder for a Google Wallet pass file"}),
+                media_type="application/json",
+                headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.json"}
+            )
+        elif pass_type == WalletPassType.SAMSUNG:
+            return Response(
+                content=json.dumps({"message": "This is a placeholder for a Samsung Wallet pass file"}),
+                media_type="application/json",
+                headers={"Content-Disposition": f"attachment; filename=pass-{db_pass.serial_number}.json"}
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid pass type. Must be one of: [{', '.join([t.value for t in WalletPassType])}]",
+            )
 
 
 @router.post("/{pass_id}/redeem", response_model=WalletPassSchema)
 async def redeem_pass(
     pass_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: TokenUser = Depends(get_token_user),
 ) -> Any:
     """
     Mark a pass as redeemed.
     """
-    db_pass = await WalletPass.get_by_id(db, pass_id)
-    if not db_pass:
+    result, db_pass = await redemption.redeem_pass(
+        db, _redemption_scope(current_user), pass_id=pass_id
+    )
+    return await _redemption_response(db, result, db_pass)
+
+
+@router.get("/by-serial/{serial_number}", response_model=WalletPassSchema)
+async def read_pass_by_serial(
+    serial_number: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Get a pass by the serial number encoded in its barcode.
+    """
+    db_pass = await WalletPass.get(db, serial_number=serial_number)
+    if not db_pass or (
+        db_pass.organization_id != current_user.organization_id and not current_user.is_superuser
+    ):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pass not found",
         )
     
-    # Check if user has access to this pass
-    if db_pass.organization_id != current_user.organization_id and not current_user.is_superuser:
+    return db_pass
+
+
+@router.post("/by-serial/{serial_number}/redeem", response_model=WalletPassSchema)
+async def redeem_pass_by_serial(
+    serial_number: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Redeem a scanned pass by its serial number.
+    """
+    result, db_pass = await redemption.redeem_pass(
+        db, _redemption_scope(current_user), serial_number=serial_number
+    )
+    return await _redemption_response(db, result, db_pass)
+
+
+@router.post(
+    "/redemptions",
+    response_model=WalletPassBatchRedeemResult,
+    dependencies=[Depends(rate_limited("write"))],
+)
+async def redeem_passes_batch(
+    batch_in: WalletPassBatchRedeem,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_token_user),
+) -> Any:
+    """
+    Redeem a batch of scans, e.g. uploaded by a scanner that was offline.
+    
+    Each serial number is redeemed at most once, at its earliest scan time.
+    The result of every distinct serial number is returned; scans of passes
+    that could not be redeemed do not fail the batch.
+    """
+    if len(batch_in.scans) > settings.MAX_BATCH_REDEMPTIONS:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.MAX_BATCH_REDEMPTIONS} scans",
         )
     
-    # Check if pass is already redeemed
-    if db_pass.is_redeemed:
+    results = await redemption.redeem_scans(
+        db,
+        _redemption_scope(current_user),
+        [(scan.serial_number, scan.scanned_at) for scan in batch_in.scans],
+    )
+    await db.commit()
+    
+    # Door scanners must not accept them from the scan cache any more
+    redeemed = [result for result in results if result["status"] == redemption.REDEEMED]
+    for result in redeemed:
+        await scan_validator.forget(result["template_id"], result["serial_number"], result["wallet_pass_id"])
+    return {"redeemed": len(redeemed), "results": results}
+
+
+def _redemption_scope(current_user: TokenUser) -> Optional[str]:
+    # Superusers can redeem passes of any organization
+    return None if current_user.is_superuser else current_user.organization_id or ""
+
+
+async def _redemption_response(
+    db: AsyncSession, result: str, db_pass: Optional[WalletPass]
+) -> WalletPassSchema:
+    if result == redemption.NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pass not found",
+        )
+    if result == redemption.ALREADY_REDEEMED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Pass already redeemed",
         )
+    if result == redemption.VOIDED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass is voided",
+        )
+    if result == redemption.EXPIRED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass has expired",
+        )
+    
+    # Serialize before committing, which expires the loaded pass
+    response = WalletPassSchema.model_validate(db_pass)
+    await db.commit()
+    # Door scanners must not accept it from the scan cache any more
+    await scan_validator.forget(response.template_id, response.serial_number, response.id)
+    analytics_buffer.record(
+        "redeem",
+        response.organization_id,
+        campaign_id=response.campaign_id,
+        wallet_pass_id=response.id,
+        customer_id=response.customer_id,
+    )
+    return response
+
+
+# Registered last so it cannot shadow the /{pass_id}/... routes above
+@router.get("/{pass_type_identifier}/{serial_number}", response_class=Response)
+async def fetch_latest_pass(
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    db_pass: WalletPass = Depends(get_authenticated_pass),
+) -> Any:
+    """
+    Return the latest version of a pass to a device (Apple Wallet web service).
+    
+    The bundle is rebuilt here, on the first fetch after the pass or its
+    template changed, rather than when the change is made.
+    """
+    last_modified = update_tag_to_http_date(db_pass.last_updated_tag)
+    if last_modified and if_modified_since == last_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
     
-    # Update pass
-    from datetime import datetime
-    db_pass = await db_pass.update(db, is_redeemed=True, redeemed_at=datetime.now())
+    template = await WalletPassTemplate.get_by_id(db, db_pass.template_id)
+    with Timer(pass_generation_duration, WalletPassType.APPLE.value):
+        bundle = await get_pass_bundle(db_pass, template)
     
-    return db_pass
\ No newline at end of file
+    headers = {"Last-Modified": last_modified} if last_modified else {}
+    return Response(content=bundle, media_type="application/vnd.apple.pkpass", headers=headers)
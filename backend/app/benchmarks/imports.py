@@ -0,0 +1,130 @@
+"""
+Check the import time of the entry points against a budget.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+(best of a few runs), prints its import time next to its budget and the
+packages that took the longest, and exits non-zero when an entry point
+imports a module it should load lazily. Wall-clock times vary between
+machines and runs, so going over a budget is only a warning unless
+`--enforce-budgets` is given:
+
+    python -m app.benchmarks.imports
+    python -m app.benchmarks.imports --runs 5 --top 15 app.worker
+
+Job workers and CLI tools must not load the web framework, the database
+driver (the engine is created on first use, or by the API lifespan) or the
+libraries only needed for passwords, pass signing, images, geocoding and
+pushes. What remains is mostly SQLAlchemy and the settings (pydantic);
+tighten the budgets as imports shrink.
+"""
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+
+# Entry point, import budget in milliseconds
+BUDGETS: Dict[str, float] = {
+    "app.main": 1200.0,
+    "app.server": 400.0,
+    "app.worker": 700.0,
+    "app.partitions": 700.0,
+    "app.database.uuid_keys": 700.0,
+}
+
+# Loaded on first use: passwords, pass signing, images, geocoding, pushes, the
+# driver and python-jose (only with JWT_BACKEND=jose)
+LAZY_MODULES: Set[str] = {"passlib", "cryptography", "PIL", "geopy", "httpx", "asyncpg", "jose"}
+
+# Entry points that must not load the web framework either
+FORBIDDEN: Dict[str, Set[str]] = {
+    "app.main": LAZY_MODULES,
+    "app.server": LAZY_MODULES | {"fastapi", "sqlalchemy"},
+    "app.worker": LAZY_MODULES | {"fastapi"},
+    "app.partitions": LAZY_MODULES | {"fastapi"},
+    "app.database.uuid_keys": LAZY_MODULES | {"fastapi"},
+}
+
+
+def measure(module: str) -> Tuple[float, Dict[str, float], Set[str]]:
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        tuple: Total import time in milliseconds, self time per top-level
+            package in milliseconds, and the top-level packages imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] += int(self_us) / 1000
+        # Top-level imports are indented by a single space
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us) / 1000
+    return total, dict(packages), set(packages)
+
+
+def check(module: str, runs: int, top: int) -> Tuple[List[str], List[str]]:
+    """
+    Measure an entry point and print the report.
+
+    Returns:
+        tuple: Modules imported eagerly that should be lazy, and budget overruns.
+    """
+    total, packages, imported = min((measure(module) for _ in range(runs)), key=lambda run: run[0])
+    budget = BUDGETS.get(module)
+    problems = []
+    overruns = []
+    if budget is not None and total > budget:
+        overruns.append(f"{module} imports in {total:.0f} ms, over its {budget:.0f} ms budget")
+    for name in sorted(imported & FORBIDDEN.get(module, set())):
+        problems.append(f"{module} imports {name}, which should be loaded lazily")
+
+    budget_text = f"{budget:.0f} ms" if budget is not None else "none"
+    print(f"{module}: {total:.0f} ms (budget {budget_text})")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {name:<28} {ms:>8.1f} ms")
+    return problems, overruns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check entry point import times.")
+    parser.add_argument("modules", nargs="*", help="Entry points to check (default: all budgeted)")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per entry point; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    parser.add_argument(
+        "--enforce-budgets", action="store_true", help="Fail when an entry point is over its budget"
+    )
+    args = parser.parse_args()
+
+    problems = []
+    overruns = []
+    for module in args.modules or list(BUDGETS):
+        module_problems, module_overruns = check(module, max(args.runs, 1), args.top)
+        problems.extend(module_problems)
+        overruns.extend(module_overruns)
+    if args.enforce_budgets:
+        problems.extend(overruns)
+    else:
+        for overrun in overruns:
+            print(f"WARN: {overrun}")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Compare primary key types for insert throughput and index size.
+
+Fills a table shaped like `wallet_pass` (primary key, organization and
+customer foreign keys, unique serial number) once per key scheme and
+reports rows per second and table/index sizes:
+
+    varchar-uuid4  36-character random UUID strings (the previous keys)
+    uuid-uuid4     native 16-byte random UUIDs
+    uuid-uuid7     native 16-byte time-ordered UUIDs (the current keys)
+
+    python -m app.benchmarks.keys --rows 1000000
+
+Random keys insert into every leaf page of the primary key index, so once
+the index outgrows shared_buffers each insert reads and dirties a random
+page and page splits leave pages half empty; UUIDv7 keys append to the
+right-most leaf. Run it against a scratch database with the same
+configuration as production: it creates and drops `bench_keys_*` tables.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from app.database import sessionmanager
+from app.utils import uuid7
+
+
+BATCH_SIZE = 1000
+LOOKUPS = 10000
+
+# Scheme name, column type, key generator
+SCHEMES: List[Tuple[str, str, Callable[[], Any]]] = [
+    ("varchar-uuid4", "varchar", lambda: str(uuid.uuid4())),
+    ("uuid-uuid4", "uuid", uuid.uuid4),
+    ("uuid-uuid7", "uuid", uuid7),
+]
+
+
+async def run_scheme(name: str, key_type: str, new_key: Callable[[], Any], rows: int) -> Dict[str, Any]:
+    table = f"bench_keys_{name.replace('-', '_')}"
+    async with sessionmanager.connect() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(text(
+            f"CREATE TABLE {table} (id {key_type} PRIMARY KEY, organization_id {key_type} NOT NULL, "
+            f"customer_id {key_type} NOT NULL, serial_number varchar NOT NULL UNIQUE, created_at timestamp)"
+        ))
+        await conn.execute(text(f"CREATE INDEX {table}_organization_id ON {table} (organization_id, customer_id)"))
+
+    # A few large tenants and many customers, like real pass traffic
+    organizations = [new_key() for _ in range(20)]
+    customers = [new_key() for _ in range(max(rows // 10, 1))]
+    statement = text(
+        f"INSERT INTO {table} (id, organization_id, customer_id, serial_number, created_at) "
+        "VALUES (:id, :organization_id, :customer_id, :serial_number, now())"
+    )
+    ids = []
+    started = time.perf_counter()
+    for offset in range(0, rows, BATCH_SIZE):
+        batch = [
+            {
+                "id": new_key(),
+                "organization_id": random.choice(organizations),
+                "customer_id": random.choice(customers),
+                "serial_number": str(uuid.uuid4()),
+            }
+            for _ in range(min(BATCH_SIZE, rows - offset))
+        ]
+        ids.extend(row["id"] for row in random.sample(batch, min(len(batch), 10)))
+        async with sessionmanager.connect() as conn:
+            await conn.execute(statement, batch)
+    insert_seconds = time.perf_counter() - started
+
+    lookup = text(f"SELECT serial_number FROM {table} WHERE id = :id")
+    started = time.perf_counter()
+    async with sessionmanager.connect() as conn:
+        for key in random.choices(ids, k=LOOKUPS):
+            await conn.execute(lookup, {"id": key})
+    lookup_seconds = time.perf_counter() - started
+
+    async with sessionmanager.connect() as conn:
+        sizes = (
+            await conn.execute(text(
+                f"SELECT pg_relation_size('{table}'), pg_relation_size('{table}_pkey'), "
+                f"pg_relation_size('{table}_organization_id'), pg_indexes_size('{table}')"
+            ))
+        ).one()
+        await conn.execute(text(f"DROP TABLE {table}"))
+
+    return {
+        "scheme": name,
+        "rows_per_second": rows / insert_seconds,
+        "lookup_us": lookup_seconds / LOOKUPS * 1_000_000,
+        "table_mb": sizes[0] / 1024 / 1024,
+        "pkey_mb": sizes[1] / 1024 / 1024,
+        "fk_index_mb": sizes[2] / 1024 / 1024,
+        "indexes_mb": sizes[3] / 1024 / 1024,
+    }
+
+
+async def run(rows: int) -> None:
+    try:
+        print(
+            f"{'scheme':<15} {'rows/s':>10} {'lookup us':>10} {'table MB':>10} "
+            f"{'pkey MB':>10} {'fk idx MB':>10} {'indexes MB':>11}"
+        )
+        for name, key_type, new_key in SCHEMES:
+            result = await run_scheme(name, key_type, new_key, rows)
+            print(
+                f"{result['scheme']:<15} {result['rows_per_second']:>10.0f} {result['lookup_us']:>10.1f} "
+                f"{result['table_mb']:>10.1f} {result['pkey_mb']:>10.1f} "
+                f"{result['fk_index_mb']:>10.1f} {result['indexes_mb']:>11.1f}"
+            )
+    finally:
+        await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark primary key types.")
+    parser.add_argument("--rows", type=int, default=200000, help="Rows inserted per scheme")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
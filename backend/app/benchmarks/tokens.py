@@ -0,0 +1,82 @@
+"""
+Measure the cost of verifying access tokens.
+
+Verifies a working set of access tokens (one per simulated user, sent
+repeatedly like real clients do) with:
+
+    jose + pydantic  python-jose and `TokenPayload` validation (the previous behaviour)
+    jose             python-jose alone (JWT_BACKEND=jose)
+    hmac             the standard library verifier (JWT_BACKEND=hmac)
+    hmac + cache     `decode_token`: the hmac verifier behind the verified-token LRU
+
+    python -m app.benchmarks.tokens --verifications 100000 --users 1000
+
+Prints microseconds per verification. Routes using `get_token_user`
+additionally skip the user lookup the previous dependency made.
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from app.database.schema.user import TokenPayload
+from app.services import tokens
+from app.settings import settings
+
+
+def make_tokens(users: int) -> List[str]:
+    expire = datetime.utcnow() + timedelta(hours=1)
+    backend = tokens.HmacTokenBackend(settings.SECRET_KEY)
+    return [
+        backend.encode({
+            "exp": int(expire.timestamp()),
+            "sub": str(uuid.uuid4()),
+            "org": str(uuid.uuid4()),
+            "su": False,
+            "ver": 0,
+        })
+        for _ in range(users)
+    ]
+
+
+def verifiers() -> Dict[str, Callable[[str], object]]:
+    jose = tokens.JoseTokenBackend(settings.SECRET_KEY)
+    hmac = tokens.HmacTokenBackend(settings.SECRET_KEY)
+    return {
+        "jose + pydantic": lambda token: TokenPayload(**jose.decode(token)),
+        "jose": jose.decode,
+        "hmac": hmac.decode,
+        "hmac + cache": tokens.decode_token,
+    }
+
+
+def run(verify: Callable[[str], object], working_set: List[str], verifications: int) -> float:
+    # The first pass fills the cache, like the first request of each client
+    for token in working_set:
+        verify(token)
+    started = time.perf_counter()
+    for index in range(verifications):
+        verify(working_set[index % len(working_set)])
+    return (time.perf_counter() - started) / verifications * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark access token verification.")
+    parser.add_argument("--verifications", type=int, default=100000, help="Verifications per verifier")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct tokens in the working set")
+    args = parser.parse_args()
+
+    # The cache is process-wide: use the stdlib verifier behind it
+    tokens._backend = tokens.HmacTokenBackend(settings.SECRET_KEY)
+    working_set = make_tokens(args.users)
+    baseline = None
+    print(f"{'verifier':<16} {'us/token':>9} {'speed-up':>9}")
+    for name, verify in verifiers().items():
+        us = run(verify, working_set, args.verifications)
+        baseline = baseline or us
+        print(f"{name:<16} {us:>9.2f} {baseline / us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,56 +10,122 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import MetaData
 from typing import AsyncIterator, Any, Dict
 
+from app.database.tenancy import TenantSession
+
 
 # Define metadata and Base for ORM mappings
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
 
-class DatabaseNotInitializedError(Exception):
-    """Custom exception for uninitialized database components."""
-    pass
-
-
 class DatabaseSessionManager:
-    def __init__(self, dsn: str, **engine_kwargs: Dict[str, Any]):
+    def __init__(self, dsn: str, instrument: bool = False, **engine_kwargs: Dict[str, Any]):
         """
         Initialize the DatabaseSessionManager.
         
         Args:
             dsn (str): The database connection string (DSN).
+            instrument (bool): Attach query timing hooks to the engine.
             engine_kwargs (dict): Additional arguments for the SQLAlchemy engine.
         """
         self._dsn = dsn
+        self._instrument = instrument
         self._engine_kwargs = engine_kwargs
+        self._engine = None
+        self._sessionmaker = None
+
+    def init(self) -> None:
+        """
+        Create the engine and the sessionmaker.
+
+        Called from the application lifespan; `connect` and `session` call it
+        on first use, so importing the manager (e.g. from a CLI tool) neither
+        loads the database driver nor opens connections. Does nothing when the
+        engine already exists.
+        """
+        if self._engine is not None:
+            return
+
         self._engine = create_async_engine(self._dsn, **self._engine_kwargs)
+        if self._instrument:
+            from app.database.instrumentation import instrument_engine
+            instrument_engine(
+                self._engine,
+                slow_query_threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+                log_slow_queries=settings.SLOW_QUERY_LOG_ENABLED,
+            )
         self._sessionmaker = async_sessionmaker(
             bind=self._engine,
             autocommit=False,
             autoflush=False,
+            sync_session_class=TenantSession,
         )
 
     async def close(self) -> None:
         """
         Close the database engine and reset the sessionmaker.
+
+        Does nothing when the engine was never created.
         """
         if self._engine is None:
-            raise DatabaseNotInitializedError("DatabaseSessionManager is not initialized.")
+            return
 
         await self._engine.dispose()
         self._engine = None
         self._sessionmaker = None
 
+    def pool_status(self) -> Dict[str, int]:
+        """
+        Report connection pool statistics.
+
+        Returns:
+            dict: Pool size and connections checked in, checked out and in overflow.
+                Pools that do not track these (e.g. NullPool) report nothing.
+        """
+        if self._engine is None:
+            return {}
+
+        pool = self._engine.pool
+        status = {}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            stat = getattr(pool, name, None)
+            if callable(stat):
+                status[name] = stat()
+        return status
+
+    def compiled_cache_status(self) -> Dict[str, int]:
+        """
+        Report the engine's compiled statement cache usage.
+
+        Returns:
+            dict: Cached statements (`entries`) and the cache's `capacity`;
+                nothing when caching is disabled.
+        """
+        if self._engine is None:
+            return {}
+
+        cache = self._engine.sync_engine._compiled_cache
+        if cache is None:
+            return {}
+        return {"entries": len(cache), "capacity": cache.capacity}
+
     @contextlib.asynccontextmanager
-    async def connect(self) -> AsyncIterator[AsyncConnection]:
+    async def connect(self, autocommit: bool = False) -> AsyncIterator[AsyncConnection]:
         """
         Provide an asynchronous context manager for direct database connections.
 
+        Args:
+            autocommit (bool): Run every statement in its own transaction, for
+                statements that cannot run inside one (e.g. CREATE INDEX CONCURRENTLY).
+
         Yields:
             AsyncConnection: A transactional database connection.
         """
-        if self._engine is None:
-            raise DatabaseNotInitializedError("DatabaseSessionManager is not initialized.")
+        self.init()
+        if autocommit:
+            async with self._engine.connect() as connection:
+                yield await connection.execution_options(isolation_level="AUTOCOMMIT")
+            return
 
         async with self._engine.begin() as connection:
             try:
@@ -76,9 +142,7 @@ class DatabaseSessionManager:
         Yields:
             AsyncSession: A transactional database session.
         """
-        if self._sessionmaker is None:
-            raise DatabaseNotInitializedError("DatabaseSessionManager is not initialized.")
-
+        self.init()
         session = self._sessionmaker()
         try:
             yield session
@@ -90,10 +154,12 @@ class DatabaseSessionManager:
             await session.close()
 
 
-# Create a session manager instance
+# Create a session manager instance; the engine is created by init()
 sessionmanager = DatabaseSessionManager(
     dsn=str(settings.POSTGRES_DSN),
-    echo=settings.ENV == 'development'
+    instrument=settings.DB_INSTRUMENTATION_ENABLED,
+    echo=settings.ENV == 'development',
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
 )
 
 # Get session dependency
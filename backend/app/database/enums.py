@@ -14,4 +14,10 @@ class SubscriptionStatus(str, Enum):
 class WalletPassType(str, Enum):
     APPLE = 'apple'
     GOOGLE = 'google'
-    SAMSUNG = 'samsung'
\ No newline at end of file
+    SAMSUNG = 'samsung'
+    
+class AnalyticsEventType(str, Enum):
+    SEND = 'send'
+    OPEN = 'open'
+    REDEEM = 'redeem'
+    GEO_TRIGGER = 'geo_trigger'
\ No newline at end of file
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import re
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.services.metrics import record_cache_lookup, registry
+
+
+logger = logging.getLogger("app.database.slow_query")
+
+# Statement fingerprinting: strip literals and bind markers so that the same
+# query shape maps to the same fingerprint regardless of parameter values.
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+slow_queries_total = registry.counter(
+    "db_slow_queries_total",
+    "Statements slower than the configured slow query threshold.",
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a SQL statement to its shape, replacing literals and parameters with '?'."""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(?)", normalized)
+    normalized = _REPEATED_ROWS.sub(r"\1, ...", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def fingerprint_statement(statement: str) -> str:
+    """Return a short stable hash identifying the shape of a SQL statement."""
+    return hashlib.sha1(normalize_statement(statement).encode()).hexdigest()[:12]
+
+
+class QueryStats:
+    """Database statistics accumulated over the lifetime of a single request."""
+
+    __slots__ = (
+        "scope",
+        "statement_count",
+        "total_time",
+        "rows",
+        "slowest_time",
+        "slowest_statement",
+    )
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statement_count = 0
+        self.total_time = 0.0
+        self.rows = 0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, duration: float, rows: int) -> None:
+        self.statement_count += 1
+        self.total_time += duration
+        self.rows += max(rows, 0)
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    @property
+    def slowest_fingerprint(self) -> Optional[str]:
+        if self.slowest_statement is None:
+            return None
+        return fingerprint_statement(self.slowest_statement)
+
+    @property
+    def route(self) -> Optional[str]:
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", None)
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_query_stats(scope: Optional[dict] = None) -> Tuple[QueryStats, Token]:
+    """Begin collecting query statistics for the current context (i.e. request)."""
+    stats = QueryStats(scope)
+    return stats, _current_stats.set(stats)
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """Get the statistics being collected for the current context, if any."""
+    return _current_stats.get()
+
+
+def reset_query_stats(token: Token) -> None:
+    _current_stats.reset(token)
+
+
+def _rows_returned(cursor: Any) -> int:
+    rowcount = getattr(cursor, "rowcount", -1)
+    if rowcount is not None and rowcount >= 0:
+        return rowcount
+    # Async adapters (asyncpg, aiosqlite) buffer SELECT results on the cursor
+    # and report rowcount as -1, so count the buffered rows instead.
+    buffered = getattr(cursor, "_rows", None)
+    return len(buffered) if buffered is not None else 0
+
+
+def instrument_engine(
+    engine: AsyncEngine,
+    slow_query_threshold_ms: Optional[float] = None,
+    log_slow_queries: bool = True,
+) -> None:
+    """
+    Attach cursor execution hooks to an engine.
+
+    Every statement is timed and attributed to the request-scoped `QueryStats`
+    (when one is active). Statements slower than `slow_query_threshold_ms` are
+    counted and, if enabled, logged with their normalized shape. Lookups in
+    the compiled statement cache are counted as the `sql_compiled` cache;
+    statements without a cache key (e.g. `text()`) count as misses.
+
+    Args:
+        engine: The async engine to instrument.
+        slow_query_threshold_ms: Threshold for the slow query log, or None to disable it.
+        log_slow_queries: Whether slow statements are written to the log.
+    """
+    sync_engine = engine.sync_engine
+    slow_threshold = (
+        slow_query_threshold_ms / 1000.0 if slow_query_threshold_ms is not None else None
+    )
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("query_start_time")
+        if not start_times:
+            return
+        duration = time.perf_counter() - start_times.pop()
+
+        cache_hit = getattr(context, "cache_hit", None)
+        if cache_hit is CacheStats.CACHE_HIT:
+            record_cache_lookup("sql_compiled", True)
+        elif cache_hit is CacheStats.CACHE_MISS or cache_hit is CacheStats.NO_CACHE_KEY:
+            record_cache_lookup("sql_compiled", False)
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration, _rows_returned(cursor))
+
+        if slow_threshold is not None and duration >= slow_threshold:
+            slow_queries_total.inc()
+            if log_slow_queries:
+                logger.warning(
+                    "Slow query (%.1f ms, route=%s, fingerprint=%s): %s",
+                    duration * 1000,
+                    stats.route if stats is not None else None,
+                    fingerprint_statement(statement),
+                    normalize_statement(statement)[:1000],
+                )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Keep the timing stack balanced when a statement fails
+        conn = exception_context.connection
+        if conn is not None:
+            start_times = conn.info.get("query_start_time")
+            if start_times:
+                start_times.pop()
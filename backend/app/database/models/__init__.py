@@ -6,6 +6,15 @@ from .wallet_pass import WalletPass
 from .customer import Customer, customer_campaign
 from .campaign import Campaign
 from .location import Location
+from .device_registration import DeviceRegistration
+from .organization_usage import OrganizationUsage
+from .analytics import (
+    analytics_event,
+    CampaignDailyStats,
+    OrganizationHourlyStats,
+    AnalyticsCheckpoint,
+)
+from .tombstone import archived_row
 
 # For Alembic to find all models
 __all__ = [
@@ -17,4 +26,9 @@ __all__ = [
     "Customer",
     "Campaign",
     "Location",
+    "DeviceRegistration",
+    "OrganizationUsage",
+    "CampaignDailyStats",
+    "OrganizationHourlyStats",
+    "AnalyticsCheckpoint",
 ]
\ No newline at end of file
@@ -0,0 +1,85 @@
+from sqlalchemy import (
+    Column,
+    String,
+    ForeignKey,
+    Integer,
+    BigInteger,
+    Date,
+    DateTime,
+    JSON,
+    Identity,
+    Index,
+    Table,
+    UniqueConstraint,
+    func,
+    text,
+)
+
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
+
+
+# Append-only log of campaign and pass events (send, open, redeem, geo_trigger).
+# Rows are only ever inserted in batches and read by the rollup, which walks
+# the table in (`txid`, `id`) order; there are no foreign keys so inserts stay
+# cheap. `txid` is the inserting transaction: ids are taken before commit, so
+# a later id can commit first, but once a transaction id is older than every
+# running transaction no more rows with it can appear.
+analytics_event = Table(
+    "analytics_event",
+    Model.metadata,
+    Column("id", BigInteger, Identity(), primary_key=True),
+    Column("event_type", String, nullable=False),
+    Column("organization_id", UUIDKey, nullable=False),
+    Column("campaign_id", UUIDKey, nullable=True),
+    Column("wallet_pass_id", UUIDKey, nullable=True),
+    Column("customer_id", UUIDKey, nullable=True),
+    Column("occurred_at", DateTime, nullable=False),
+    Column("received_at", DateTime, nullable=False, server_default=func.clock_timestamp()),
+    Column("data", JSON, nullable=True),
+    Column(
+        "txid", BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint")
+    ),
+    Index("ix_analytics_event_txid_id", "txid", "id"),
+)
+
+
+class CampaignDailyStats(TenantScoped, Model):
+    """Per-campaign, per-day event counts rolled up from `analytics_event`."""
+    
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day"),
+    )
+    
+    campaign_id = Column(UUIDKey, ForeignKey("campaign.id"), nullable=False)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False, index=True)
+    day = Column(Date, nullable=False)
+    
+    sends = Column(Integer, nullable=False, default=0)
+    opens = Column(Integer, nullable=False, default=0)
+    redemptions = Column(Integer, nullable=False, default=0)
+    geo_triggers = Column(Integer, nullable=False, default=0)
+
+
+class OrganizationHourlyStats(TenantScoped, Model):
+    """Per-organization, per-hour event counts rolled up from `analytics_event`."""
+    
+    __table_args__ = (
+        UniqueConstraint("organization_id", "hour"),
+    )
+    
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False)
+    hour = Column(DateTime, nullable=False)  # Start of the hour, UTC
+    
+    sends = Column(Integer, nullable=False, default=0)
+    opens = Column(Integer, nullable=False, default=0)
+    redemptions = Column(Integer, nullable=False, default=0)
+    geo_triggers = Column(Integer, nullable=False, default=0)
+
+
+class AnalyticsCheckpoint(Model):
+    """Position of a consumer of `analytics_event` (the last event it processed)."""
+    
+    name = Column(String, nullable=False, unique=True)
+    last_txid = Column(BigInteger, nullable=False, default=0)
+    last_event_id = Column(BigInteger, nullable=False, default=0)
@@ -1,25 +1,90 @@
 from __future__ import annotations
 
-from typing import TypeVar, Union, List, Any, Generic, Optional, Type
+from datetime import datetime
+from typing import TypeVar, Union, List, Any, Dict, Generic, Optional, Tuple, Type
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy import (
     Column,
     DateTime,
+    bindparam,
     func,
     select,
-    String
 )
 from sqlalchemy.dialects.postgresql import UUID
 
-from app.utils import pascal_to_snake, generate_uuid
+from app.utils import pascal_to_snake, generate_uuid, is_uuid
 from app.database.database import Base, AsyncSession
 
 T = TypeVar('T', bound='CRUDMixin')
 
+# Type of primary and foreign keys: native 16-byte UUIDs in the database,
+# plain strings in the application
+UUIDKey = UUID(as_uuid=False)
+
+# Statements of the CRUD lookups by model and query shape. Statements are
+# immutable, so they are built once and shared by every request and task;
+# only the bound values change, which also keeps SQLAlchemy's compiled
+# cache lookup cheap.
+_statements: Dict[Tuple, Any] = {}
+
 class CRUDMixin(Generic[T]):
-    """Mixin that adds convenience methods for CRUD (create, read, update, delete) operations."""
+    """
+    Mixin that adds convenience methods for CRUD (create, read, update, delete) operations.
+    
+    Reads only return live rows: rows with `deleted_at` set are tombstones
+    left by `soft_delete` and are skipped unless `include_deleted=True`.
+    """
+    
+    @classmethod
+    def scoped_select(cls, include_deleted: bool = False):
+        """Select rows of this model, excluding soft-deleted ones by default."""
+        query = select(cls)
+        if not include_deleted and hasattr(cls, "deleted_at"):
+            query = query.where(cls.deleted_at.is_(None))
+        return query
+    
+    @classmethod
+    def cached_select(
+        cls, filters: Dict[str, Any], include_deleted: bool = False, paged: bool = False
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Get the (shared) statement selecting rows equal to `filters`, with its parameters.
+
+        Args:
+            filters: Column values to match; None matches NULL, like `filter_by`.
+            include_deleted: Include soft-deleted rows.
+            paged: Add `skip`/`limit` bind parameters for offset and limit.
+
+        Returns:
+            tuple: The statement and the parameters to execute it with.
+        """
+        shape = tuple(sorted((name, filters[name] is None) for name in filters))
+        key = (cls, shape, include_deleted, paged)
+        statement = _statements.get(key)
+        if statement is not None:
+            return statement, {name: value for name, value in filters.items() if value is not None}
+
+        columns = cls.__table__.c
+        cacheable = all(name in columns for name, _ in shape)
+        if cacheable:
+            statement = cls.scoped_select(include_deleted).where(
+                *(
+                    columns[name].is_(None) if is_null else columns[name] == bindparam(name)
+                    for name, is_null in shape
+                )
+            )
+            params = {name: value for name, value in filters.items() if value is not None}
+        else:
+            # Relationships and other attributes: not cached
+            statement = cls.scoped_select(include_deleted).filter_by(**filters)
+            params = {}
+        if paged:
+            statement = statement.offset(bindparam("skip")).limit(bindparam("limit"))
+        if cacheable:
+            _statements[key] = statement
+        return statement, params
     
     @classmethod
     async def create(cls: Type[T], db: AsyncSession, commit: bool = True, **kwargs) -> T:
@@ -35,32 +100,42 @@ class CRUDMixin(Generic[T]):
         return instance
 
     @classmethod
-    async def get_by_id(cls, db: AsyncSession, id_: str) -> Optional[T]:
-        return (
-            await db.execute(
-                select(cls).filter_by(id=id_)
-            )
-        ).scalar()
+    async def get_by_id(cls, db: AsyncSession, id_: str, include_deleted: bool = False) -> Optional[T]:
+        # Ids come from URLs; the database rejects anything that isn't a UUID
+        if not is_uuid(id_):
+            return None
+        statement, params = cls.cached_select({"id": id_}, include_deleted)
+        return (await db.execute(statement, params)).scalar()
     
     @classmethod
-    async def get(cls, db: AsyncSession, first: bool = True, options: list = None, **kwargs) -> Optional[Union[T, List[T]]]:
-        query = select(cls).filter_by(**kwargs)
+    async def get(
+        cls,
+        db: AsyncSession,
+        first: bool = True,
+        options: list = None,
+        include_deleted: bool = False,
+        **kwargs,
+    ) -> Optional[Union[T, List[T]]]:
+        query, params = cls.cached_select(kwargs, include_deleted)
         if options:
             query = query.options(*options)
-        result = await db.execute(query)
+        result = await db.execute(query, params)
         return result.scalars().all() if not first else result.scalar()
     
     @classmethod
-    async def get_all(cls, db: AsyncSession) -> List[T]:
-        result = await db.execute(select(cls))
+    async def get_all(cls, db: AsyncSession, include_deleted: bool = False) -> List[T]:
+        statement, params = cls.cached_select({}, include_deleted)
+        result = await db.execute(statement, params)
         return result.scalars().all()
         
     @classmethod
-    async def filter(cls, db: AsyncSession, skip: int = 0, limit: int = 10, **filters) -> List[T]:
-        query = select(cls).filter_by(**filters)
+    async def filter(
+        cls, db: AsyncSession, skip: int = 0, limit: int = 10, include_deleted: bool = False, **filters
+    ) -> List[T]:
+        query, params = cls.cached_select(filters, include_deleted, paged=True)
         # for attr, value in filters.items():
         #     query = query.filter(getattr(cls, attr) == value)
-        result = await db.execute(query.offset(skip).limit(limit))
+        result = await db.execute(query, {**params, "skip": skip, "limit": limit})
         return result.scalars().all()
 
     async def update(self, db: AsyncSession, commit: bool = True, attr_names: list = None, **kwargs) -> T:
@@ -89,6 +164,14 @@ class CRUDMixin(Generic[T]):
 
         return self
 
+    async def soft_delete(self, db: AsyncSession, commit: bool = True) -> T:
+        """Mark the record as deleted; the tombstone is purged after TOMBSTONE_RETENTION_DAYS."""
+        return await self.update(db, commit=commit, deleted_at=datetime.utcnow())
+    
+    async def restore(self, db: AsyncSession, commit: bool = True) -> T:
+        """Bring back a soft-deleted record."""
+        return await self.update(db, commit=commit, deleted_at=None)
+    
     async def delete(self, db: AsyncSession, commit: bool = True) -> bool:
         """Remove the record from the database."""
         try:
@@ -107,7 +190,7 @@ class CRUDMixin(Generic[T]):
 class Model(CRUDMixin, Base):
     __abstract__ = True
     
-    id = Column(String, primary_key=True, default=generate_uuid)
+    id = Column(UUIDKey, primary_key=True, default=generate_uuid)
     created_at = Column(DateTime, default=func.now(), index=True)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
     deleted_at = Column(DateTime, nullable=True, index=True)
@@ -1,23 +1,24 @@
 from sqlalchemy import Column, String, ForeignKey, Boolean, DateTime, JSON, Integer, Float, Text
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
 from app.database.models.customer import customer_campaign
 
 
-class Campaign(Model):
+class Campaign(TenantScoped, Model):
     """Campaign model for promotional activities and geo-targeting."""
     
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     
     # Organization and creator
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
-    created_by_id = Column(String, ForeignKey("user.id"), nullable=False)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False, index=True)
+    created_by_id = Column(UUIDKey, ForeignKey("user.id"), nullable=False)
     
     # Campaign type and settings
     campaign_type = Column(String, nullable=False, default="standard")  # standard, geo, event, promo
-    template_id = Column(String, ForeignKey("wallet_pass_template.id"), nullable=True)
+    template_id = Column(UUIDKey, ForeignKey("wallet_pass_template.id"), nullable=True)
     
     # Standard campaign settings
     content = Column(Text, nullable=True)
@@ -29,7 +30,7 @@ class Campaign(Model):
     geo_latitude = Column(Float, nullable=True)
     geo_longitude = Column(Float, nullable=True)
     geo_trigger_message = Column(String, nullable=True)
-    location_id = Column(String, ForeignKey("location.id"), nullable=True)
+    location_id = Column(UUIDKey, ForeignKey("location.id"), nullable=True)
     
     # Targeting settings
     targeting_criteria = Column(JSON, nullable=True)
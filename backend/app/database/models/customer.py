@@ -1,21 +1,36 @@
-from sqlalchemy import Column, String, ForeignKey, Boolean, DateTime, JSON, Table
+from sqlalchemy import Column, String, ForeignKey, Boolean, DateTime, JSON, Table, Index, text
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
 
 
-# Many-to-many association table for customers and campaigns
+# Many-to-many association table for customers and campaigns. It carries the
+# organization so it can be partitioned with customers (see
+# `app.database.partitioning`), so rows are inserted explicitly rather than
+# appended through the relationships.
 customer_campaign = Table(
     "customer_campaign",
     Model.metadata,
-    Column("customer_id", String, ForeignKey("customer.id"), primary_key=True),
-    Column("campaign_id", String, ForeignKey("campaign.id"), primary_key=True),
+    Column("customer_id", UUIDKey, ForeignKey("customer.id"), primary_key=True),
+    Column("campaign_id", UUIDKey, ForeignKey("campaign.id"), primary_key=True),
+    Column("organization_id", UUIDKey, ForeignKey("organization.id"), nullable=False),
 )
 
 
-class Customer(Model):
+class Customer(TenantScoped, Model):
     """Customer model representing end-users who receive passes."""
     
+    __table_args__ = (
+        # Live customers of an organization, by email (lists, imports, duplicate checks)
+        Index(
+            "ix_customer_organization_id_email_live",
+            "organization_id",
+            "email",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
+    
     email = Column(String, nullable=False, index=True)
     phone = Column(String, nullable=True, index=True)
     full_name = Column(String, nullable=True)
@@ -23,7 +38,7 @@ class Customer(Model):
     last_name = Column(String, nullable=True)
     
     # Organization relationship
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False)
     
     # Contact preferences
     email_opt_in = Column(Boolean, default=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
+
+
+class DeviceRegistration(TenantScoped, Model):
+    """Device registered to receive push updates for a wallet pass."""
+    
+    __table_args__ = (
+        UniqueConstraint("device_library_identifier", "wallet_pass_id"),
+    )
+    
+    device_library_identifier = Column(String, nullable=False, index=True)
+    push_token = Column(String, nullable=False, index=True)
+    pass_type_identifier = Column(String, nullable=False)
+    platform = Column(String, nullable=False, default="apple")  # apple, google
+    
+    wallet_pass_id = Column(UUIDKey, ForeignKey("wallet_pass.id"), nullable=False, index=True)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False, index=True)
+    
+    # Relationships
+    wallet_pass = relationship("WalletPass", back_populates="device_registrations")
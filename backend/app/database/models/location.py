@@ -1,12 +1,21 @@
-from sqlalchemy import Column, String, ForeignKey, Boolean, Float, Integer, JSON
+from sqlalchemy import Column, String, ForeignKey, Boolean, Float, Integer, JSON, Index, text
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
 
 
-class Location(Model):
+class Location(TenantScoped, Model):
     """Location model for geo-targeting campaigns."""
     
+    __table_args__ = (
+        Index(
+            "ix_location_organization_id_live",
+            "organization_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
+    
     name = Column(String, nullable=False)
     address = Column(String, nullable=True)
     city = Column(String, nullable=True)
@@ -20,7 +29,7 @@ class Location(Model):
     radius = Column(Float, nullable=False, default=100.0)  # in meters
     
     # Organization
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False)
     
     # Beacon information
     beacon_uuid = Column(String, nullable=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, ForeignKey, Integer, DateTime
+
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
+
+
+class OrganizationUsage(TenantScoped, Model):
+    """Running counts of an organization's quota-limited resources."""
+    
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False, unique=True)
+    
+    # Kept in step with inserts and voids by app.services.quotas
+    active_passes = Column(Integer, nullable=False, default=0)
+    customers = Column(Integer, nullable=False, default=0)
+    campaigns = Column(Integer, nullable=False, default=0)
+    
+    # Lifetime totals, maintained by the analytics rollup
+    passes_issued = Column(Integer, nullable=False, default=0)
+    passes_redeemed = Column(Integer, nullable=False, default=0)
+    
+    reconciled_at = Column(DateTime, nullable=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, JSON, Identity, Table, func
+
+from app.database.models.base import Model
+
+
+# Soft-deleted rows moved out of their tables by the tombstone purger, kept
+# as JSON for audits and manual restores. Like `analytics_event` it has no
+# foreign keys, so archiving never depends on the rows it came from.
+archived_row = Table(
+    "archived_row",
+    Model.metadata,
+    Column("id", BigInteger, Identity(), primary_key=True),
+    Column("table_name", String, nullable=False),
+    Column("row_id", String, nullable=False, index=True),
+    Column("organization_id", String, nullable=True, index=True),
+    Column("data", JSON, nullable=False),
+    Column("deleted_at", DateTime, nullable=True),
+    Column("archived_at", DateTime, nullable=False, server_default=func.now()),
+)
@@ -1,7 +1,7 @@
-from sqlalchemy import Boolean, Column, String, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
 
 
 class User(Model):
@@ -12,9 +12,14 @@ class User(Model):
     full_name = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=True)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=True)
+    # Carried by tokens as `ver`; bumped to revoke the tokens issued so far
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     organization = relationship("Organization", back_populates="users")
     pass_templates = relationship("WalletPassTemplate", back_populates="created_by")
-    campaigns = relationship("Campaign", back_populates="created_by")
\ No newline at end of file
+    campaigns = relationship("Campaign", back_populates="created_by")
+
+    # Changing these (the password or a claim access tokens carry) revokes the user's tokens
+    TOKEN_CLAIM_FIELDS = ("hashed_password", "is_active", "is_superuser", "organization_id")
\ No newline at end of file
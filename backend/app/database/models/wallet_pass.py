@@ -1,20 +1,42 @@
-from sqlalchemy import Column, String, ForeignKey, Boolean, JSON, DateTime
+from sqlalchemy import Column, String, ForeignKey, Boolean, JSON, DateTime, Index, text
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
 
 
-class WalletPass(Model):
+class WalletPass(TenantScoped, Model):
     """Individual wallet pass for a customer."""
     
+    __table_args__ = (
+        # Newest change per template (scanner snapshots) and deltas since a tag
+        Index("ix_wallet_pass_template_id_last_updated_tag", "template_id", "last_updated_tag"),
+        # Live passes of an organization (pass lists, quota recounts)
+        Index(
+            "ix_wallet_pass_organization_id_live",
+            "organization_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # One pass per customer and batch job, however often the job runs
+        Index(
+            "ux_wallet_pass_batch_job_id_customer_id",
+            "batch_job_id",
+            "customer_id",
+            unique=True,
+            postgresql_where=text("batch_job_id IS NOT NULL"),
+        ),
+    )
+    
     serial_number = Column(String, nullable=False, unique=True, index=True)
     pass_type_identifier = Column(String, nullable=False)
     authentication_token = Column(String, nullable=False)
     
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
-    template_id = Column(String, ForeignKey("wallet_pass_template.id"), nullable=False)
-    customer_id = Column(String, ForeignKey("customer.id"), nullable=False)
-    campaign_id = Column(String, ForeignKey("campaign.id"), nullable=True)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False)
+    template_id = Column(UUIDKey, ForeignKey("wallet_pass_template.id"), nullable=False)
+    customer_id = Column(UUIDKey, ForeignKey("customer.id"), nullable=False)
+    campaign_id = Column(UUIDKey, ForeignKey("campaign.id"), nullable=True)
+    # Batch issuance job that issued the pass (jobs are not database rows)
+    batch_job_id = Column(UUIDKey, nullable=True)
     
     # Pass data (customized fields from template)
     pass_data = Column(JSON, nullable=False, default=dict)
@@ -39,5 +61,6 @@ class WalletPass(Model):
     # Relationships
     organization = relationship("Organization", back_populates="passes")
     template = relationship("WalletPassTemplate", back_populates="passes")
-    customer = relationship("Customer", back_populates="passes")
-    campaign = relationship("Campaign", back_populates="passes")
\ No newline at end of file
+    customer = relationship("Customer", back_populates="wallet_passes")
+    campaign = relationship("Campaign", back_populates="passes")
+    device_registrations = relationship("DeviceRegistration", back_populates="wallet_pass")
\ No newline at end of file
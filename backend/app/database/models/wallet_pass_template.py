@@ -1,17 +1,18 @@
 from sqlalchemy import Column, String, JSON, ForeignKey, Boolean, Text
 from sqlalchemy.orm import relationship
 
-from app.database.models.base import Model
+from app.database.models.base import Model, UUIDKey
+from app.database.tenancy import TenantScoped
 
 
-class WalletPassTemplate(Model):
+class WalletPassTemplate(TenantScoped, Model):
     """Template for wallet passes that can be used to create individual passes."""
     
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     pass_type = Column(String, nullable=False, default="generic")  # generic, coupon, eventTicket, boardingPass, storeCard
-    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
-    created_by_id = Column(String, ForeignKey("user.id"), nullable=False)
+    organization_id = Column(UUIDKey, ForeignKey("organization.id"), nullable=False)
+    created_by_id = Column(UUIDKey, ForeignKey("user.id"), nullable=False)
     
     # Template design settings
     design = Column(JSON, nullable=False, default=dict)
@@ -53,4 +54,4 @@ class WalletPassTemplate(Model):
     # Relationships
     organization = relationship("Organization", back_populates="pass_templates")
     created_by = relationship("User", back_populates="pass_templates")
-    passes = relationship("Pass", back_populates="template")
\ No newline at end of file
+    passes = relationship("WalletPass", back_populates="template")
\ No newline at end of file
@@ -0,0 +1,438 @@
+"""
+Optional partitioning of the largest tenant tables by organization.
+
+`customer`, `customer_campaign` and `wallet_pass` can be converted into
+partitioned tables with the same name:
+
+    <table>                     PARTITION BY LIST (organization_id)
+      <table>_org_<id>          one tenant, FOR VALUES IN ('<id>')
+      <table>_shared            DEFAULT, PARTITION BY HASH (organization_id)
+        <table>_shared_p00..NN  FOR VALUES WITH (MODULUS N, REMAINDER i)
+
+Every tenant starts in the hash-partitioned default partition;
+`isolate_tenant` moves a large tenant into its own list partition. Queries
+are tenant-scoped (see `app.database.tenancy`), so they prune to a single
+partition, and each partition is vacuumed and analyzed on its own.
+
+Postgres requires the partition key in every primary key, unique index
+and foreign key of a partitioned table, so the converted tables have
+composite primary keys `(id, organization_id)`, unique indexes include
+`organization_id`, and foreign keys to them become
+`(<column>, organization_id)`. Serial numbers stay unique through their
+generation (UUID4). The ORM models are unchanged: they still identify
+rows by `id`.
+
+The DDL can be printed with `python -m app.partitions plan` (e.g. to paste
+into a migration) or applied with `python -m app.partitions convert`.
+"""
+import logging
+import re
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, UniqueConstraint, text
+from sqlalchemy.dialects import postgresql
+
+from app.database import models  # noqa: F401  (registers every table)
+from app.database.database import metadata, sessionmanager
+
+
+logger = logging.getLogger(__name__)
+
+PARTITION_KEY = "organization_id"
+# Converted in this order: a table's foreign keys can only point at tables
+# that are already partitioned
+PARTITIONED_TABLES = ("customer", "customer_campaign", "wallet_pass")
+DEFAULT_HASH_PARTITIONS = 16
+COPY_BATCH_SIZE = 5000
+# Rows updated shortly before the copy started are copied again at the swap,
+# covering transactions that were still open when it started
+CATCH_UP_MARGIN = timedelta(minutes=15)
+# Columns that tables created before they existed lack, and how to fill them
+BACKFILL = {
+    "customer_campaign": {
+        "organization_id": "(SELECT c.organization_id FROM customer c WHERE c.id = src.customer_id)",
+    },
+}
+
+_dialect = postgresql.dialect()
+
+
+class PartitioningError(Exception):
+    """Raised when a table cannot be converted or a tenant cannot be isolated."""
+
+
+def _name(base: str, suffix: str = "") -> str:
+    # Postgres truncates identifiers to 63 bytes
+    return base[:63 - len(suffix)] + suffix
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _columns(names: List[str], prefix: str = "") -> str:
+    return ", ".join(prefix + name for name in names)
+
+
+def _table(name: str) -> Table:
+    if name not in PARTITIONED_TABLES:
+        raise PartitioningError(f"{name} is not one of {', '.join(PARTITIONED_TABLES)}")
+    return metadata.tables[name]
+
+
+def _primary_key(table: Table) -> List[str]:
+    columns = [column.name for column in table.primary_key.columns]
+    return columns if PARTITION_KEY in columns else columns + [PARTITION_KEY]
+
+
+def tenant_partition_name(table_name: str, organization_id: str) -> str:
+    """Name of the partition holding one tenant's rows of a table."""
+    return _name(f"{table_name}_org_{re.sub(r'[^a-z0-9]', '', organization_id.lower())}")
+
+
+def _index_definitions(table: Table) -> List[Tuple[str, bool, List[str], Optional[str]]]:
+    definitions = []
+    for index in table.indexes:
+        where = index.dialect_options["postgresql"]["where"]
+        if where is not None:
+            where = str(where.compile(dialect=_dialect, compile_kwargs={"literal_binds": True}))
+        definitions.append((index.name, index.unique, [column.name for column in index.expressions], where))
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = [column.name for column in constraint.columns]
+            name = constraint.name or _name(f"{table.name}_{'_'.join(columns)}_key")
+            definitions.append((name, True, columns, None))
+
+    partition_aware = []
+    for name, unique, columns, where in definitions:
+        if PARTITION_KEY not in columns:
+            # Unique indexes must contain the partition key; other indexes
+            # lead with it because the shared partitions hold many tenants
+            columns = columns + [PARTITION_KEY] if unique else [PARTITION_KEY] + columns
+        partition_aware.append((name, unique, columns, where))
+    return partition_aware
+
+
+def _foreign_key_definition(table: Table, foreign_key: Any, has_partition_key: bool = True) -> Tuple[str, Optional[str]]:
+    columns = [column.name for column in foreign_key.columns]
+    referred = foreign_key.referred_table.name
+    referred_columns = [element.column.name for element in foreign_key.elements]
+    name = _name(f"{table.name}_{'_'.join(columns)}_fkey")
+    if referred not in PARTITIONED_TABLES:
+        return name, f"FOREIGN KEY ({_columns(columns)}) REFERENCES {referred} ({_columns(referred_columns)})"
+    if not has_partition_key:
+        return name, None
+    # Deferrable so isolate_tenant can move referenced rows between partitions
+    return name, (
+        f"FOREIGN KEY ({_columns(columns + [PARTITION_KEY])}) "
+        f"REFERENCES {referred} ({_columns(referred_columns + [PARTITION_KEY])}) "
+        "DEFERRABLE INITIALLY IMMEDIATE"
+    )
+
+
+def partitioned_table_ddl(table_name: str, partitions: int = DEFAULT_HASH_PARTITIONS) -> List[str]:
+    """
+    Statements creating the partitioned replacement of a table, `<table>_new`.
+
+    Args:
+        table_name: One of PARTITIONED_TABLES.
+        partitions: Number of hash partitions shared by tenants without their own.
+
+    Returns:
+        list: DDL statements, in order.
+    """
+    table = _table(table_name)
+    new = f"{table_name}_new"
+    columns = [
+        f"{column.name} {column.type.compile(dialect=_dialect)}{'' if column.nullable else ' NOT NULL'}"
+        for column in table.columns
+    ]
+    statements = [
+        f"CREATE TABLE {new} ({', '.join(columns)}, "
+        f"CONSTRAINT {_name(f'{table_name}_pkey', '_new')} PRIMARY KEY ({_columns(_primary_key(table))})) "
+        f"PARTITION BY LIST ({PARTITION_KEY})",
+        f"CREATE TABLE {table_name}_shared PARTITION OF {new} DEFAULT PARTITION BY HASH ({PARTITION_KEY})",
+    ]
+    statements.extend(
+        f"CREATE TABLE {table_name}_shared_p{remainder:02d} PARTITION OF {table_name}_shared "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    )
+    # Created on the parent, so every partition (including later ones) gets them
+    for name, unique, index_columns, where in _index_definitions(table):
+        statements.append(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {_name(name, '_new')} "
+            f"ON {new} ({_columns(index_columns)}){f' WHERE {where}' if where else ''}"
+        )
+    # Created while empty, so adding them costs nothing; copied rows are checked on insert
+    for foreign_key in table.foreign_key_constraints:
+        name, definition = _foreign_key_definition(table, foreign_key)
+        statements.append(f"ALTER TABLE {new} ADD CONSTRAINT {name} {definition}")
+    return statements
+
+
+async def _fetch_column(conn: Any, query: str, **params) -> List[Any]:
+    return list((await conn.execute(text(query), params)).scalars())
+
+
+async def is_partitioned(conn: Any, table_name: str) -> bool:
+    return bool(await _fetch_column(
+        conn,
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace",
+        name=table_name,
+    ))
+
+
+async def _existing_columns(conn: Any, table_name: str) -> List[str]:
+    return await _fetch_column(
+        conn,
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :name",
+        name=table_name,
+    )
+
+
+async def _copy_rows(table_name: str, batch_size: int) -> int:
+    table = _table(table_name)
+    columns = [column.name for column in table.columns]
+    key = [column.name for column in table.primary_key.columns]
+    async with sessionmanager.connect() as conn:
+        existing = set(await _existing_columns(conn, table_name))
+    sources = [
+        f"src.{name}" if name in existing else BACKFILL[table_name][name]
+        for name in columns
+    ]
+
+    copied = 0
+    last: Optional[Tuple] = None
+    while True:
+        params: Dict[str, Any] = {"limit": batch_size}
+        after = ""
+        if last is not None:
+            params.update({f"k{i}": value for i, value in enumerate(last)})
+            after = f"WHERE ({_columns(key, 'src.')}) > ({_columns([f'k{i}' for i in range(len(key))], ':')})"
+        async with sessionmanager.connect() as conn:
+            rows = (
+                await conn.execute(
+                    text(
+                        f"INSERT INTO {table_name}_new ({_columns(columns)}) "
+                        f"SELECT {', '.join(sources)} FROM {table_name} src {after} "
+                        f"ORDER BY {_columns(key, 'src.')} LIMIT :limit "
+                        f"RETURNING {_columns(key)}"
+                    ),
+                    params,
+                )
+            ).all()
+        if not rows:
+            return copied
+        copied += len(rows)
+        last = max(tuple(row) for row in rows)
+        logger.info("Copied %d %s rows", copied, table_name)
+
+
+async def _catch_up(conn: Any, table_name: str, since: Any) -> None:
+    # Rows written during the copy; the table is locked, so nothing is missed
+    table = _table(table_name)
+    columns = [column.name for column in table.columns]
+    existing = set(await _existing_columns(conn, table_name))
+    sources = [f"src.{name}" if name in existing else BACKFILL[table_name][name] for name in columns]
+    insert = (
+        f"INSERT INTO {table_name}_new ({_columns(columns)}) SELECT {', '.join(sources)} FROM {table_name} src"
+    )
+    conflict = f"ON CONFLICT ({_columns(_primary_key(table))})"
+    if "updated_at" in existing:
+        updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in columns)
+        await conn.execute(
+            text(f"{insert} WHERE src.updated_at >= :since {conflict} DO UPDATE SET {updates}"),
+            {"since": since},
+        )
+    else:
+        # Association rows are never updated, only inserted
+        await conn.execute(text(f"{insert} {conflict} DO NOTHING"))
+
+
+async def _swap(conn: Any, table_name: str) -> List[Tuple[str, str]]:
+    old_indexes = await _fetch_column(
+        conn,
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :name",
+        name=table_name,
+    )
+    await conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {table_name}_old"))
+    for index in old_indexes:
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {_name(index, '_old')}"))
+
+    await conn.execute(text(f"ALTER TABLE {table_name}_new RENAME TO {table_name}"))
+    new_indexes = await _fetch_column(
+        conn,
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :name",
+        name=table_name,
+    )
+    for index in new_indexes:
+        if index.endswith("_new"):
+            await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index[:-len('_new')]}"))
+
+    # Foreign keys follow the renamed table; point them at the new one
+    repointed = []
+    existing = set(await _existing_tables(conn))
+    for other in metadata.sorted_tables:
+        if other.name == table_name or other.name not in existing:
+            continue
+        has_partition_key = PARTITION_KEY in await _existing_columns(conn, other.name)
+        for foreign_key in other.foreign_key_constraints:
+            if foreign_key.referred_table.name != table_name:
+                continue
+            name, definition = _foreign_key_definition(other, foreign_key, has_partition_key)
+            await conn.execute(text(f"ALTER TABLE {other.name} DROP CONSTRAINT IF EXISTS {name}"))
+            if definition is None:
+                # Added back when that table is converted with the partition key
+                logger.warning("Dropped %s.%s until %s is converted", other.name, name, other.name)
+                continue
+            await conn.execute(text(f"ALTER TABLE {other.name} ADD CONSTRAINT {name} {definition} NOT VALID"))
+            repointed.append((other.name, name))
+    return repointed
+
+
+async def _existing_tables(conn: Any) -> List[str]:
+    return await _fetch_column(
+        conn, "SELECT tablename FROM pg_tables WHERE schemaname = current_schema()"
+    )
+
+
+async def convert_table(
+    table_name: str, partitions: int = DEFAULT_HASH_PARTITIONS, batch_size: int = COPY_BATCH_SIZE
+) -> int:
+    """
+    Convert a table into its partitioned layout.
+
+    The partitioned copy is created next to the table and filled in
+    batches without blocking the application. The swap then takes an
+    ACCESS EXCLUSIVE lock just long enough to copy the rows written in the
+    meantime and rename the tables; foreign keys of other tables are
+    re-added NOT VALID and validated afterwards. The original table is kept
+    as `<table>_old` until `drop_old_table`. Pause the tombstone purger
+    while converting: rows it deletes during the copy would be kept.
+
+    Args:
+        table_name: One of PARTITIONED_TABLES; convert them in that order.
+        partitions: Number of hash partitions for tenants without their own.
+        batch_size: Rows copied per transaction.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    position = PARTITIONED_TABLES.index(_table(table_name).name)
+    async with sessionmanager.connect() as conn:
+        if await is_partitioned(conn, table_name):
+            raise PartitioningError(f"{table_name} is already partitioned")
+        for earlier in PARTITIONED_TABLES[:position]:
+            if not await is_partitioned(conn, earlier):
+                raise PartitioningError(f"Convert {earlier} before {table_name}")
+        started = (await conn.execute(text("SELECT timezone('utc', now())"))).scalar()
+        for statement in partitioned_table_ddl(table_name, partitions):
+            await conn.execute(text(statement))
+
+    copied = await _copy_rows(table_name, batch_size)
+
+    async with sessionmanager.connect() as conn:
+        await conn.execute(text(f"LOCK TABLE {table_name} IN ACCESS EXCLUSIVE MODE"))
+        await _catch_up(conn, table_name, started - CATCH_UP_MARGIN)
+        repointed = await _swap(conn, table_name)
+
+    async with sessionmanager.connect() as conn:
+        for other, constraint in repointed:
+            await conn.execute(text(f"ALTER TABLE {other} VALIDATE CONSTRAINT {constraint}"))
+        await conn.execute(text(f"ANALYZE {table_name}"))
+    logger.info("Partitioned %s (%d rows, %d hash partitions)", table_name, copied, partitions)
+    return copied
+
+
+async def drop_old_table(table_name: str) -> None:
+    """Drop the unpartitioned original kept by `convert_table`."""
+    _table(table_name)
+    async with sessionmanager.connect() as conn:
+        await conn.execute(text(f"DROP TABLE {table_name}_old"))
+
+
+async def isolate_tenant(organization_id: str) -> List[str]:
+    """
+    Move one organization's rows into partitions of their own.
+
+    For each partitioned table the tenant's rows are copied into a new table,
+    deleted from the shared partitions and the table is attached as the
+    tenant's list partition, all in one transaction with foreign keys
+    deferred to commit. Attaching scans the shared partitions to check that
+    none of the tenant's rows are left there, under a lock that blocks
+    writes of tenants in the shared partitions; run it off-peak.
+
+    Returns:
+        list: The partitions created.
+    """
+    created = []
+    async with sessionmanager.connect() as conn:
+        await conn.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+        existing = set(await _existing_tables(conn))
+        for table_name in PARTITIONED_TABLES:
+            if not await is_partitioned(conn, table_name):
+                raise PartitioningError(f"{table_name} is not partitioned")
+            partition = tenant_partition_name(table_name, organization_id)
+            if partition in existing:
+                continue
+            params = {"organization_id": organization_id}
+            await conn.execute(text(f"CREATE TABLE {partition} (LIKE {table_name} INCLUDING DEFAULTS)"))
+            await conn.execute(
+                text(f"INSERT INTO {partition} SELECT * FROM {table_name} WHERE {PARTITION_KEY} = :organization_id"),
+                params,
+            )
+            await conn.execute(
+                text(f"DELETE FROM {table_name} WHERE {PARTITION_KEY} = :organization_id"), params
+            )
+            # Lets the attach skip scanning the new partition
+            await conn.execute(text(
+                f"ALTER TABLE {partition} ADD CONSTRAINT {_name(partition, '_tenant')} "
+                f"CHECK ({PARTITION_KEY} IS NOT NULL AND {PARTITION_KEY} = {_literal(organization_id)})"
+            ))
+            await conn.execute(text(
+                f"ALTER TABLE {table_name} ATTACH PARTITION {partition} "
+                f"FOR VALUES IN ({_literal(organization_id)})"
+            ))
+            created.append(partition)
+    for partition in created:
+        logger.info("Created tenant partition %s", partition)
+    return created
+
+
+async def partition_status() -> List[Dict[str, Any]]:
+    """Partitions of the partitioned tables with their bounds, estimated rows and size."""
+    parents = [*PARTITIONED_TABLES, *(f"{name}_shared" for name in PARTITIONED_TABLES)]
+    async with sessionmanager.connect() as conn:
+        rows = await conn.execute(
+            text(
+                "SELECT parent.relname AS parent, child.relname AS partition, "
+                "pg_get_expr(child.relpartbound, child.oid) AS bound, "
+                "child.reltuples::bigint AS estimated_rows, "
+                "pg_total_relation_size(child.oid) AS total_bytes "
+                "FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = ANY(:parents) "
+                "AND parent.relnamespace = current_schema()::regnamespace "
+                "ORDER BY parent.relname, child.relname"
+            ),
+            {"parents": parents},
+        )
+        return [dict(row._mapping) for row in rows]
+
+
+async def largest_tenants(limit: int = 10) -> List[Dict[str, Any]]:
+    """Organizations with the most passes and customers, from the usage counters."""
+    async with sessionmanager.connect() as conn:
+        rows = await conn.execute(
+            text(
+                "SELECT organization_id, active_passes, customers FROM organization_usage "
+                "ORDER BY active_passes + customers DESC LIMIT :limit"
+            ),
+            {"limit": limit},
+        )
+        return [dict(row._mapping) for row in rows]
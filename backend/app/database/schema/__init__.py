@@ -4,4 +4,9 @@ from .wallet_pass_template import *
 from .wallet_pass import *
 from .customer import *
 from .campaign import *
-from .location import *
\ No newline at end of file
+from .location import *
+from .device_registration import *
+from .job import *
+from .analytics import *
+from .stats import *
+from .scan import *
\ No newline at end of file
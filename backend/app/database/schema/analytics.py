@@ -0,0 +1,32 @@
+from typing import List, Optional, Dict, Any
+from datetime import date, datetime
+from pydantic import BaseModel
+
+from app.database.enums import AnalyticsEventType
+from app.utils import UUIDStr
+
+
+# Event reported by a client (scanner, app or wallet integration)
+class AnalyticsEventCreate(BaseModel):
+    event_type: AnalyticsEventType
+    campaign_id: Optional[UUIDStr] = None
+    wallet_pass_id: Optional[UUIDStr] = None
+    customer_id: Optional[UUIDStr] = None
+    occurred_at: Optional[datetime] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class AnalyticsEventBatch(BaseModel):
+    events: List[AnalyticsEventCreate]
+
+
+# Rolled-up event counts of a campaign for one day
+class CampaignDailyStats(BaseModel):
+    day: date
+    sends: int = 0
+    opens: int = 0
+    redemptions: int = 0
+    geo_triggers: int = 0
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,13 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+# Body sent by a device when it registers for pass updates
+class DeviceRegistrationCreate(BaseModel):
+    push_token: str = Field(alias="pushToken")
+
+
+# Serial numbers of the passes updated since a device last checked
+class UpdatedSerialNumbers(BaseModel):
+    serial_numbers: List[str] = Field(serialization_alias="serialNumbers")
+    last_updated: Optional[str] = Field(None, serialization_alias="lastUpdated")
@@ -0,0 +1,20 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# Background job status
+class Job(BaseModel):
+    id: str
+    name: str
+    queue: str
+    organization_id: Optional[str] = None
+    status: str  # queued, running, retrying, completed, failed
+    attempts: int = 0
+    max_attempts: int = 1
+    progress: Dict[str, Any] = {}
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,42 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# Returned when a template is opened for scanning
+class ScanSession(BaseModel):
+    template_id: str
+    scanner_token: str
+    token_type: str = "bearer"
+    expires_at: datetime
+    # Serials loaded into the hot set (None if the cache is unavailable)
+    preloaded: Optional[int] = None
+
+
+class ScanValidate(BaseModel):
+    serial_number: str
+    scanned_at: Optional[datetime] = None
+
+
+class ScanResult(BaseModel):
+    serial_number: str
+    valid: bool
+    # One of redeemed, already_redeemed, voided, expired, not_found
+    status: str
+    wallet_pass_id: Optional[str] = None
+    cached: bool = False
+
+
+# Change to one pass of an offline scanner's snapshot
+class ScanSnapshotChange(BaseModel):
+    serial_hash: str
+    valid: bool
+    # Unix seconds, 0 if the pass does not expire
+    expires: int = 0
+
+
+class ScanSnapshotDelta(BaseModel):
+    tag: str
+    # Too many changes; download a new snapshot instead
+    reset: bool = False
+    changes: List[ScanSnapshotChange] = []
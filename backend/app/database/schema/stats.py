@@ -0,0 +1,40 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# Event counts of one hour or day
+class StatsBucket(BaseModel):
+    start: datetime
+    sends: int = 0
+    opens: int = 0
+    redemptions: int = 0
+    geo_triggers: int = 0
+
+
+class CampaignPerformance(BaseModel):
+    id: str
+    name: str
+    status: Optional[str] = None
+    send_count: int = 0
+    open_count: int = 0
+    conversion_count: int = 0
+    conversion_rate: Optional[float] = None
+
+
+class OrganizationTotals(BaseModel):
+    active_passes: int = 0
+    max_passes: Optional[int] = None
+    customers: int = 0
+    campaigns: int = 0
+    passes_issued: int = 0
+    passes_redeemed: int = 0
+
+
+# Dashboard statistics of an organization
+class OrganizationStats(BaseModel):
+    totals: OrganizationTotals
+    hourly: List[StatsBucket]
+    daily: List[StatsBucket]
+    top_campaigns: List[CampaignPerformance]
+    generated_at: datetime
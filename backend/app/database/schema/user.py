@@ -56,4 +56,7 @@ class RefreshToken(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
-    exp: Optional[int] = None
\ No newline at end of file
+    exp: Optional[int] = None
+    org: Optional[str] = None
+    su: bool = False
+    ver: Optional[int] = None
\ No newline at end of file
@@ -1,7 +1,9 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel, Field
 
+from app.utils import UUIDStr
+
 
 # Shared properties
 class WalletPassBase(BaseModel):
@@ -64,4 +66,59 @@ class WalletPass(WalletPassInDBBase):
 
 # Properties stored in DB (same as the return model in this case)
 class WalletPassInDB(WalletPassInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+
+# Customer selection for batch issuance
+class AudienceQuery(BaseModel):
+    tags: Optional[List[str]] = None
+    is_active: Optional[bool] = True
+
+
+# Properties to receive via API on batch creation
+class WalletPassBatchCreate(BaseModel):
+    template_id: UUIDStr
+    customer_ids: Optional[List[UUIDStr]] = None
+    audience: Optional[AudienceQuery] = None
+    campaign_id: Optional[UUIDStr] = None
+    pass_data: Dict[str, Any] = {}
+    expiration_date: Optional[datetime] = None
+    skip_existing: bool = True
+
+
+# Batch issuance job status
+class WalletPassBatchJob(BaseModel):
+    job_id: str
+    status: str  # queued, running, retrying, completed, failed
+    template_id: str
+    total: int = 0
+    issued: int = 0
+    skipped: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    passes_per_second: Optional[float] = None
+
+
+# A scan to redeem, as recorded by a (possibly offline) scanner
+class RedemptionScan(BaseModel):
+    serial_number: str
+    scanned_at: Optional[datetime] = None
+
+
+# Properties to receive via API on batch redemption
+class WalletPassBatchRedeem(BaseModel):
+    scans: List[RedemptionScan]
+
+
+# Outcome of redeeming one scanned pass
+class RedemptionResult(BaseModel):
+    serial_number: str
+    status: str  # redeemed, already_redeemed, voided, expired, not_found
+    wallet_pass_id: Optional[str] = None
+    redeemed_at: Optional[datetime] = None
+
+
+class WalletPassBatchRedeemResult(BaseModel):
+    redeemed: int = 0
+    results: List[RedemptionResult]
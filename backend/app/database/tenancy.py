@@ -0,0 +1,74 @@
+from typing import Any, Optional
+
+from sqlalchemy import Column, ForeignKey, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session, ORMExecuteState, with_loader_criteria
+
+
+# Session.info key holding the organization a session is scoped to
+TENANT_KEY = "tenant_organization_id"
+# Execution option that lifts the scope for one statement
+ALL_TENANTS = "all_tenants"
+
+
+class TenantScoped:
+    """
+    Marker for models owned by an organization through `organization_id`.
+
+    ORM selects, updates and deletes of these models in a tenant-scoped
+    session only see the tenant's rows (see `TenantSession`).
+    """
+
+    # Models declare their own column (with their indexes); this one is what
+    # the tenant criteria are built against, and the default for new models
+    organization_id = Column(UUID(as_uuid=False), ForeignKey("organization.id"), nullable=False)
+
+
+class TenantSession(Session):
+    """
+    Session that scopes queries on `TenantScoped` models to one organization.
+
+    `set_tenant` stores the organization on the session; every ORM statement
+    executed afterwards gets `organization_id = :tenant` for each tenant
+    model it touches, including joins, subqueries and relationship loads.
+    Lookups by id become one indexed query and rows of other organizations
+    are never loaded. Sessions without a tenant (superusers, background
+    jobs, device and scanner endpoints) are not scoped.
+    """
+
+
+@event.listens_for(TenantSession, "do_orm_execute")
+def _add_tenant_criteria(state: ORMExecuteState) -> None:
+    organization_id = state.session.info.get(TENANT_KEY, False)
+    if organization_id is False or state.execution_options.get(ALL_TENANTS, False):
+        return
+    if state.is_select:
+        # Criteria added to the outer statement already cover these loads
+        if state.is_column_load or state.is_relationship_load:
+            return
+    elif not (state.is_update or state.is_delete):
+        return
+    state.statement = state.statement.options(
+        with_loader_criteria(
+            TenantScoped,
+            lambda cls: cls.organization_id == organization_id,
+            include_aliases=True,
+        )
+    )
+
+
+def set_tenant(db: Any, organization_id: Optional[str]) -> None:
+    """
+    Scope a session to an organization.
+
+    Args:
+        db: The (async) session.
+        organization_id: The organization; None scopes to no rows at all,
+            e.g. for users that are not part of an organization.
+    """
+    db.info[TENANT_KEY] = organization_id
+
+
+def clear_tenant(db: Any) -> None:
+    """Remove a session's tenant scope."""
+    db.info.pop(TENANT_KEY, None)
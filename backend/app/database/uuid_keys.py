@@ -0,0 +1,353 @@
+"""
+Convert existing string keys to native UUID columns without long locks.
+
+Databases created before keys became `UUIDKey` store them as `varchar`.
+`ALTER COLUMN ... TYPE uuid` would rewrite every table under an exclusive
+lock, so the conversion runs in steps that can each be repeated:
+
+1. prepare:  add a `<column>_uuid` shadow column next to every key column,
+             kept in sync by a trigger for rows written from then on.
+2. backfill: fill the shadow columns of existing rows in keyset batches.
+3. index:    build the primary keys, unique constraints and indexes on the
+             shadow columns concurrently, and prove them NOT NULL with
+             validated CHECK constraints.
+4. swap:     in one short transaction, drop the string columns and rename
+             the shadow columns, indexes and constraints into place. Foreign
+             keys are re-added NOT VALID and validated after the commit.
+
+    python -m app.database.uuid_keys                  # every step
+    python -m app.database.uuid_keys --step backfill  # one step
+
+Existing keys keep their values; new rows get time-ordered UUIDv7 keys.
+Convert keys before partitioning tables (see `app.database.partitioning`).
+"""
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, UniqueConstraint, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import DBAPIError
+
+from app.database import models  # noqa: F401  (registers every table)
+from app.database.database import metadata, sessionmanager
+
+
+logger = logging.getLogger(__name__)
+
+STEPS = ("prepare", "backfill", "index", "swap")
+BACKFILL_BATCH_SIZE = 5000
+SHADOW_SUFFIX = "_uuid"
+
+_dialect = postgresql.dialect()
+
+
+class KeyConversionError(Exception):
+    """Raised when keys cannot be converted, e.g. a value is not a UUID."""
+
+
+def _name(base: str, suffix: str = "") -> str:
+    # Postgres truncates identifiers to 63 bytes
+    return base[:63 - len(suffix)] + suffix
+
+
+def _shadow(column: str) -> str:
+    return column + SHADOW_SUFFIX
+
+
+def _columns(names: List[str]) -> str:
+    return ", ".join(names)
+
+
+async def _fetch_all(conn: Any, query: str, **params) -> List[Any]:
+    return (await conn.execute(text(query), params)).all()
+
+
+async def pending_columns(conn: Any) -> Dict[str, List[str]]:
+    """
+    Key columns still stored as strings, by table.
+
+    Returns:
+        dict: Table name to the names of its `UUIDKey` columns whose
+        database type is not `uuid` yet, in dependency order.
+    """
+    rows = await _fetch_all(
+        conn,
+        "SELECT table_name, column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND data_type IN ('character varying', 'text')",
+    )
+    strings = {(table_name, column_name) for table_name, column_name in rows}
+    pending = {}
+    for table in metadata.sorted_tables:
+        columns = [
+            column.name for column in table.columns
+            if isinstance(column.type, UUID) and (table.name, column.name) in strings
+        ]
+        if columns:
+            pending[table.name] = columns
+    return pending
+
+
+def _constraint_indexes(table: Table, converted: List[str]) -> List[Tuple[str, str, List[str], Optional[str]]]:
+    """
+    Primary key, unique constraints and indexes of a table that involve converted columns.
+
+    Returns:
+        list: (kind, name, columns, where) with kind "primary", "unique" or
+        "index"/"unique index"; names are the final ones.
+    """
+    definitions = []
+    primary = [column.name for column in table.primary_key.columns]
+    if set(primary) & set(converted):
+        definitions.append(("primary", _name(f"{table.name}_pkey"), primary, None))
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = [column.name for column in constraint.columns]
+            if set(columns) & set(converted):
+                name = constraint.name or _name(f"{table.name}_{'_'.join(columns)}_key")
+                definitions.append(("unique", name, columns, None))
+    for index in table.indexes:
+        columns = [column.name for column in index.expressions]
+        if set(columns) & set(converted):
+            where = index.dialect_options["postgresql"]["where"]
+            if where is not None:
+                where = str(where.compile(dialect=_dialect, compile_kwargs={"literal_binds": True}))
+            definitions.append(("unique index" if index.unique else "index", index.name, columns, where))
+    return definitions
+
+
+def _not_null_constraint(table_name: str, column: str) -> str:
+    return _name(f"{table_name}_{column}", "_uuid_not_null")
+
+
+def _trigger(table_name: str) -> str:
+    return _name(table_name, "_uuid_keys")
+
+
+async def prepare(pending: Dict[str, List[str]]) -> None:
+    """Add the shadow columns and the triggers that fill them on every write."""
+    for table_name, columns in pending.items():
+        trigger = _trigger(table_name)
+        assignments = " ".join(f"NEW.{_shadow(column)} := NEW.{column}::uuid;" for column in columns)
+        async with sessionmanager.connect() as conn:
+            for column in columns:
+                await conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {_shadow(column)} uuid"))
+            await conn.execute(text(
+                f"CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger AS $$ "
+                f"BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql"
+            ))
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table_name}"))
+            await conn.execute(text(
+                f"CREATE TRIGGER {trigger} BEFORE INSERT OR UPDATE ON {table_name} "
+                f"FOR EACH ROW EXECUTE FUNCTION {trigger}()"
+            ))
+        logger.info("Prepared %s (%s)", table_name, _columns(columns))
+
+
+async def backfill(pending: Dict[str, List[str]], batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Fill the shadow columns of existing rows, one short transaction per batch.
+
+    Batches walk the table in primary key order, so each one is an index
+    range scan and the step can be stopped and started again at any time.
+
+    Returns:
+        dict: Rows updated per table.
+    """
+    updated = {}
+    for table_name, columns in pending.items():
+        key = [column.name for column in metadata.tables[table_name].primary_key.columns]
+        assignments = ", ".join(f"{_shadow(column)} = {column}::uuid" for column in columns)
+        updated[table_name] = 0
+        last: Optional[Tuple] = None
+        while True:
+            params: Dict[str, Any] = {"limit": batch_size}
+            after = ""
+            if last is not None:
+                params.update({f"k{i}": value for i, value in enumerate(last)})
+                after = f"WHERE ({_columns(key)}) > ({_columns([f':k{i}' for i in range(len(key))])})"
+            async with sessionmanager.connect() as conn:
+                try:
+                    rows = await _fetch_all(
+                        conn,
+                        f"UPDATE {table_name} SET {assignments} WHERE ({_columns(key)}) IN ("
+                        f"SELECT {_columns(key)} FROM {table_name} {after} "
+                        f"ORDER BY {_columns(key)} LIMIT :limit) "
+                        f"RETURNING {_columns(key)}",
+                        **params,
+                    )
+                except DBAPIError as e:
+                    raise KeyConversionError(f"{table_name} has keys that are not UUIDs: {e}") from e
+            if not rows:
+                break
+            updated[table_name] += len(rows)
+            last = max(tuple(row) for row in rows)
+        logger.info("Backfilled %d %s rows", updated[table_name], table_name)
+    return updated
+
+
+async def build_indexes(pending: Dict[str, List[str]]) -> None:
+    """
+    Build the shadow columns' indexes concurrently and prove them NOT NULL.
+
+    Index builds run outside transactions and do not block writes; a build
+    that failed leaves an invalid index, which is dropped and rebuilt here.
+    The NOT NULL checks are added NOT VALID and validated separately, so
+    `swap` can set NOT NULL without scanning the tables.
+    """
+    async with sessionmanager.connect(autocommit=True) as conn:
+        invalid = await _fetch_all(
+            conn,
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relnamespace = current_schema()::regnamespace "
+            "AND c.relname LIKE :pattern",
+            pattern=f"%{SHADOW_SUFFIX}",
+        )
+        for (index,) in invalid:
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+
+        for table_name, columns in pending.items():
+            table = metadata.tables[table_name]
+            for kind, name, index_columns, where in _constraint_indexes(table, columns):
+                shadowed = [_shadow(column) if column in columns else column for column in index_columns]
+                await conn.execute(text(
+                    f"CREATE {'' if kind == 'index' else 'UNIQUE '}INDEX CONCURRENTLY IF NOT EXISTS "
+                    f"{_name(name, SHADOW_SUFFIX)} ON {table_name} ({_columns(shadowed)})"
+                    f"{f' WHERE {where}' if where else ''}"
+                ))
+            for column in columns:
+                if table.columns[column].nullable:
+                    continue
+                constraint = _not_null_constraint(table_name, column)
+                exists = await _fetch_all(
+                    conn,
+                    "SELECT 1 FROM pg_constraint WHERE conname = :name "
+                    "AND conrelid = CAST(:table_name AS regclass)",
+                    name=constraint,
+                    table_name=table_name,
+                )
+                if not exists:
+                    await conn.execute(text(
+                        f"ALTER TABLE {table_name} ADD CONSTRAINT {constraint} "
+                        f"CHECK ({_shadow(column)} IS NOT NULL) NOT VALID"
+                    ))
+                await conn.execute(text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint}"))
+            logger.info("Indexed %s", table_name)
+
+
+async def swap(pending: Dict[str, List[str]]) -> None:
+    """
+    Replace the string key columns with their shadow columns.
+
+    Holds ACCESS EXCLUSIVE locks on the converted tables for the duration
+    of one transaction that only touches catalogs, then validates the
+    re-added foreign keys without blocking writes.
+    """
+    tables = list(pending)
+    foreign_keys = []
+    async with sessionmanager.connect() as conn:
+        await conn.execute(text(f"LOCK TABLE {_columns(tables)} IN ACCESS EXCLUSIVE MODE"))
+
+        # Every foreign key is on a key column, so all of them are recreated
+        existing = await _fetch_all(
+            conn,
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' "
+            "AND (conrelid::regclass::text = ANY(:tables) OR confrelid::regclass::text = ANY(:tables))",
+            tables=tables,
+        )
+        for table_name, constraint in existing:
+            await conn.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {constraint}"))
+
+        for table_name, columns in pending.items():
+            table = metadata.tables[table_name]
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS {_trigger(table_name)} ON {table_name}"))
+            await conn.execute(text(f"DROP FUNCTION IF EXISTS {_trigger(table_name)}()"))
+            for column in columns:
+                # Also drops the primary key, constraints and indexes on the column
+                await conn.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {column}"))
+                await conn.execute(text(f"ALTER TABLE {table_name} RENAME COLUMN {_shadow(column)} TO {column}"))
+                if not table.columns[column].nullable:
+                    constraint = _not_null_constraint(table_name, column)
+                    await conn.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column} SET NOT NULL"))
+                    await conn.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {constraint}"))
+
+            for kind, name, _, _ in _constraint_indexes(table, columns):
+                index = _name(name, SHADOW_SUFFIX)
+                if kind == "primary":
+                    await conn.execute(text(f"ALTER TABLE {table_name} ADD CONSTRAINT {name} PRIMARY KEY USING INDEX {index}"))
+                elif kind == "unique":
+                    await conn.execute(text(f"ALTER TABLE {table_name} ADD CONSTRAINT {name} UNIQUE USING INDEX {index}"))
+                else:
+                    await conn.execute(text(f"ALTER INDEX {index} RENAME TO {name}"))
+
+        for table in metadata.sorted_tables:
+            for foreign_key in table.foreign_key_constraints:
+                if table.name not in pending and foreign_key.referred_table.name not in pending:
+                    continue
+                columns = [column.name for column in foreign_key.columns]
+                referred_columns = [element.column.name for element in foreign_key.elements]
+                constraint = _name(f"{table.name}_{'_'.join(columns)}_fkey")
+                await conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT {constraint} FOREIGN KEY ({_columns(columns)}) "
+                    f"REFERENCES {foreign_key.referred_table.name} ({_columns(referred_columns)}) NOT VALID"
+                ))
+                foreign_keys.append((table.name, constraint))
+
+    async with sessionmanager.connect() as conn:
+        for table_name, constraint in foreign_keys:
+            await conn.execute(text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint}"))
+        for table_name in tables:
+            await conn.execute(text(f"ANALYZE {table_name}"))
+    logger.info("Converted keys of %s", _columns(tables))
+
+
+async def convert_keys(steps: Tuple[str, ...] = STEPS, batch_size: int = BACKFILL_BATCH_SIZE) -> None:
+    """Run conversion steps, in order, for every table that still has string keys."""
+    async with sessionmanager.connect() as conn:
+        pending = await pending_columns(conn)
+        partitioned = await _fetch_all(
+            conn,
+            "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = ANY(:tables)",
+            tables=list(pending),
+        )
+    if partitioned:
+        raise KeyConversionError(f"Partitioned tables cannot be converted: {_columns([row[0] for row in partitioned])}")
+    if not pending:
+        logger.info("All keys are UUIDs")
+        return
+
+    for step in STEPS:
+        if step not in steps:
+            continue
+        if step == "prepare":
+            await prepare(pending)
+        elif step == "backfill":
+            await backfill(pending, batch_size)
+        elif step == "index":
+            await build_indexes(pending)
+        elif step == "swap":
+            await swap(pending)
+
+
+async def run(steps: Tuple[str, ...], batch_size: int) -> None:
+    try:
+        await convert_keys(steps, batch_size)
+    finally:
+        await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert string keys to native UUID columns.")
+    parser.add_argument("--step", choices=STEPS, help="Run only this step (default: all, in order)")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="Rows per backfill batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run((args.step,) if args.step else STEPS, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
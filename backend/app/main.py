@@ -1,15 +1,84 @@
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.settings import settings
-from app.database import get_db, sessionmanager
+from app.database import sessionmanager
 from app.api.v1.router import api_router
+from app.api import monitoring
+from app.api.static_files import ImmutableStaticFiles
+from app.api.middleware import (
+    BlockingCallAttributionMiddleware,
+    QueryStatsMiddleware,
+    RequestMetricsMiddleware,
+    UploadSizeLimitMiddleware,
+)
+from app.services.analytics import analytics_buffer, analytics_rollup
+from app.services.loop_monitor import LoopLagMonitor
+from app.services.images import shutdown_process_pool
+from app.services.jobs import create_worker
+from app.services.push import push_dispatcher
+from app.services.quotas import quota_reconciler
+from app.services.redis import close_redis
+from app.services.scans import scan_validator
+from app.services.tombstones import tombstone_purger
+from app.services.warmup import warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start background services and warm up before serving; drain on shutdown.
+
+    The server stops accepting connections and finishes in-flight requests
+    (up to GRACEFUL_SHUTDOWN_SECONDS) before the shutdown half runs, which
+    lets running jobs finish and flushes buffered writes while the database
+    and Redis are still up.
+    """
+    sessionmanager.init()
+    if settings.METRICS_ENABLED or settings.LOOP_WATCHDOG_ENABLED:
+        loop_lag_monitor.start()
+    await warm_up()
+    if settings.PUSH_ENABLED:
+        push_dispatcher.start()
+    if settings.JOB_WORKERS_IN_PROCESS:
+        job_worker.start()
+    quota_reconciler.start()
+    tombstone_purger.start()
+    analytics_buffer.start()
+    analytics_rollup.start()
+    scan_validator.start()
+
+    yield
+
+    await loop_lag_monitor.stop()
+    await quota_reconciler.stop()
+    await tombstone_purger.stop()
+    await analytics_rollup.stop()
+    await job_worker.stop(timeout=settings.GRACEFUL_SHUTDOWN_SECONDS)
+    await push_dispatcher.stop()
+    # Write cached scan redemptions while Redis and the database are up
+    await scan_validator.stop()
+    # Write buffered events before the database pool closes
+    await analytics_buffer.stop()
+    await close_redis()
+    shutdown_process_pool()
+    await sessionmanager.close()
+
 
 app = FastAPI(
     title="Wallet Pass Manager API",
     description="API for managing digital wallet passes",
     version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Reject oversized image uploads before their body is spooled to disk
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.MAX_IMAGE_UPLOAD_BYTES,
+    path_suffixes=("/upload-image",),
 )
 
 # Set up CORS
@@ -22,40 +91,46 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Per-request DB statistics (Server-Timing headers in development)
+if settings.DB_INSTRUMENTATION_ENABLED:
+    server_timing = settings.SERVER_TIMING_ENABLED
+    if server_timing is None:
+        server_timing = settings.ENV == "development"
+    app.add_middleware(QueryStatsMiddleware, server_timing=server_timing)
+
+# Request latency and in-flight metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
+# Attribute event loop stalls to the route being served
+if settings.LOOP_WATCHDOG_ENABLED:
+    app.add_middleware(BlockingCallAttributionMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Health probes and metrics
+app.include_router(monitoring.router, tags=["monitoring"])
+
+# Static assets (served by nginx in production)
+if settings.SERVE_STATIC_FILES:
+    app.mount(
+        settings.STATIC_URL,
+        ImmutableStaticFiles(directory=settings.STATIC_ROOT, check_dir=False),
+        name="static",
+    )
+
+loop_lag_monitor = LoopLagMonitor(
+    interval=settings.LOOP_LAG_SAMPLE_INTERVAL_SECONDS,
+    block_threshold=(
+        settings.LOOP_WATCHDOG_THRESHOLD_MS / 1000.0 if settings.LOOP_WATCHDOG_ENABLED else None
+    ),
+)
+
+# Runs queued jobs inside the API process (development and small deployments)
+job_worker = create_worker()
+
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Wallet Pass Manager API"}
-
-
-@app.get("/health")
-async def health(db: AsyncSession = Depends(get_db)):
-    try:
-        # Simple database check
-        result = await db.execute("SELECT 1")
-        if result:
-            return {
-                "status": "healthy",
-                "database": "connected",
-                "version": "0.1.0",
-            }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e),
-        }
-
-
-@app.on_event("startup")
-async def startup():
-    # Additional startup events can be added here
-    pass
-
-
-@app.on_event("shutdown")
-async def shutdown():
-    await sessionmanager.close()
\ No newline at end of file
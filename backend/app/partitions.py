@@ -0,0 +1,84 @@
+"""
+Manage the optional organization partitioning of the largest tables.
+
+    python -m app.partitions plan                 # print the DDL (e.g. for a migration)
+    python -m app.partitions convert              # partition customer, customer_campaign, wallet_pass
+    python -m app.partitions convert --table customer --partitions 32
+    python -m app.partitions status               # partitions, sizes and isolation candidates
+    python -m app.partitions isolate ORG_ID       # move a large tenant into its own partitions
+    python -m app.partitions drop-old wallet_pass # drop the original table after a conversion
+
+See `app.database.partitioning` for the layout. Pause the tombstone purger
+(TOMBSTONE_PURGE_INTERVAL_SECONDS=0) while converting.
+"""
+import argparse
+import asyncio
+import logging
+from typing import List
+
+from app.database import sessionmanager
+from app.database.partitioning import (
+    DEFAULT_HASH_PARTITIONS,
+    PARTITIONED_TABLES,
+    convert_table,
+    drop_old_table,
+    isolate_tenant,
+    largest_tenants,
+    partition_status,
+    partitioned_table_ddl,
+)
+
+
+logger = logging.getLogger("app.partitions")
+
+
+async def run(args: argparse.Namespace, tables: List[str]) -> None:
+    try:
+        if args.command == "convert":
+            for table_name in tables:
+                await convert_table(table_name, args.partitions)
+        elif args.command == "isolate":
+            await isolate_tenant(args.organization_id)
+        elif args.command == "drop-old":
+            await drop_old_table(args.table_name)
+        elif args.command == "status":
+            for row in await partition_status():
+                print(
+                    f"{row['parent']:<24} {row['partition']:<48} {row['estimated_rows']:>12} rows "
+                    f"{row['total_bytes'] / 1024 / 1024:>10.1f} MB  {row['bound']}"
+                )
+            print("\nLargest tenants:")
+            for row in await largest_tenants():
+                print(f"{row['organization_id']:<40} {row['active_passes']:>10} passes {row['customers']:>10} customers")
+    finally:
+        await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage organization partitioning.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("plan", "convert"):
+        command = commands.add_parser(name)
+        command.add_argument("--table", choices=PARTITIONED_TABLES, help="Only this table (default: all, in order)")
+        command.add_argument("--partitions", type=int, default=DEFAULT_HASH_PARTITIONS,
+                             help="Hash partitions for tenants without their own")
+    commands.add_parser("status")
+    isolate = commands.add_parser("isolate")
+    isolate.add_argument("organization_id")
+    drop_old = commands.add_parser("drop-old")
+    drop_old.add_argument("table_name", choices=PARTITIONED_TABLES)
+    args = parser.parse_args()
+
+    tables = [args.table] if getattr(args, "table", None) else list(PARTITIONED_TABLES)
+    if args.command == "plan":
+        for table_name in tables:
+            for statement in partitioned_table_ddl(table_name, args.partitions):
+                print(f"{statement};")
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args, tables))
+
+
+if __name__ == "__main__":
+    main()
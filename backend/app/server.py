@@ -0,0 +1,46 @@
+"""
+Run the API in production.
+
+    python -m app.server
+
+Starts WEB_CONCURRENCY uvicorn worker processes (one per CPU by default) on
+uvloop and httptools; uvicorn replaces workers that die. On SIGTERM every
+worker stops accepting connections, finishes in-flight requests for up to
+GRACEFUL_SHUTDOWN_SECONDS and then runs the lifespan shutdown, which drains
+jobs and buffered writes. Give the container a longer stop grace period.
+
+Development uses `uvicorn app.main:app --reload` instead.
+"""
+import os
+import sys
+
+import uvicorn
+
+from app.settings import settings
+
+
+def main() -> None:
+    workers = settings.WEB_CONCURRENCY or os.cpu_count() or 1
+    # A memory scan cache is per process: other workers would not see its redemptions
+    if workers > 1 and settings.SCAN_CACHE_BACKEND == "memory":
+        sys.exit("SCAN_CACHE_BACKEND=memory needs WEB_CONCURRENCY=1; use redis with more workers")
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        # Trusted proxies come from FORWARDED_ALLOW_IPS (default: localhost)
+        proxy_headers=True,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=int(settings.GRACEFUL_SHUTDOWN_SECONDS),
+        # nginx writes the access log
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, func, insert, literal, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.analytics import (
+    AnalyticsCheckpoint,
+    CampaignDailyStats,
+    OrganizationHourlyStats,
+    analytics_event,
+)
+from app.database.models.campaign import Campaign
+from app.database.models.organization_usage import OrganizationUsage
+from app.services.jobs import JobContext, PeriodicJob, job_handler
+from app.services.metrics import registry
+from app.services.quotas import ensure_usage
+from app.utils import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+# CampaignDailyStats column counting each event type
+EVENT_COLUMNS = {
+    "send": "sends",
+    "open": "opens",
+    "redeem": "redemptions",
+    "geo_trigger": "geo_triggers",
+}
+# Campaign counters and the rollup column they are the total of
+CAMPAIGN_COUNTERS = {
+    "send_count": "sends",
+    "open_count": "opens",
+    "conversion_count": "redemptions",
+}
+# Rows per multi-row INSERT; keeps bind parameters well below the asyncpg limit
+INSERT_CHUNK_SIZE = 1000
+ROLLUP_BATCH_SIZE = 50000
+# Transactions older than every running one: their events are all committed
+# (or rolled back), so the rollup can move past them for good
+FINISHED_TXID = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+ROLLUP_CHECKPOINT = "campaign_daily_stats"
+
+analytics_events_total = registry.counter(
+    "analytics_events_total",
+    "Analytics events written, by event type.",
+    ["event_type"],
+)
+analytics_events_dropped_total = registry.counter(
+    "analytics_events_dropped_total",
+    "Analytics events dropped because the in-process buffer was full.",
+)
+analytics_events_rolled_up_total = registry.counter(
+    "analytics_events_rolled_up_total",
+    "Analytics events aggregated into daily campaign stats.",
+)
+
+
+def event_row(
+    event_type: str,
+    organization_id: str,
+    campaign_id: Optional[str] = None,
+    wallet_pass_id: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    occurred_at: Optional[datetime] = None,
+    data: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Build an `analytics_event` row."""
+    if occurred_at is not None and occurred_at.tzinfo is not None:
+        occurred_at = occurred_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "event_type": event_type,
+        "organization_id": organization_id,
+        "campaign_id": campaign_id,
+        "wallet_pass_id": wallet_pass_id,
+        "customer_id": customer_id,
+        "occurred_at": occurred_at or datetime.utcnow(),
+        "data": data,
+    }
+
+
+async def insert_events(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """Append events with multi-row INSERTs in the caller's transaction."""
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await db.execute(insert(analytics_event).values(rows[start:start + INSERT_CHUNK_SIZE]))
+    for row in rows:
+        analytics_events_total.inc(1, row["event_type"])
+    return len(rows)
+
+
+class AnalyticsEventBuffer:
+    """
+    Collect events recorded while serving requests and write them in batches.
+
+    `record` only appends to a list, so request handlers never wait on the
+    events table; a background task flushes the list every `flush_interval`
+    seconds. Events still buffered when a process is killed are lost, and
+    past `max_buffered` new events are dropped rather than growing memory.
+    """
+
+    def __init__(self, flush_interval: float = 2.0, max_buffered: int = 100000):
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._events: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, event_type: str, organization_id: str, **fields) -> None:
+        """Queue an event; see `event_row` for the accepted fields."""
+        if len(self._events) >= self.max_buffered:
+            analytics_events_dropped_total.inc()
+            return
+        self._events.append(event_row(event_type, organization_id, **fields))
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        events, self._events = self._events, []
+        if not events:
+            return 0
+        try:
+            async with sessionmanager.session() as db:
+                return await insert_events(db, events)
+        except Exception:
+            logger.exception("Failed to write %d analytics events", len(events))
+            # Keep them for the next flush, within the buffer limit
+            self._events = events[:max(self.max_buffered - len(self._events), 0)] + self._events
+            return 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+async def _lock_checkpoint(db: AsyncSession, name: str) -> AnalyticsCheckpoint:
+    await db.execute(
+        pg_insert(AnalyticsCheckpoint)
+        .values(id=generate_uuid(), name=name, last_txid=0, last_event_id=0)
+        .on_conflict_do_nothing(index_elements=[AnalyticsCheckpoint.name])
+    )
+    # Held until commit, so only one rollup runs at a time across processes
+    return (
+        await db.execute(
+            select(AnalyticsCheckpoint)
+            .where(AnalyticsCheckpoint.name == name)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    ).scalar_one()
+
+
+async def rollup_events(db: AsyncSession, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+    """
+    Aggregate the next batch of events into the stats tables.
+
+    Events are read in (`txid`, `id`) order from the checkpoint, up to the
+    oldest running transaction so an event that took a lower id but commits
+    late is never skipped, and counted per
+    campaign, organization, hour and type with one GROUP BY. The counts are
+    added with upserts to `campaign_daily_stats` and
+    `organization_hourly_stats`, then the counters of the campaigns touched
+    are reset to the sum of their daily stats and the organizations' issued
+    and redeemed totals are advanced, so hot rows are written once per
+    rollup instead of once per event. Everything commits together with the
+    checkpoint.
+
+    Args:
+        db: Database session; the caller commits.
+        batch_size: Maximum number of events to aggregate.
+
+    Returns:
+        int: Number of events consumed.
+    """
+    checkpoint = await _lock_checkpoint(db, ROLLUP_CHECKPOINT)
+    position = tuple_(analytics_event.c.txid, analytics_event.c.id)
+    start = _position(checkpoint.last_txid, checkpoint.last_event_id)
+    window = (
+        select(analytics_event.c.txid, analytics_event.c.id)
+        .where(position > start, analytics_event.c.txid < FINISHED_TXID)
+        .order_by(analytics_event.c.txid, analytics_event.c.id)
+        .limit(batch_size)
+        .subquery()
+    )
+    upper = (
+        await db.execute(
+            select(window.c.txid, window.c.id)
+            .order_by(window.c.txid.desc(), window.c.id.desc())
+            .limit(1)
+        )
+    ).first()
+    if upper is None:
+        return 0
+
+    # Literal unit: a bound parameter would differ between SELECT and GROUP BY
+    hour = func.date_trunc(literal_column("'hour'"), analytics_event.c.occurred_at)
+    grouped = await db.execute(
+        select(
+            analytics_event.c.campaign_id,
+            analytics_event.c.organization_id,
+            hour,
+            analytics_event.c.event_type,
+            func.count(),
+        )
+        .where(position > start, position <= _position(*upper))
+        .group_by(
+            analytics_event.c.campaign_id,
+            analytics_event.c.organization_id,
+            hour,
+            analytics_event.c.event_type,
+        )
+    )
+
+    consumed = 0
+    campaign_days: Dict[Tuple[str, date], Dict[str, Any]] = {}
+    organization_hours: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+    for campaign_id, organization_id, event_hour, event_type, count in grouped:
+        consumed += count
+        column = EVENT_COLUMNS.get(event_type)
+        if column is None:
+            continue
+        _stats_row(
+            organization_hours,
+            (organization_id, event_hour),
+            organization_id=organization_id,
+            hour=event_hour,
+        )[column] += count
+        if campaign_id is not None:
+            _stats_row(
+                campaign_days,
+                (campaign_id, event_hour.date()),
+                campaign_id=campaign_id,
+                organization_id=organization_id,
+                day=event_hour.date(),
+            )[column] += count
+
+    if campaign_days:
+        await _upsert_stats(db, CampaignDailyStats, ["campaign_id", "day"], campaign_days.values())
+        await refresh_campaign_counters(db, {campaign_id for campaign_id, _ in campaign_days})
+    if organization_hours:
+        await _upsert_stats(
+            db, OrganizationHourlyStats, ["organization_id", "hour"], organization_hours.values()
+        )
+        await _advance_organization_totals(db, organization_hours.values())
+
+    checkpoint.last_txid, checkpoint.last_event_id = upper
+    analytics_events_rolled_up_total.inc(consumed)
+    return consumed
+
+
+def _position(txid: int, event_id: int) -> Any:
+    # Transaction ids exceed 32 bits once they wrap around
+    return tuple_(literal(txid, BigInteger), literal(event_id, BigInteger))
+
+
+def _stats_row(rows: Dict[Tuple, Dict[str, Any]], key: Tuple, **identity) -> Dict[str, Any]:
+    row = rows.get(key)
+    if row is None:
+        row = rows[key] = {
+            "id": generate_uuid(),
+            **identity,
+            **{name: 0 for name in EVENT_COLUMNS.values()},
+        }
+    return row
+
+
+async def _upsert_stats(
+    db: AsyncSession, model: Any, key_columns: List[str], rows: Iterable[Dict[str, Any]]
+) -> None:
+    rows = list(rows)
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        statement = pg_insert(model).values(rows[start:start + INSERT_CHUNK_SIZE])
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[getattr(model, name) for name in key_columns],
+                set_={
+                    name: getattr(model, name) + getattr(statement.excluded, name)
+                    for name in EVENT_COLUMNS.values()
+                },
+            )
+        )
+
+
+async def _advance_organization_totals(
+    db: AsyncSession, hourly_rows: Iterable[Dict[str, Any]]
+) -> None:
+    totals: Dict[str, Tuple[int, int]] = {}
+    for row in hourly_rows:
+        issued, redeemed = totals.get(row["organization_id"], (0, 0))
+        totals[row["organization_id"]] = (issued + row["sends"], redeemed + row["redemptions"])
+
+    # Sorted so concurrent writers of usage rows always lock them in the same order
+    for organization_id in sorted(totals):
+        issued, redeemed = totals[organization_id]
+        if not issued and not redeemed:
+            continue
+        await ensure_usage(db, organization_id)
+        await db.execute(
+            update(OrganizationUsage)
+            .where(OrganizationUsage.organization_id == organization_id)
+            .values(
+                passes_issued=OrganizationUsage.passes_issued + issued,
+                passes_redeemed=OrganizationUsage.passes_redeemed + redeemed,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def refresh_campaign_counters(db: AsyncSession, campaign_ids) -> None:
+    """Set the counters of campaigns to the totals of their daily stats."""
+    totals = (
+        select(
+            CampaignDailyStats.campaign_id,
+            *(
+                func.sum(getattr(CampaignDailyStats, column)).label(column)
+                for column in CAMPAIGN_COUNTERS.values()
+            ),
+        )
+        .where(CampaignDailyStats.campaign_id.in_(sorted(campaign_ids)))
+        .group_by(CampaignDailyStats.campaign_id)
+        .subquery()
+    )
+    await db.execute(
+        update(Campaign)
+        .where(Campaign.id == totals.c.campaign_id)
+        .values(
+            {
+                **{counter: totals.c[column] for counter, column in CAMPAIGN_COUNTERS.items()},
+                # Counter refreshes are not edits of the campaign
+                "updated_at": Campaign.updated_at,
+            }
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+@job_handler("analytics.rollup", max_attempts=1)
+async def run_rollup(ctx: JobContext) -> Dict[str, int]:
+    """Roll up events until caught up, committing after each batch."""
+    consumed = 0
+    while True:
+        async with sessionmanager.session() as db:
+            batch = await rollup_events(db)
+        consumed += batch
+        if batch < ROLLUP_BATCH_SIZE:
+            return {"events": consumed}
+        await ctx.progress(events=consumed)
+
+
+analytics_buffer = AnalyticsEventBuffer(
+    flush_interval=settings.ANALYTICS_FLUSH_INTERVAL_SECONDS,
+    max_buffered=settings.ANALYTICS_MAX_BUFFERED_EVENTS,
+)
+analytics_rollup = PeriodicJob("analytics.rollup", settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS)
@@ -0,0 +1,243 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import tempfile
+import uuid
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+from app.settings import settings
+from app.services.metrics import Timer, registry
+
+
+# Apple Wallet image sizes in points (@1x). Each image is rendered at @1x, @2x
+# and @3x. "cover" images are cropped to fill the exact size; "contain" images
+# are scaled to fit within the bounds, preserving aspect ratio.
+PASS_IMAGE_SPECS: Dict[str, Tuple[Tuple[int, int], str]] = {
+    "icon": ((29, 29), "cover"),
+    "logo": ((160, 50), "contain"),
+    "strip": ((375, 123), "cover"),
+    "footer": ((286, 15), "contain"),
+    "background": ((180, 220), "cover"),
+}
+PASS_IMAGE_SCALES = (1, 2, 3)
+
+ALLOWED_IMAGE_FORMATS = {"PNG", "JPEG", "GIF", "WEBP"}
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+image_processing_duration = registry.histogram(
+    "image_processing_seconds",
+    "Time spent validating and resizing uploaded pass images (including pool queueing).",
+    ["image_type"],
+)
+image_processing_cache_hits_total = registry.counter(
+    "image_processing_deduplicated_total",
+    "Uploads whose variants already existed in content-addressed storage.",
+)
+
+
+class ImageUploadError(Exception):
+    """Raised when an uploaded image is rejected."""
+    pass
+
+
+class ImageTooLargeError(ImageUploadError):
+    """Raised when an upload exceeds the configured size cap."""
+    pass
+
+
+# concurrent.futures loads multiprocessing on first access to ProcessPoolExecutor
+_process_pool: Optional["concurrent.futures.ProcessPoolExecutor"] = None
+
+
+def get_process_pool() -> "concurrent.futures.ProcessPoolExecutor":
+    """Get the shared process pool used for CPU-bound image work, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_POOL_SIZE)
+    return _process_pool
+
+
+async def start_process_pool() -> None:
+    """Start every worker of the process pool, which otherwise spawn on first use."""
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    await asyncio.gather(
+        *(loop.run_in_executor(pool, os.getpid) for _ in range(settings.IMAGE_PROCESS_POOL_SIZE))
+    )
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        pool, _process_pool = _process_pool, None
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def stream_upload_to_disk(file: UploadFile, directory: str, max_bytes: int) -> Tuple[str, str]:
+    """
+    Copy an upload to a temporary file in fixed-size chunks.
+
+    The file is hashed while it is written, so the whole upload is never held
+    in memory. Starlette has already received (and spooled) the body by the
+    time the route runs, so this cap is a last check: oversized requests are
+    rejected before parsing by `UploadSizeLimitMiddleware` and by nginx.
+
+    Args:
+        file: The uploaded file.
+        directory: Directory for the temporary file.
+        max_bytes: Maximum accepted upload size.
+
+    Returns:
+        tuple: Path of the temporary file and the SHA-256 hex digest of its content.
+
+    Raises:
+        ImageTooLargeError: If the upload is larger than `max_bytes`.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise ImageTooLargeError(f"Image exceeds the maximum size of {max_bytes} bytes")
+
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ImageTooLargeError(f"Image exceeds the maximum size of {max_bytes} bytes")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        await _remove_quietly(path)
+        raise
+    return path, digest.hexdigest()
+
+
+async def process_pass_image(upload: UploadFile, image_type: str) -> Dict[str, str]:
+    """
+    Stream an uploaded pass image to disk and render all required resolutions.
+
+    Validation, resizing and PNG optimization run in the process pool. Variants
+    are stored content-addressed, so identical images uploaded for different
+    templates are stored (and cached by clients) once.
+
+    Args:
+        upload: The uploaded image.
+        image_type: One of the keys of `PASS_IMAGE_SPECS`.
+
+    Returns:
+        dict: Public URL of each variant keyed by scale ("1x", "2x", "3x").
+
+    Raises:
+        ImageUploadError: If the upload is too large or is not a valid image.
+    """
+    if image_type not in PASS_IMAGE_SPECS:
+        raise ImageUploadError(f"Unsupported image type: {image_type}")
+
+    path, source_hash = await stream_upload_to_disk(
+        upload, settings.UPLOAD_TMP_DIR or tempfile.gettempdir(), settings.MAX_IMAGE_UPLOAD_BYTES
+    )
+    try:
+        loop = asyncio.get_running_loop()
+        with Timer(image_processing_duration, image_type):
+            variants, deduplicated = await loop.run_in_executor(
+                get_process_pool(),
+                render_pass_image_variants,
+                path,
+                source_hash,
+                image_type,
+                settings.STATIC_ROOT,
+            )
+    finally:
+        await _remove_quietly(path)
+
+    if deduplicated:
+        image_processing_cache_hits_total.inc()
+    return {scale: f"{settings.STATIC_URL}/{relative}" for scale, relative in variants.items()}
+
+
+async def _remove_quietly(path: str) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# The functions below run inside process pool workers.
+
+def render_pass_image_variants(
+    source_path: str, source_hash: str, image_type: str, storage_root: str
+) -> Tuple[Dict[str, str], bool]:
+    """
+    Validate an image and write its @1x/@2x/@3x PNG variants to content-addressed storage.
+
+    A manifest keyed by the source hash and image type makes re-uploads of the
+    same file a lookup instead of a resize.
+
+    Returns:
+        tuple: Variant paths relative to `storage_root` keyed by scale, and
+            whether the result came from an existing manifest.
+    """
+    manifest_path = os.path.join(
+        storage_root, "images", "sources", f"{source_hash}-{image_type}.json"
+    )
+    try:
+        with open(manifest_path) as f:
+            return json.load(f), True
+    except (FileNotFoundError, ValueError):
+        pass
+
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(source_path) as probe:
+            image_format = probe.format
+            probe.verify()
+        if image_format not in ALLOWED_IMAGE_FORMATS:
+            raise ImageUploadError(f"Unsupported image format: {image_format}")
+        # verify() leaves the image unusable, so reopen it for processing
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image).convert("RGBA")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ImageUploadError("Uploaded file is not a valid image") from e
+
+    (width, height), mode = PASS_IMAGE_SPECS[image_type]
+    variants = {}
+    for scale in PASS_IMAGE_SCALES:
+        size = (width * scale, height * scale)
+        if mode == "cover":
+            resized = ImageOps.fit(image, size, method=Image.Resampling.LANCZOS)
+        else:
+            resized = ImageOps.contain(image, size, method=Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        resized.save(buffer, format="PNG", optimize=True)
+        variants[f"{scale}x"] = _store_content_addressed(storage_root, buffer.getvalue(), "png")
+
+    _write_atomic(manifest_path, json.dumps(variants).encode())
+    return variants, False
+
+
+def _store_content_addressed(storage_root: str, data: bytes, extension: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    relative = f"images/{digest[:2]}/{digest}.{extension}"
+    path = os.path.join(storage_root, relative)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return relative
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,683 @@
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app.services.metrics import registry
+from app.utils import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Tenant key for jobs not tied to an organization
+GLOBAL_TENANT = "_"
+
+FINISHED_STATUSES = ("completed", "failed")
+
+jobs_total = registry.counter(
+    "jobs_total",
+    "Background job executions, by queue and outcome.",
+    ["queue", "status"],
+)
+job_duration = registry.histogram(
+    "job_duration_seconds",
+    "Time spent executing background jobs.",
+    ["queue"],
+)
+
+
+class Job:
+    """A unit of background work and its progress."""
+
+    def __init__(
+        self,
+        name: str,
+        args: Dict[str, Any],
+        queue: str = "default",
+        organization_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        max_attempts: int = 1,
+        id: Optional[str] = None,
+    ):
+        self.id = id or generate_uuid()
+        self.name = name
+        self.args = args
+        self.queue = queue
+        self.organization_id = organization_id
+        self.idempotency_key = idempotency_key
+        self.status = "queued"
+        self.attempts = 0
+        self.max_attempts = max_attempts
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        # Backend-specific handle used to acknowledge the job (not persisted)
+        self.receipt: Any = None
+
+    @property
+    def tenant(self) -> str:
+        return self.organization_id or GLOBAL_TENANT
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "queue": self.queue,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def dumps(self) -> str:
+        data = self.to_dict()
+        data["args"] = self.args
+        data["idempotency_key"] = self.idempotency_key
+        for name in ("created_at", "started_at", "finished_at"):
+            data[name] = data[name].isoformat() if data[name] else None
+        return json.dumps(data, default=str)
+
+    @classmethod
+    def loads(cls, raw: str) -> "Job":
+        data = json.loads(raw)
+        job = cls(
+            data["name"],
+            data["args"],
+            queue=data["queue"],
+            organization_id=data["organization_id"],
+            idempotency_key=data.get("idempotency_key"),
+            max_attempts=data["max_attempts"],
+            id=data["id"],
+        )
+        for name in ("status", "attempts", "progress", "result", "error"):
+            setattr(job, name, data[name])
+        for name in ("created_at", "started_at", "finished_at"):
+            setattr(job, name, datetime.fromisoformat(data[name]) if data[name] else None)
+        return job
+
+
+class JobContext:
+    """Passed to job handlers to report progress."""
+
+    def __init__(self, job: Job, backend: "JobBackend"):
+        self.job = job
+        self._backend = backend
+
+    async def progress(self, **values: Any) -> None:
+        self.job.progress.update(values)
+        await self._backend.save(self.job)
+
+
+JobFunction = Callable[..., Awaitable[Any]]
+
+
+class JobHandler:
+    def __init__(self, name: str, func: JobFunction, queue: str, max_attempts: int):
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(name: str, queue: str = "default", max_attempts: Optional[int] = None):
+    """
+    Register an async function as the handler of a job type.
+
+    The function is called as `func(ctx, **job.args)`; its return value must be
+    JSON serializable and is stored as the job result.
+    """
+    def decorator(func: JobFunction) -> JobFunction:
+        _handlers[name] = JobHandler(
+            name, func, queue, max_attempts or settings.JOB_MAX_ATTEMPTS
+        )
+        return func
+    return decorator
+
+
+class JobBackend:
+    """Storage and delivery of jobs."""
+
+    # Seconds between `extend` calls while a job runs; None when deliveries never expire
+    heartbeat_interval: Optional[float] = None
+
+    async def enqueue(self, job: Job) -> Job:
+        """Store and queue a job; returns the existing job on an idempotency key hit."""
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def save(self, job: Job) -> None:
+        raise NotImplementedError
+
+    async def reserve(self, queue: str, timeout: float) -> Optional[Job]:
+        """Take the next job of a queue, waiting up to `timeout` seconds."""
+        raise NotImplementedError
+
+    async def complete(self, job: Job) -> None:
+        """Save a finished job and remove it from its queue."""
+        raise NotImplementedError
+
+    async def retry(self, job: Job, delay: float) -> None:
+        """Save a failed job and queue it again after `delay` seconds."""
+        raise NotImplementedError
+
+    async def extend(self, job: Job) -> bool:
+        """
+        Keep a running job's delivery from being handed to another worker.
+
+        Returns:
+            bool: False if another worker has already claimed the delivery.
+        """
+        return True
+
+
+class MemoryJobBackend(JobBackend):
+    """
+    In-process backend for development and tests.
+
+    Each queue keeps one FIFO per tenant and serves tenants round-robin, so
+    one organization's backlog cannot starve the others. Jobs only run in
+    the process that enqueued them.
+    """
+
+    def __init__(self, max_finished_jobs: int = 1000):
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._idempotency: Dict[str, str] = {}
+        self._ready: Dict[str, "OrderedDict[str, Deque[str]]"] = {}
+        self._delayed: List[Tuple[float, str]] = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._max_finished_jobs = max_finished_jobs
+
+    async def enqueue(self, job: Job) -> Job:
+        if job.idempotency_key:
+            existing = self._jobs.get(self._idempotency.get(job.idempotency_key, ""))
+            if existing is not None:
+                return existing
+            self._idempotency[job.idempotency_key] = job.id
+        self._prune()
+        self._jobs[job.id] = job
+        self._push(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    async def reserve(self, queue: str, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        event = self._event(queue)
+        while True:
+            self._promote_delayed()
+            tenants = self._ready.get(queue)
+            if tenants:
+                tenant, job_ids = next(iter(tenants.items()))
+                job_id = job_ids.popleft()
+                # Rotate the tenant to the back of the line
+                del tenants[tenant]
+                if job_ids:
+                    tenants[tenant] = job_ids
+                return self._jobs[job_id]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self._delayed:
+                remaining = min(remaining, max(self._delayed[0][0] - time.time(), 0.01))
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def complete(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    async def retry(self, job: Job, delay: float) -> None:
+        heapq.heappush(self._delayed, (time.time() + delay, job.id))
+        self._event(job.queue).set()
+
+    def _push(self, job: Job) -> None:
+        tenants = self._ready.setdefault(job.queue, OrderedDict())
+        tenants.setdefault(job.tenant, deque()).append(job.id)
+        self._event(job.queue).set()
+
+    def _promote_delayed(self) -> None:
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, job_id = heapq.heappop(self._delayed)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._push(job)
+
+    def _event(self, queue: str) -> asyncio.Event:
+        if queue not in self._events:
+            self._events[queue] = asyncio.Event()
+        return self._events[queue]
+
+    def _prune(self) -> None:
+        # Forget the oldest finished jobs once too many are tracked
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self._max_finished_jobs, 0)]:
+            job = self._jobs.pop(job_id)
+            self._idempotency.pop(job.idempotency_key or "", None)
+
+
+# Queue the job on its tenant's stream and add the tenant to the ring
+_ENQUEUE_SCRIPT = """
+local stream = ARGV[1] .. ARGV[3]
+pcall(redis.call, 'XGROUP', 'CREATE', stream, ARGV[2], '0', 'MKSTREAM')
+redis.call('XADD', stream, '*', 'job', ARGV[4])
+if redis.call('SADD', KEYS[2], ARGV[3]) == 1 then
+  redis.call('RPUSH', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+# Move due retries back onto their streams, then visit tenants round-robin and
+# return the first job found: a delivery abandoned by a dead worker (pending
+# longer than the visibility timeout) or a new one. Tenants whose stream is
+# empty leave the ring.
+_RESERVE_SCRIPT = """
+local ring, members, delayed = KEYS[1], KEYS[2], KEYS[3]
+local prefix, group, consumer = ARGV[1], ARGV[2], ARGV[3]
+local due = redis.call('ZRANGEBYSCORE', delayed, '-inf', ARGV[4], 'LIMIT', 0, 100)
+for _, member in ipairs(due) do
+  redis.call('ZREM', delayed, member)
+  local sep = string.find(member, '|', 1, true)
+  local tenant = string.sub(member, 1, sep - 1)
+  local stream = prefix .. tenant
+  pcall(redis.call, 'XGROUP', 'CREATE', stream, group, '0', 'MKSTREAM')
+  redis.call('XADD', stream, '*', 'job', string.sub(member, sep + 1))
+  if redis.call('SADD', members, tenant) == 1 then
+    redis.call('RPUSH', ring, tenant)
+  end
+end
+for i = 1, redis.call('LLEN', ring) do
+  local tenant = redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+  local stream = prefix .. tenant
+  local entries = redis.call('XAUTOCLAIM', stream, group, consumer, ARGV[5], '0-0', 'COUNT', 1)[2]
+  if #entries == 0 then
+    local read = redis.call('XREADGROUP', 'GROUP', group, consumer, 'COUNT', 1, 'STREAMS', stream, '>')
+    if read and read[1] then
+      entries = read[1][2]
+    end
+  end
+  if #entries > 0 then
+    return {stream, entries[1][1], entries[1][2][2]}
+  end
+  if redis.call('XLEN', stream) == 0 then
+    redis.call('LREM', ring, 0, tenant)
+    redis.call('SREM', members, tenant)
+  end
+end
+return false
+"""
+
+# Reset the idle time of a delivery this consumer still owns, so running jobs
+# are not claimed as abandoned; a delivery claimed by another worker is left alone
+_EXTEND_SCRIPT = """
+local pending = redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[3], ARGV[3], 1)
+if pending[1] and pending[1][2] == ARGV[2] then
+  redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[3], 'JUSTID')
+  return 1
+end
+return 0
+"""
+
+
+class RedisJobBackend(JobBackend):
+    """
+    Redis streams backend shared by the API and `python -m app.worker` processes.
+
+    Every (queue, tenant) pair has its own stream read through a consumer
+    group; workers rotate through the tenants of a queue so organizations
+    are served fairly. Jobs are acknowledged only after they finish, and a
+    delivery left pending longer than the visibility timeout (a worker died)
+    is claimed by another worker; running jobs refresh their delivery every
+    third of the timeout so they are never claimed while alive. Retries wait
+    in a sorted set until due.
+    """
+
+    GROUP = "workers"
+
+    def __init__(self, redis, prefix: str = "jobs", visibility_timeout: float = 300.0,
+                 result_ttl: int = 86400, poll_interval: float = 0.5):
+        self._redis = redis
+        self._prefix = prefix
+        self._visibility_timeout_ms = int(visibility_timeout * 1000)
+        self.heartbeat_interval = visibility_timeout / 3
+        self._result_ttl = result_ttl
+        self._poll_interval = poll_interval
+        self._consumer = generate_uuid()
+        self._enqueue_script = redis.register_script(_ENQUEUE_SCRIPT)
+        self._reserve_script = redis.register_script(_RESERVE_SCRIPT)
+        self._extend_script = redis.register_script(_EXTEND_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self._prefix,) + parts)
+
+    def _queue_keys(self, queue: str) -> List[str]:
+        return [self._key("ring", queue), self._key("tenants", queue), self._key("delayed", queue)]
+
+    async def enqueue(self, job: Job) -> Job:
+        if job.idempotency_key:
+            key = self._key("idempotency", job.idempotency_key)
+            if not await self._redis.set(key, job.id, nx=True, ex=self._result_ttl):
+                existing = await self._redis.get(key)
+                job_found = await self.get(existing.decode()) if existing else None
+                if job_found is not None:
+                    return job_found
+                await self._redis.set(key, job.id, ex=self._result_ttl)
+
+        await self.save(job)
+        await self._enqueue_script(
+            keys=self._queue_keys(job.queue)[:2],
+            args=[self._key("stream", job.queue, ""), self.GROUP, job.tenant, job.id],
+        )
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raw = await self._redis.get(self._key("job", job_id))
+        return Job.loads(raw) if raw else None
+
+    async def save(self, job: Job) -> None:
+        await self._redis.set(
+            self._key("job", job.id),
+            job.dumps(),
+            ex=self._result_ttl if job.finished else None,
+        )
+
+    async def reserve(self, queue: str, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            reserved = await self._reserve_script(
+                keys=self._queue_keys(queue),
+                args=[
+                    self._key("stream", queue, ""),
+                    self.GROUP,
+                    self._consumer,
+                    int(time.time() * 1000),
+                    self._visibility_timeout_ms,
+                ],
+            )
+            if reserved:
+                stream, entry_id, job_id = (value.decode() for value in reserved)
+                job = await self.get(job_id)
+                if job is not None:
+                    job.receipt = (stream, entry_id)
+                    return job
+                # The job record expired; drop the stale delivery
+                await self._ack((stream, entry_id))
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self._poll_interval, remaining))
+
+    async def complete(self, job: Job) -> None:
+        await self.save(job)
+        await self._ack(job.receipt)
+
+    async def retry(self, job: Job, delay: float) -> None:
+        await self.save(job)
+        await self._redis.zadd(
+            self._key("delayed", job.queue),
+            {f"{job.tenant}|{job.id}": int((time.time() + delay) * 1000)},
+        )
+        await self._ack(job.receipt)
+
+    async def extend(self, job: Job) -> bool:
+        if job.receipt is None:
+            return True
+        stream, entry_id = job.receipt
+        return bool(await self._extend_script(keys=[stream], args=[self.GROUP, self._consumer, entry_id]))
+
+    async def _ack(self, receipt: Optional[Tuple[str, str]]) -> None:
+        if receipt is None:
+            return
+        stream, entry_id = receipt
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.xack(stream, self.GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+
+class Worker:
+    """
+    Run jobs from one or more queues.
+
+    Each queue gets its own number of concurrent runners, so slow bulk work
+    cannot occupy the capacity reserved for short jobs.
+    """
+
+    def __init__(self, backend: JobBackend, concurrency: Dict[str, int], poll_timeout: float = 1.0):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self._stopping = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for queue, count in self.concurrency.items():
+            for _ in range(count):
+                self._tasks.append(loop.create_task(self._run(queue)))
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop taking jobs and wait up to `timeout` seconds for running ones to finish."""
+        self._stopping.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, queue: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self.backend.reserve(queue, self.poll_timeout)
+            except Exception:
+                logger.exception("Failed to reserve a job from queue %s", queue)
+                await asyncio.sleep(self.poll_timeout)
+                continue
+            if job is None:
+                continue
+            try:
+                await self.execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # E.g. Redis failing to save or ack: the delivery stays pending
+                # and is reclaimed later, and this runner keeps taking jobs
+                logger.exception("Failed to run job %s (%s)", job.id, job.name)
+                await asyncio.sleep(self.poll_timeout)
+
+    async def execute(self, job: Job) -> None:
+        handler = _handlers.get(job.name)
+        # A delivery reclaimed from a worker that died (or was stopped) during its last attempt
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.error = job.error or f"Interrupted during attempt {job.attempts} of {job.max_attempts}"
+            job.finished_at = datetime.utcnow()
+            await self.backend.complete(job)
+            jobs_total.inc(1, job.queue, job.status)
+            return
+
+        job.attempts += 1
+        job.started_at = datetime.utcnow()
+        job.finished_at = None
+        if handler is None:
+            job.status = "failed"
+            job.error = f"No handler registered for job {job.name}"
+            job.finished_at = datetime.utcnow()
+            await self.backend.complete(job)
+            jobs_total.inc(1, job.queue, job.status)
+            return
+
+        job.status = "running"
+        await self.backend.save(job)
+        heartbeat = None
+        if self.backend.heartbeat_interval:
+            heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job))
+        started = time.perf_counter()
+        try:
+            job.result = await handler.func(JobContext(job, self.backend), **job.args)
+            job.status = "completed"
+            job.error = None
+        except asyncio.CancelledError:
+            # Shutting down: leave the delivery pending so another worker claims it
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed on attempt %d", job.id, job.name, job.attempts)
+            job.error = str(e)
+            job.status = "retrying" if job.attempts < job.max_attempts else "failed"
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            job_duration.observe(time.perf_counter() - started, job.queue)
+
+        jobs_total.inc(1, job.queue, job.status)
+        if job.status == "retrying":
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            await self.backend.retry(job, delay * random.uniform(0.5, 1.5))
+        else:
+            job.finished_at = datetime.utcnow()
+            await self.backend.complete(job)
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.backend.heartbeat_interval)
+            try:
+                if not await self.backend.extend(job):
+                    logger.warning("Job %s (%s) was claimed by another worker while running", job.id, job.name)
+                    return
+            except Exception:
+                logger.exception("Failed to extend the delivery of job %s", job.id)
+
+
+_backend: Optional[JobBackend] = None
+
+
+def get_job_backend() -> JobBackend:
+    """Get the configured job backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.JOB_BACKEND == "redis":
+            from app.services.redis import get_redis
+
+            _backend = RedisJobBackend(
+                get_redis(),
+                visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+                result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+            )
+        else:
+            _backend = MemoryJobBackend()
+    return _backend
+
+
+async def enqueue(
+    name: str,
+    args: Dict[str, Any],
+    organization_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """
+    Queue a job for a registered handler.
+
+    Args:
+        name: Name the handler was registered under.
+        args: JSON-serializable keyword arguments for the handler.
+        organization_id: Tenant the job belongs to, used for fair scheduling.
+        idempotency_key: Jobs enqueued again with the same key return the
+            original job instead of running twice.
+        max_attempts: Overrides the handler's number of attempts.
+
+    Returns:
+        Job: The queued (or previously queued) job.
+    """
+    handler = _handlers[name]
+    if idempotency_key:
+        idempotency_key = f"{name}:{organization_id or GLOBAL_TENANT}:{idempotency_key}"
+    job = Job(
+        name,
+        args,
+        queue=handler.queue,
+        organization_id=organization_id,
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts or handler.max_attempts,
+    )
+    return await get_job_backend().enqueue(job)
+
+
+async def get_job(job_id: str) -> Optional[Job]:
+    return await get_job_backend().get(job_id)
+
+
+def create_worker() -> Worker:
+    return Worker(get_job_backend(), settings.JOB_QUEUE_CONCURRENCY)
+
+
+class PeriodicJob:
+    """
+    Queue a handler's job every `interval` seconds.
+
+    Each API process runs its own schedule; the idempotency key is the
+    interval number, so a shared job backend runs the job once per interval.
+    """
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval - time.time() % self.interval)
+            try:
+                await enqueue(self.name, {}, idempotency_key=str(int(time.time() // self.interval)))
+            except Exception:
+                logger.exception("Failed to queue periodic job %s", self.name)
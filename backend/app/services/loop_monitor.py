@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from app.services.metrics import registry
+
+
+logger = logging.getLogger("app.loop_watchdog")
+
+event_loop_lag = registry.gauge(
+    "event_loop_lag_seconds",
+    "Most recently measured event loop scheduling lag.",
+)
+event_loop_lag_histogram = registry.histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event loop scheduling lag.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_blocked_total = registry.counter(
+    "event_loop_blocked_total",
+    "Times a callback blocked the event loop past the watchdog threshold, by route.",
+    ["route"],
+)
+
+# Scope of the request being served by each task, used to attribute a
+# blocking call to a route. Only populated while the watchdog is enabled.
+active_requests: Dict[asyncio.Task, dict] = {}
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up a sleeping task.
+
+    Any lag beyond the requested sleep means some callback held the loop, so
+    the value approximates the worst blocking time within each interval.
+
+    When `block_threshold` is set, the loop additionally runs a heartbeat
+    callback every `block_threshold / 4` seconds, independently of the lag
+    sampling interval, and a watchdog thread checks it. If the heartbeat is
+    overdue by more than the threshold, the watchdog captures the loop thread's current stack and
+    the route of the running request and logs them once per stall. The thread
+    only wakes every `block_threshold / 2` seconds and does a float comparison,
+    so it can stay enabled in production.
+    """
+
+    def __init__(self, interval: float = 0.5, block_threshold: Optional[float] = None):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._beat_period = 0.0
+        self._beat_handle: Optional[asyncio.TimerHandle] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = self._loop.create_task(self._run())
+
+        if self.block_threshold is not None:
+            self._beat_period = self.block_threshold / 4
+            self._beat()
+            self._stopped.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="event-loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+            self._beat_handle = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _beat(self) -> None:
+        self._last_beat = time.monotonic()
+        self._beat_handle = self._loop.call_later(self._beat_period, self._beat)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - started - self.interval, 0.0)
+            event_loop_lag.set(lag)
+            event_loop_lag_histogram.observe(lag)
+
+    def _watch(self) -> None:
+        reported_beat = None
+        check_interval = max(self.block_threshold / 2, 0.01)
+        while not self._stopped.wait(check_interval):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat - self._beat_period
+            if blocked_for < self.block_threshold or beat == reported_beat:
+                continue
+
+            # Report each stall once, while it is still in progress
+            reported_beat = beat
+            self._report_blocking(blocked_for)
+
+    def _report_blocking(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=30)) if frame else "<unavailable>"
+
+        route = "<unknown>"
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        scope = active_requests.get(task) if task is not None else None
+        if scope is not None:
+            from app.api.middleware import route_template
+
+            route = f"{scope.get('method')} {route_template(scope)}"
+
+        event_loop_blocked_total.inc(1, route)
+        logger.warning(
+            "Event loop blocked for at least %.0f ms (route=%s). Stack of the blocking call:\n%s",
+            blocked_for * 1000,
+            route,
+            stack,
+        )
+
@@ -0,0 +1,266 @@
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Default latency buckets (seconds), roughly exponential from 1ms to 10s
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """
+    Base class for a metric family.
+
+    Updates happen on the event loop thread only, so samples are kept in plain
+    dicts keyed by label values and no lock is taken on the hot path. Each
+    worker process exposes its own samples; Prometheus aggregates across
+    workers at query time.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.extend(extra.items())
+        if not pairs:
+            return ""
+        rendered = ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs)
+        return "{" + rendered + "}"
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{self._format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down.
+
+    A gauge can also be backed by a callback, which is evaluated only when the
+    registry is rendered (e.g. for connection pool statistics).
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Dict[LabelValues, float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception:
+                # A failing collector must never break the scrape
+                pass
+        for labels, value in values.items():
+            yield f"{self.name}{self._format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets.
+
+    Observations increment a single (non-cumulative) bucket; cumulative counts
+    are only computed at render time, keeping `observe` to one bisect and a
+    couple of additions.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def sum(self, *labels: str) -> float:
+        return self._sums.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket{self._format_labels(labels, {'le': _format_value(bound)})} "
+                    f"{cumulative}"
+                )
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{self._format_labels(labels, {'le': '+Inf'})} {cumulative}"
+            yield f"{self.name}_count{self._format_labels(labels)} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(labels)} {_format_value(self._sums[labels])}"
+
+
+class MetricsRegistry:
+    """Collection of metric families rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"Metric {metric.name} already registered with a different type")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback=callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metric families in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in list(self._metrics.values())) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Timer:
+    """Context manager observing elapsed wall time into a histogram."""
+
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, *labels: str):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+
+# Shared application metrics
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed.",
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+)
+cache_requests_total = registry.counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss).",
+    ["cache", "result"],
+)
+pass_generation_duration = registry.histogram(
+    "pass_generation_seconds",
+    "Time spent generating wallet pass files.",
+    ["platform"],
+)
+campaign_executions_total = registry.counter(
+    "campaign_executions_total",
+    "Campaign executions started.",
+    ["mode"],
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a cache lookup; the hit ratio is derived from the hit/miss counters."""
+    cache_requests_total.inc(1, cache, "hit" if hit else "miss")
@@ -0,0 +1,216 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import zipfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.settings import settings
+from app.services.metrics import record_cache_lookup
+from app.utils import static_file_path
+
+
+logger = logging.getLogger(__name__)
+
+PASS_STYLES = {"generic", "coupon", "eventTicket", "boardingPass", "storeCard"}
+PASS_FIELD_LISTS = {
+    "header_fields": "headerFields",
+    "primary_fields": "primaryFields",
+    "secondary_fields": "secondaryFields",
+    "auxiliary_fields": "auxiliaryFields",
+    "back_fields": "backFields",
+}
+PASS_IMAGE_TYPES = ("icon", "logo", "strip", "footer", "background")
+
+# Built bundles keyed by pass id, update tag and modification time. A template
+# edit bumps the tag of the passes it affects, so stale bundles are never
+# served and unaffected passes keep their cached bundle.
+_bundles: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+_BUNDLE_CACHE_SIZE = 512
+
+# Parsed signing credentials with the modification times of their files
+_credentials: Optional[Tuple[Tuple[float, ...], Tuple[Any, Any, Any]]] = None
+
+
+def bundle_cache_key(db_pass: Any) -> Tuple[str, str, str]:
+    return (db_pass.id, db_pass.last_updated_tag or "", str(db_pass.updated_at))
+
+
+async def get_pass_bundle(db_pass: Any, template: Any) -> bytes:
+    """
+    Get the .pkpass bundle of a pass, building it on first fetch after a change.
+
+    Bundles are never regenerated eagerly when a template changes; the first
+    device fetch after an update builds and caches the new version.
+
+    Args:
+        db_pass: The WalletPass to bundle.
+        template: The template the pass is built from.
+
+    Returns:
+        bytes: The zipped pass bundle.
+    """
+    key = bundle_cache_key(db_pass)
+    bundle = _bundles.get(key)
+    if bundle is not None:
+        _bundles.move_to_end(key)
+        record_cache_lookup("pass_bundle", True)
+        return bundle
+
+    record_cache_lookup("pass_bundle", False)
+    pass_json = build_pass_json(db_pass, template)
+    images = _template_image_paths(template)
+    bundle = await run_in_threadpool(build_pass_bundle, pass_json, images)
+
+    _bundles[key] = bundle
+    if len(_bundles) > _BUNDLE_CACHE_SIZE:
+        _bundles.popitem(last=False)
+    return bundle
+
+
+def build_pass_json(db_pass: Any, template: Any) -> Dict[str, Any]:
+    """Render pass.json from the template with the pass' `pass_data` overrides applied."""
+    overrides = db_pass.pass_data or {}
+    style = template.pass_type if template.pass_type in PASS_STYLES else "generic"
+
+    structure = {}
+    for attribute, name in PASS_FIELD_LISTS.items():
+        fields = []
+        for item in getattr(template, attribute, None) or []:
+            if not isinstance(item, dict) or "key" not in item:
+                continue
+            item = dict(item)
+            if item["key"] in overrides:
+                item["value"] = overrides[item["key"]]
+            item.setdefault("value", "")
+            fields.append(item)
+        if fields:
+            structure[name] = fields
+
+    pass_json = {
+        "formatVersion": 1,
+        "passTypeIdentifier": db_pass.pass_type_identifier,
+        "serialNumber": db_pass.serial_number,
+        "teamIdentifier": settings.APPLE_TEAM_IDENTIFIER,
+        "organizationName": template.name,
+        "description": template.description or template.name,
+        style: structure,
+    }
+    for attribute, name in (
+        ("background_color", "backgroundColor"),
+        ("foreground_color", "foregroundColor"),
+        ("label_color", "labelColor"),
+    ):
+        value = getattr(template, attribute, None)
+        if value:
+            pass_json[name] = value
+    if settings.PASS_WEB_SERVICE_URL:
+        pass_json["webServiceURL"] = settings.PASS_WEB_SERVICE_URL
+        pass_json["authenticationToken"] = db_pass.authentication_token
+    if db_pass.expiration_date:
+        pass_json["expirationDate"] = db_pass.expiration_date.isoformat() + "Z"
+    if db_pass.is_voided:
+        pass_json["voided"] = True
+    return pass_json
+
+
+def _template_image_paths(template: Any) -> Dict[str, str]:
+    # Map bundle file names (icon.png, icon@2x.png, ...) to files in STATIC_ROOT
+    images = ((template.design or {}).get("images") or {})
+    paths = {}
+    for image_type in PASS_IMAGE_TYPES:
+        variants = images.get(image_type) or {}
+        if not variants and getattr(template, f"{image_type}_image", None):
+            variants = {"1x": getattr(template, f"{image_type}_image")}
+        for scale, url in variants.items():
+            path = static_file_path(url, settings.STATIC_URL, settings.STATIC_ROOT)
+            if path is None:
+                continue
+            suffix = "" if scale == "1x" else f"@{scale}"
+            paths[f"{image_type}{suffix}.png"] = path
+    return paths
+
+
+def build_pass_bundle(pass_json: Dict[str, Any], images: Dict[str, str]) -> bytes:
+    """Zip pass.json, images and the manifest (and its signature, when certificates are configured)."""
+    files = {"pass.json": json.dumps(pass_json, separators=(",", ":")).encode()}
+    for name, path in images.items():
+        try:
+            with open(path, "rb") as f:
+                files[name] = f.read()
+        except OSError:
+            logger.warning("Pass image %s is missing", path)
+
+    manifest = json.dumps(
+        {name: hashlib.sha1(data).hexdigest() for name, data in files.items()},
+        separators=(",", ":"),
+    ).encode()
+    files["manifest.json"] = manifest
+    signature = _sign_manifest(manifest)
+    if signature is not None:
+        files["signature"] = signature
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def load_signing_credentials() -> Optional[Tuple[Any, Any, Any]]:
+    """
+    Load the pass signing certificate, private key and WWDR certificate.
+
+    They are parsed once and reused until one of the files changes (e.g. a
+    renewed certificate); the API loads them at startup.
+
+    Returns:
+        tuple: The certificate, key and WWDR certificate, or None when a
+        file is missing.
+    """
+    global _credentials
+    paths = (
+        settings.APPLE_CERTIFICATE_PATH,
+        settings.APPLE_PRIVATE_KEY_PATH,
+        settings.APPLE_WWDR_CERTIFICATE_PATH,
+    )
+    try:
+        mtimes = tuple(os.stat(path).st_mtime for path in paths)
+    except OSError:
+        return None
+    if _credentials is not None and _credentials[0] == mtimes:
+        return _credentials[1]
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
+    with open(paths[0], "rb") as f:
+        certificate = x509.load_pem_x509_certificate(f.read())
+    with open(paths[1], "rb") as f:
+        key = serialization.load_pem_private_key(f.read(), password=None)
+    with open(paths[2], "rb") as f:
+        wwdr = x509.load_pem_x509_certificate(f.read())
+    _credentials = (mtimes, (certificate, key, wwdr))
+    return _credentials[1]
+
+
+def _sign_manifest(manifest: bytes) -> Optional[bytes]:
+    credentials = load_signing_credentials()
+    if credentials is None:
+        return None
+
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.serialization import pkcs7
+
+    certificate, key, wwdr = credentials
+    return (
+        pkcs7.PKCS7SignatureBuilder()
+        .set_data(manifest)
+        .add_signer(certificate, key, hashes.SHA256())
+        .add_certificate(wwdr)
+        .sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.DetachedSignature])
+    )
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import logging
+import secrets
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from sqlalchemy import and_, cast, exists, func, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.campaign import Campaign
+from app.database.models.customer import Customer
+from app.database.models.wallet_pass import WalletPass
+from app.database.models.wallet_pass_template import WalletPassTemplate
+from app.services.analytics import event_row, insert_events
+from app.services.jobs import Job, JobContext, enqueue, job_handler
+from app.services.metrics import registry
+from app.services.quotas import reserve
+from app.utils import generate_update_tag, generate_uuid
+
+if TYPE_CHECKING:
+    # The API schemas are only needed at runtime by run_batch_issue
+    from app.database.schema.wallet_pass import WalletPassBatchCreate
+
+
+logger = logging.getLogger(__name__)
+
+# Rows per multi-row INSERT; keeps bind parameters well below the asyncpg limit
+INSERT_CHUNK_SIZE = 1000
+
+passes_issued_total = registry.counter(
+    "passes_issued_total",
+    "Wallet passes issued, by issuance path.",
+    ["path"],
+)
+
+
+def eligible_customers_query(
+    organization_id: str,
+    batch: WalletPassBatchCreate,
+    customer_ids: Optional[List[str]] = None,
+    job_id: Optional[str] = None,
+):
+    """
+    Build a select of customer ids that can receive a pass from this batch.
+
+    Template (and campaign) ownership are checked in the same statement by
+    joining on the organization, so the happy path needs one round-trip.
+    With `job_id`, customers already holding a pass from that batch job are
+    left out, so a job run again continues where earlier runs stopped.
+    """
+    query = (
+        select(Customer.id)
+        .join(
+            WalletPassTemplate,
+            and_(
+                WalletPassTemplate.id == batch.template_id,
+                WalletPassTemplate.organization_id == Customer.organization_id,
+                WalletPassTemplate.is_archived.is_(False),
+            ),
+        )
+        .where(Customer.organization_id == organization_id, Customer.deleted_at.is_(None))
+    )
+    if batch.campaign_id:
+        query = query.where(
+            exists().where(
+                Campaign.id == batch.campaign_id,
+                Campaign.organization_id == organization_id,
+            )
+        )
+    if customer_ids is not None:
+        query = query.where(Customer.id.in_(customer_ids))
+    if batch.audience is not None:
+        if batch.audience.is_active is not None:
+            query = query.where(Customer.is_active.is_(batch.audience.is_active))
+        if batch.audience.tags:
+            query = query.where(cast(Customer.tags, JSONB).contains(batch.audience.tags))
+    if batch.skip_existing:
+        query = query.where(
+            ~exists().where(
+                WalletPass.customer_id == Customer.id,
+                WalletPass.template_id == batch.template_id,
+                WalletPass.is_voided.is_(False),
+            )
+        )
+    if job_id is not None:
+        query = query.where(
+            ~exists().where(WalletPass.customer_id == Customer.id, WalletPass.batch_job_id == job_id)
+        )
+    return query
+
+
+async def count_eligible_customers(
+    db: AsyncSession, organization_id: str, batch: WalletPassBatchCreate
+) -> int:
+    """Validate a batch and count the customers that will receive a pass."""
+    query = eligible_customers_query(organization_id, batch, batch.customer_ids)
+    return (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+
+
+def build_pass_rows(
+    organization_id: str,
+    batch: WalletPassBatchCreate,
+    customer_ids: List[str],
+    job_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Generate serial numbers and authentication tokens for a chunk of customers."""
+    tag = generate_update_tag()
+    return [
+        {
+            "id": generate_uuid(),
+            "serial_number": str(uuid.uuid4()),
+            "authentication_token": secrets.token_hex(16),
+            "pass_type_identifier": settings.APPLE_PASS_TYPE_IDENTIFIER,
+            "organization_id": organization_id,
+            "template_id": batch.template_id,
+            "customer_id": customer_id,
+            "campaign_id": batch.campaign_id,
+            "batch_job_id": job_id,
+            "pass_data": batch.pass_data,
+            "expiration_date": batch.expiration_date,
+            "is_voided": False,
+            "is_redeemed": False,
+            "last_updated_tag": tag,
+        }
+        for customer_id in customer_ids
+    ]
+
+
+async def issue_pass_chunk(
+    db: AsyncSession,
+    organization_id: str,
+    batch: WalletPassBatchCreate,
+    customer_ids: List[str],
+    job_id: Optional[str] = None,
+) -> int:
+    """
+    Insert passes for a chunk of eligible customers with a single multi-row INSERT.
+
+    Passes are tagged with `job_id` and customers that already hold a pass
+    from that job are skipped by the unique (batch_job_id, customer_id)
+    index, which also makes a concurrent run of the same job wait for this
+    transaction. The inserted passes are counted against the organization's
+    pass quota in the same transaction; `QuotaExceeded` is raised if they
+    do not fit.
+
+    Returns:
+        int: Number of passes inserted.
+    """
+    if not customer_ids:
+        return 0
+    rows = build_pass_rows(organization_id, batch, customer_ids, job_id)
+    # No conflict target: the index gains organization_id on partitioned tables
+    inserted = (
+        await db.execute(
+            insert(WalletPass.__table__)
+            .values(rows)
+            .on_conflict_do_nothing()
+            .returning(WalletPass.__table__.c.id, WalletPass.__table__.c.customer_id)
+        )
+    ).all()
+    await reserve(db, organization_id, "passes", len(inserted))
+    await insert_events(db, [
+        event_row(
+            "send",
+            organization_id,
+            campaign_id=batch.campaign_id,
+            wallet_pass_id=pass_id,
+            customer_id=customer_id,
+        )
+        for pass_id, customer_id in inserted
+    ])
+    return len(inserted)
+
+
+async def _eligible_chunks(
+    db: AsyncSession, organization_id: str, batch: WalletPassBatchCreate, job_id: str
+):
+    if batch.customer_ids is not None:
+        for start in range(0, len(batch.customer_ids), INSERT_CHUNK_SIZE):
+            requested = batch.customer_ids[start:start + INSERT_CHUNK_SIZE]
+            query = eligible_customers_query(organization_id, batch, requested, job_id)
+            eligible = list((await db.execute(query)).scalars())
+            # Customers served by an earlier run of this job are not skipped ones
+            served = (
+                await db.execute(
+                    select(func.count()).where(
+                        WalletPass.batch_job_id == job_id, WalletPass.customer_id.in_(requested)
+                    )
+                )
+            ).scalar_one()
+            yield eligible, len(requested) - len(eligible) - served
+        return
+
+    # Audience query: keyset pagination over customer ids
+    last_id = None
+    while True:
+        query = eligible_customers_query(organization_id, batch, job_id=job_id)
+        if last_id is not None:
+            query = query.where(Customer.id > last_id)
+        query = query.order_by(Customer.id).limit(INSERT_CHUNK_SIZE)
+        eligible = list((await db.execute(query)).scalars())
+        if not eligible:
+            return
+        last_id = eligible[-1]
+        yield eligible, 0
+
+
+@job_handler("passes.batch_issue", queue="bulk")
+async def run_batch_issue(
+    ctx: JobContext, organization_id: str, batch: Dict[str, Any], total: int
+) -> Dict[str, Any]:
+    """
+    Issue the passes of a batch job chunk by chunk, committing after each chunk.
+
+    Idempotent however many times the job runs, even concurrently: passes
+    carry the job id, and customers holding a pass from this job are
+    neither selected nor inserted again. A retried attempt resumes where the
+    previous one stopped and counts the passes it already issued.
+    """
+    from app.database.schema.wallet_pass import WalletPassBatchCreate
+
+    batch = WalletPassBatchCreate(**batch)
+    job_id = ctx.job.id
+    started = time.perf_counter()
+    async with sessionmanager.session() as db:
+        issued = (
+            await db.execute(select(func.count()).where(WalletPass.batch_job_id == job_id))
+        ).scalar_one()
+        skipped = 0
+        async for eligible, chunk_skipped in _eligible_chunks(db, organization_id, batch, job_id):
+            chunk_issued = await issue_pass_chunk(db, organization_id, batch, eligible, job_id)
+            await db.commit()
+            issued += chunk_issued
+            skipped += chunk_skipped
+            passes_issued_total.inc(chunk_issued, "batch")
+            await ctx.progress(issued=issued, skipped=skipped)
+    # Pass bundles are generated on download, so nothing else is queued here
+    elapsed = time.perf_counter() - started
+    return {"issued": issued, "skipped": skipped, "elapsed": round(elapsed, 3)}
+
+
+async def start_batch_issue(
+    organization_id: str,
+    batch: WalletPassBatchCreate,
+    total: int,
+    idempotency_key: Optional[str] = None,
+) -> Job:
+    """Queue a batch issuance job."""
+    return await enqueue(
+        "passes.batch_issue",
+        {"organization_id": organization_id, "batch": batch.model_dump(mode="json"), "total": total},
+        organization_id=organization_id,
+        idempotency_key=idempotency_key,
+    )
+
+
+def batch_job_status(job: Job) -> Dict[str, Any]:
+    """Describe a batch issuance job in the shape of `WalletPassBatchJob`."""
+    result = job.result or {}
+    issued = job.progress.get("issued", 0)
+    rate = None
+    if result.get("elapsed"):
+        rate = round(result["issued"] / result["elapsed"], 1)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "template_id": job.args["batch"]["template_id"],
+        "total": job.args["total"],
+        "issued": issued,
+        "skipped": job.progress.get("skipped", 0),
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "passes_per_second": rate,
+    }
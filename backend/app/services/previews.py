@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.settings import settings
+from app.services.images import get_process_pool
+from app.services.metrics import Timer, record_cache_lookup, registry
+from app.utils import static_file_path
+
+
+# Template attributes that affect how a preview looks. Any change to one of
+# these produces a new preview hash, so stale previews are never served.
+PREVIEW_INPUT_FIELDS = (
+    "name",
+    "pass_type",
+    "background_color",
+    "foreground_color",
+    "label_color",
+    "logo_image",
+    "icon_image",
+    "strip_image",
+    "footer_image",
+    "background_image",
+    "header_fields",
+    "primary_fields",
+    "secondary_fields",
+    "auxiliary_fields",
+)
+# Bump to invalidate every cached preview when the renderer changes
+PREVIEW_RENDERER_VERSION = 1
+
+# Rendered at @2x of a 320x420pt pass
+PREVIEW_SCALE = 2
+PREVIEW_SIZE = (320, 420)
+
+preview_render_duration = registry.histogram(
+    "template_preview_render_seconds",
+    "Time spent rendering template preview images (including pool queueing).",
+)
+
+# Hashes known to be rendered in this process, to skip the filesystem check
+_rendered: "OrderedDict[str, None]" = OrderedDict()
+_RENDERED_CACHE_SIZE = 4096
+# In-flight renders, so concurrent requests for the same preview render once
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def preview_inputs(template: Any) -> Dict[str, Any]:
+    """Collect the design inputs of a template that determine its preview."""
+    inputs = {field: getattr(template, field, None) for field in PREVIEW_INPUT_FIELDS}
+    inputs["renderer_version"] = PREVIEW_RENDERER_VERSION
+    return inputs
+
+
+def preview_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a template's design inputs."""
+    encoded = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def preview_relative_path(digest: str) -> str:
+    return f"previews/{digest[:2]}/{digest}.png"
+
+
+def preview_url(digest: str) -> str:
+    return f"{settings.STATIC_URL}/{preview_relative_path(digest)}"
+
+
+def preview_path(digest: str) -> str:
+    return os.path.join(settings.STATIC_ROOT, preview_relative_path(digest))
+
+
+async def ensure_template_preview(template: Any) -> str:
+    """
+    Make sure the preview for the template's current design exists.
+
+    Previews are cached on disk by the hash of the design inputs, so editing a
+    template (`update_pass_template`, `upload_template_image`) simply changes
+    the hash and the new preview is rendered on the next view. Repeat views
+    cost a hash and a set lookup.
+
+    Args:
+        template: The WalletPassTemplate to preview.
+
+    Returns:
+        str: The content hash identifying the rendered preview.
+    """
+    inputs = preview_inputs(template)
+    digest = preview_hash(inputs)
+
+    if digest in _rendered:
+        _rendered.move_to_end(digest)
+        record_cache_lookup("template_preview", True)
+        return digest
+
+    path = preview_path(digest)
+    if os.path.exists(path):
+        record_cache_lookup("template_preview", True)
+        _remember(digest)
+        return digest
+
+    record_cache_lookup("template_preview", False)
+    pending = _pending.get(digest)
+    if pending is None:
+        loop = asyncio.get_running_loop()
+        pending = _pending[digest] = loop.create_future()
+        try:
+            with Timer(preview_render_duration):
+                await loop.run_in_executor(
+                    get_process_pool(),
+                    render_template_preview,
+                    inputs,
+                    path,
+                    settings.STATIC_ROOT,
+                    settings.STATIC_URL,
+                )
+            _remember(digest)
+            pending.set_result(digest)
+        except BaseException as e:
+            pending.set_exception(e)
+            # Mark the exception retrieved when nobody else is waiting on it
+            pending.exception()
+            raise
+        finally:
+            _pending.pop(digest, None)
+        return digest
+
+    return await asyncio.shield(pending)
+
+
+def _remember(digest: str) -> None:
+    _rendered[digest] = None
+    if len(_rendered) > _RENDERED_CACHE_SIZE:
+        _rendered.popitem(last=False)
+
+
+def preload_rendered_previews() -> int:
+    """
+    Fill the rendered-preview cache from disk, most recent previews last.
+
+    Runs at startup (in a thread), so the first views of existing previews
+    skip the filesystem check.
+
+    Returns:
+        int: Number of previews cached.
+    """
+    directory = os.path.join(settings.STATIC_ROOT, "previews")
+    previews = []
+    try:
+        with os.scandir(directory) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".png"):
+                            previews.append((entry.stat().st_mtime, entry.name[:-len(".png")]))
+    except FileNotFoundError:
+        return 0
+
+    previews.sort()
+    for _, digest in previews[-_RENDERED_CACHE_SIZE:]:
+        _remember(digest)
+    return min(len(previews), _RENDERED_CACHE_SIZE)
+
+
+# The functions below run inside process pool workers.
+
+def render_template_preview(
+    inputs: Dict[str, Any], output_path: str, storage_root: str, static_url: str
+) -> None:
+    """Composite a template's colors, images and fields into a PNG preview."""
+    from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps
+
+    scale = PREVIEW_SCALE
+    width, height = PREVIEW_SIZE[0] * scale, PREVIEW_SIZE[1] * scale
+    padding = 12 * scale
+
+    def color(value: Optional[str], default: str):
+        try:
+            return ImageColor.getrgb(value) if value else ImageColor.getrgb(default)
+        except ValueError:
+            return ImageColor.getrgb(default)
+
+    def load_image(url: Optional[str]):
+        path = static_file_path(url, static_url, storage_root)
+        if path is None:
+            return None
+        try:
+            with Image.open(path) as image:
+                return image.convert("RGBA")
+        except (OSError, ValueError):
+            return None
+
+    background = color(inputs.get("background_color"), "#ffffff")
+    foreground = color(inputs.get("foreground_color"), "#000000")
+    label = color(inputs.get("label_color"), "#666666")
+
+    canvas = Image.new("RGBA", (width, height), background + (255,))
+    background_image = load_image(inputs.get("background_image"))
+    if background_image is not None:
+        canvas.alpha_composite(ImageOps.fit(background_image, (width, height)))
+
+    draw = ImageDraw.Draw(canvas)
+    label_font = ImageFont.load_default(size=9 * scale)
+    value_font = ImageFont.load_default(size=13 * scale)
+    primary_font = ImageFont.load_default(size=24 * scale)
+
+    # Header: logo on the left, header fields on the right
+    y = padding
+    header_height = 25 * scale
+    logo = load_image(inputs.get("logo_image"))
+    if logo is not None:
+        logo = ImageOps.contain(logo, (80 * scale, header_height))
+        canvas.alpha_composite(logo, (padding, y))
+    else:
+        draw.text((padding, y), inputs.get("name") or "", fill=foreground, font=value_font)
+
+    x = width - padding
+    for field in reversed(_fields(inputs.get("header_fields"))[:2]):
+        field_width = max(
+            draw.textlength(field["label"], font=label_font),
+            draw.textlength(field["value"], font=value_font),
+        )
+        x -= int(field_width)
+        draw.text((x, y), field["label"], fill=label, font=label_font)
+        draw.text((x, y + 11 * scale), field["value"], fill=foreground, font=value_font)
+        x -= padding
+    y += header_height + padding
+
+    # Strip image with primary fields drawn over it
+    strip_height = 123 * scale * width // (375 * scale)
+    strip = load_image(inputs.get("strip_image"))
+    if strip is not None:
+        canvas.alpha_composite(ImageOps.fit(strip, (width, strip_height)), (0, y))
+    primary_y = y + padding
+    for field in _fields(inputs.get("primary_fields"))[:1]:
+        draw.text((padding, primary_y), field["label"], fill=label, font=label_font)
+        draw.text((padding, primary_y + 12 * scale), field["value"], fill=foreground, font=primary_font)
+    y += (strip_height if strip is not None else 60 * scale) + padding
+
+    # Secondary and auxiliary rows
+    for row in ("secondary_fields", "auxiliary_fields"):
+        fields = _fields(inputs.get(row))[:4]
+        if not fields:
+            continue
+        column_width = (width - 2 * padding) // len(fields)
+        for index, field in enumerate(fields):
+            fx = padding + index * column_width
+            draw.text((fx, y), field["label"], fill=label, font=label_font)
+            draw.text((fx, y + 12 * scale), field["value"], fill=foreground, font=value_font)
+        y += 36 * scale
+
+    footer = load_image(inputs.get("footer_image"))
+    if footer is not None:
+        footer = ImageOps.contain(footer, (286 * scale, 15 * scale))
+        canvas.alpha_composite(footer, ((width - footer.width) // 2, height - 100 * scale))
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    canvas.convert("RGB").save(tmp_path, format="PNG", optimize=True)
+    os.replace(tmp_path, output_path)
+
+
+def _fields(value: Any) -> List[Dict[str, str]]:
+    fields = []
+    for field in value or []:
+        if isinstance(field, dict):
+            fields.append({
+                "label": str(field.get("label") or "").upper(),
+                "value": str(field.get("value") or ""),
+            })
+    return fields
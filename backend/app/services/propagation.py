@@ -0,0 +1,170 @@
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+from sqlalchemy import and_, cast, or_, update
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models.wallet_pass import WalletPass
+from app.services.metrics import registry
+from app.services.push import push_dispatcher
+from app.utils import generate_update_tag
+
+
+logger = logging.getLogger(__name__)
+
+# Template attributes rendered into every pass built from the template
+TEMPLATE_WIDE_FIELDS = (
+    "name",
+    "description",
+    "pass_type",
+    "design",
+    "background_color",
+    "foreground_color",
+    "label_color",
+    "logo_image",
+    "icon_image",
+    "footer_image",
+    "strip_image",
+    "background_image",
+    "nfc_enabled",
+    "nfc_message",
+    "locations",
+    "expiration_type",
+    "expiration_value",
+)
+# Field definition lists, e.g. [{"key": "points", "label": "Points", "value": 0}].
+# A pass can override a field's value through `pass_data[<key>]`.
+FIELD_LIST_FIELDS = (
+    "header_fields",
+    "primary_fields",
+    "secondary_fields",
+    "auxiliary_fields",
+    "back_fields",
+)
+
+template_passes_invalidated_total = registry.counter(
+    "template_passes_invalidated_total",
+    "Passes whose update tag was bumped by a template change.",
+)
+
+
+class TemplateChange:
+    """
+    What a template edit changed, from the point of view of its passes.
+
+    `affects_all` is set when something every pass renders changed (colors,
+    images, labels, field layout). Otherwise only the default values of
+    `value_keys` changed, which passes overriding all of those keys in their
+    `pass_data` never show.
+    """
+
+    __slots__ = ("affects_all", "value_keys")
+
+    def __init__(self, affects_all: bool = False, value_keys: Iterable[str] = ()):
+        self.affects_all = affects_all
+        self.value_keys: FrozenSet[str] = frozenset(value_keys)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.affects_all and not self.value_keys
+
+
+def template_snapshot(template: Any) -> Dict[str, Any]:
+    """Capture the pass-visible state of a template before it is edited."""
+    return {
+        name: getattr(template, name, None)
+        for name in TEMPLATE_WIDE_FIELDS + FIELD_LIST_FIELDS
+    }
+
+
+def diff_template(before: Dict[str, Any], after: Dict[str, Any]) -> TemplateChange:
+    """Classify the difference between two template snapshots."""
+    if any(before.get(name) != after.get(name) for name in TEMPLATE_WIDE_FIELDS):
+        return TemplateChange(affects_all=True)
+
+    value_keys = set()
+    for name in FIELD_LIST_FIELDS:
+        old_fields, new_fields = before.get(name) or [], after.get(name) or []
+        if old_fields == new_fields:
+            continue
+        old_by_key, new_by_key = _fields_by_key(old_fields), _fields_by_key(new_fields)
+        # Added, removed or reordered fields change the layout of every pass
+        if old_by_key is None or new_by_key is None or list(old_by_key) != list(new_by_key):
+            return TemplateChange(affects_all=True)
+        for key, old_field in old_by_key.items():
+            new_field = new_by_key[key]
+            if old_field == new_field:
+                continue
+            if _without_value(old_field) != _without_value(new_field):
+                return TemplateChange(affects_all=True)
+            value_keys.add(key)
+
+    return TemplateChange(value_keys=value_keys)
+
+
+def _fields_by_key(fields: Any) -> Optional[Dict[str, Dict[str, Any]]]:
+    if not isinstance(fields, list):
+        return None
+    by_key = {}
+    for item in fields:
+        if not isinstance(item, dict) or "key" not in item or item["key"] in by_key:
+            return None
+        by_key[item["key"]] = item
+    return by_key
+
+
+def _without_value(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: value for name, value in item.items() if name != "value"}
+
+
+async def propagate_template_change(
+    db: AsyncSession, template_id: str, change: TemplateChange
+) -> Optional[str]:
+    """
+    Mark the passes affected by a template edit as updated.
+
+    A single set-based UPDATE bumps `last_updated_tag` on the affected passes;
+    bundles are rebuilt lazily when a device next fetches the pass (see
+    `app.services.pass_bundles`). The push fan-out for the bumped passes is
+    queued once the caller commits.
+
+    Args:
+        db: Database session; the caller commits.
+        template_id: The edited template.
+        change: Result of `diff_template`.
+
+    Returns:
+        str: The new update tag, or None if no pass is affected.
+    """
+    if change.is_empty:
+        return None
+
+    tag = generate_update_tag()
+    conditions = [WalletPass.template_id == template_id, WalletPass.is_voided.is_(False)]
+    if not change.affects_all:
+        # Passes overriding every changed value keep rendering the same
+        conditions.append(
+            or_(
+                WalletPass.pass_data.is_(None),
+                ~cast(WalletPass.pass_data, JSONB).has_all(array(sorted(change.value_keys))),
+            )
+        )
+    result = await db.execute(
+        update(WalletPass)
+        .where(and_(*conditions))
+        .values(last_updated_tag=tag)
+        .execution_options(synchronize_session=False)
+    )
+    template_passes_invalidated_total.inc(result.rowcount)
+    logger.info(
+        "Template %s change bumped %d passes (template-wide: %s)",
+        template_id, result.rowcount, change.affects_all,
+    )
+    return tag if result.rowcount else None
+
+
+def notify_template_change(template_id: str, tag: Optional[str]) -> None:
+    """Queue push notifications for the passes bumped by `propagate_template_change`."""
+    if tag is not None:
+        push_dispatcher.notify_template(template_id, since_tag=tag)
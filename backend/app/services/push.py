@@ -0,0 +1,345 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, or_, select, tuple_
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.device_registration import DeviceRegistration
+from app.database.models.wallet_pass import WalletPass
+from app.services.jobs import JobContext, enqueue, job_handler
+from app.services.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+# Device tokens loaded per query while fanning out
+TOKEN_PAGE_SIZE = 1000
+
+push_notifications_total = registry.counter(
+    "push_notifications_total",
+    "Push notifications sent to wallet devices, by result.",
+    ["result"],
+)
+push_send_duration = registry.histogram(
+    "push_send_seconds",
+    "Latency of individual push requests, including retries.",
+)
+push_pending_passes = registry.gauge(
+    "push_pending_passes",
+    "Changed passes waiting for the next coalescing window.",
+)
+
+# (push token, pass type identifier)
+PushTarget = Tuple[str, str]
+
+
+class TokenBucket:
+    """Async token bucket used to bound the outgoing push rate."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ApnsPushProvider:
+    """
+    Send APNs wallet pass update notifications.
+
+    Wallet pushes carry an empty payload: they only tell the device to ask the
+    web service which serial numbers changed. Requests are multiplexed over a
+    small pool of persistent HTTP/2 connections (HTTP/1.1 keep-alive when the
+    `h2` package is unavailable, e.g. against the local mock server).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 4,
+        cert: Optional[Tuple[str, str]] = None,
+        timeout: float = 10.0,
+    ):
+        # Imported here so processes that never push do not load httpx
+        import httpx
+        self._http_error = httpx.HTTPError
+
+        try:
+            import h2  # noqa: F401
+            http2 = base_url.startswith("https://")
+        except ImportError:
+            http2 = False
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            cert=cert,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def send(self, push_token: str, topic: str) -> Optional[int]:
+        """
+        Send a single update notification.
+
+        Returns:
+            int: The HTTP status returned by the push service, or None when
+                the request failed (connection error, timeout).
+        """
+        try:
+            response = await self._client.post(
+                f"/3/device/{push_token}",
+                headers={"apns-topic": topic, "apns-push-type": "alert"},
+                content=b"{}",
+            )
+        except self._http_error:
+            return None
+        return response.status_code
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class PushDispatcher:
+    """
+    Coalesce pass changes and fan push notifications out to registered devices.
+
+    Changes are collected for `coalesce_window` seconds, so a pass edited
+    several times in quick succession produces one notification per device.
+    Each coalesced batch is queued as a `push.dispatch` job, so the fan-out
+    runs on the job workers rather than in the API process. Device tokens
+    are streamed from the database in pages and sent by `max_concurrency`
+    workers at no more than `max_per_second` sends per second, so a template
+    edit touching 500k passes becomes a bounded-rate stream rather than a
+    burst. Transient failures (429, 5xx, network errors) are retried with
+    exponential backoff and jitter; tokens the push service reports as
+    unregistered (410) are removed.
+    """
+
+    def __init__(
+        self,
+        provider_factory,
+        coalesce_window: float = 2.0,
+        max_concurrency: int = 100,
+        max_per_second: float = 1000.0,
+        max_retries: int = 3,
+    ):
+        self._provider_factory = provider_factory
+        self.coalesce_window = coalesce_window
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._rate_limiter = TokenBucket(max_per_second)
+        self._provider: Optional[ApnsPushProvider] = None
+        self._pending_passes: Set[str] = set()
+        # Template id -> oldest update tag to notify (None for every pass)
+        self._pending_templates: Dict[str, Optional[str]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start collecting changes; the fan-out itself runs as `push.dispatch` jobs."""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._provider is not None:
+            await self._provider.aclose()
+            self._provider = None
+
+    def notify_passes(self, pass_ids: Iterable[str]) -> None:
+        """Queue update notifications for the devices registered to these passes."""
+        if not self.running:
+            return
+        self._pending_passes.update(pass_ids)
+        push_pending_passes.set(len(self._pending_passes))
+        self._wakeup.set()
+
+    def notify_template(self, template_id: str, since_tag: Optional[str] = None) -> None:
+        """
+        Queue update notifications for devices holding passes built from this template.
+
+        With `since_tag`, only passes whose `last_updated_tag` is at least that
+        tag are notified; otherwise every pass of the template is.
+        """
+        if not self.running:
+            return
+        if template_id in self._pending_templates:
+            pending = self._pending_templates[template_id]
+            since_tag = None if pending is None or since_tag is None else min(pending, since_tag)
+        self._pending_templates[template_id] = since_tag
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Let further changes to the same passes accumulate
+            await asyncio.sleep(self.coalesce_window)
+            self._wakeup.clear()
+
+            pass_ids, self._pending_passes = self._pending_passes, set()
+            template_ids, self._pending_templates = self._pending_templates, {}
+            push_pending_passes.set(0)
+            try:
+                await enqueue(
+                    "push.dispatch", {"pass_ids": sorted(pass_ids), "templates": template_ids}
+                )
+            except Exception:
+                logger.exception("Failed to queue push dispatch")
+
+    async def dispatch(self, pass_ids: Set[str], template_ids: Dict[str, Optional[str]]) -> None:
+        """Send notifications for the given passes and templates."""
+        if not pass_ids and not template_ids:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=TOKEN_PAGE_SIZE)
+        unregistered: List[str] = []
+        workers = [
+            asyncio.create_task(self._worker(queue, unregistered))
+            for _ in range(self.max_concurrency)
+        ]
+        try:
+            async for targets in self._iter_targets(pass_ids, template_ids):
+                for target in targets:
+                    await queue.put(target)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        if unregistered:
+            async with sessionmanager.session() as db:
+                for start in range(0, len(unregistered), TOKEN_PAGE_SIZE):
+                    await db.execute(
+                        delete(DeviceRegistration).where(
+                            DeviceRegistration.push_token.in_(unregistered[start:start + TOKEN_PAGE_SIZE])
+                        )
+                    )
+
+    async def _iter_targets(
+        self, pass_ids: Set[str], template_ids: Dict[str, Optional[str]]
+    ) -> AsyncIterator[List[PushTarget]]:
+        # A device holding several changed passes of the same type only needs
+        # one push, so targets are deduplicated by the database
+        conditions = []
+        if pass_ids:
+            conditions.append(DeviceRegistration.wallet_pass_id.in_(list(pass_ids)))
+        for template_id, since_tag in template_ids.items():
+            passes = select(WalletPass.id).where(WalletPass.template_id == template_id)
+            if since_tag is not None:
+                passes = passes.where(WalletPass.last_updated_tag >= since_tag)
+            conditions.append(DeviceRegistration.wallet_pass_id.in_(passes))
+        query = (
+            select(DeviceRegistration.push_token, DeviceRegistration.pass_type_identifier)
+            .where(DeviceRegistration.platform == "apple", or_(*conditions))
+            .distinct()
+        )
+
+        # Keyset pagination keeps each page an index range scan
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                page = page.where(
+                    tuple_(DeviceRegistration.push_token, DeviceRegistration.pass_type_identifier) > last
+                )
+            page = page.order_by(
+                DeviceRegistration.push_token, DeviceRegistration.pass_type_identifier
+            ).limit(TOKEN_PAGE_SIZE)
+            async with sessionmanager.session() as db:
+                rows = (await db.execute(page)).all()
+            if not rows:
+                return
+            last = tuple(rows[-1])
+            yield [tuple(row) for row in rows]
+
+    async def _worker(self, queue: asyncio.Queue, unregistered: List[str]) -> None:
+        while (target := await queue.get()) is not None:
+            await self._rate_limiter.acquire()
+            if await self._send_with_retry(*target) == 410:
+                unregistered.append(target[0])
+
+    def _get_provider(self) -> ApnsPushProvider:
+        if self._provider is None:
+            self._provider = self._provider_factory()
+        return self._provider
+
+    async def _send_with_retry(self, push_token: str, topic: str) -> Optional[int]:
+        started = time.perf_counter()
+        status_code = None
+        for attempt in range(self.max_retries + 1):
+            status_code = await self._get_provider().send(push_token, topic)
+            if status_code is not None and status_code < 500 and status_code != 429:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(0.2 * 2 ** attempt, 5.0) * random.uniform(0.5, 1.5))
+
+        push_send_duration.observe(time.perf_counter() - started)
+        if status_code == 200:
+            result = "sent"
+        elif status_code == 410:
+            result = "unregistered"
+        else:
+            result = "failed"
+        push_notifications_total.inc(1, result)
+        return status_code
+
+
+def _apns_provider() -> ApnsPushProvider:
+    cert = None
+    if os.path.exists(settings.APPLE_CERTIFICATE_PATH) and os.path.exists(settings.APPLE_PRIVATE_KEY_PATH):
+        cert = (settings.APPLE_CERTIFICATE_PATH, settings.APPLE_PRIVATE_KEY_PATH)
+    return ApnsPushProvider(
+        settings.PUSH_APNS_URL,
+        max_connections=settings.PUSH_MAX_CONNECTIONS,
+        cert=cert,
+    )
+
+
+push_dispatcher = PushDispatcher(
+    _apns_provider,
+    coalesce_window=settings.PUSH_COALESCE_WINDOW_SECONDS,
+    max_concurrency=settings.PUSH_MAX_CONCURRENCY,
+    max_per_second=settings.PUSH_MAX_PER_SECOND,
+    max_retries=settings.PUSH_MAX_RETRIES,
+)
+
+
+# Individual sends are already retried, so a failed fan-out is not repeated
+@job_handler("push.dispatch", queue="push", max_attempts=1)
+async def run_push_dispatch(
+    ctx: JobContext, pass_ids: List[str], templates: Dict[str, Optional[str]]
+) -> None:
+    await push_dispatcher.dispatch(set(pass_ids), templates)
@@ -0,0 +1,60 @@
+"""
+Local stand-in for the APNs provider API, for testing push fan-out offline.
+
+Run with `python -m app.services.push_mock` and set
+`PUSH_APNS_URL=http://localhost:8090`. Tokens starting with "bad" are
+reported as unregistered (410); `PUSH_MOCK_FAILURE_RATE` and
+`PUSH_MOCK_LATENCY_MS` inject transient 503s and latency. Counters are
+available at `GET /stats`.
+"""
+import asyncio
+import os
+import random
+from collections import Counter
+
+from fastapi import FastAPI, Header, Response, status
+
+
+FAILURE_RATE = float(os.environ.get("PUSH_MOCK_FAILURE_RATE", "0"))
+LATENCY_MS = float(os.environ.get("PUSH_MOCK_LATENCY_MS", "5"))
+
+app = FastAPI(title="Mock APNs")
+stats: Counter = Counter()
+tokens: Counter = Counter()
+
+
+@app.post("/3/device/{push_token}")
+async def push(push_token: str, apns_topic: str = Header(None)) -> Response:
+    stats["requests"] += 1
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000.0)
+    if not apns_topic:
+        stats["bad_request"] += 1
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+    if push_token.startswith("bad"):
+        stats["unregistered"] += 1
+        return Response(status_code=status.HTTP_410_GONE)
+    if random.random() < FAILURE_RATE:
+        stats["unavailable"] += 1
+        return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    stats["delivered"] += 1
+    tokens[push_token] += 1
+    return Response(status_code=status.HTTP_200_OK)
+
+
+@app.get("/stats")
+async def read_stats():
+    return {**stats, "unique_tokens": len(tokens)}
+
+
+@app.delete("/stats")
+async def reset_stats():
+    stats.clear()
+    tokens.clear()
+    return {}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PUSH_MOCK_PORT", "8090")))
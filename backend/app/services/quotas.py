@@ -0,0 +1,258 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.campaign import Campaign
+from app.database.models.customer import Customer
+from app.database.models.organisation import Organization
+from app.database.models.organization_usage import OrganizationUsage
+from app.database.models.wallet_pass import WalletPass
+from app.services.jobs import JobContext, PeriodicJob, job_handler
+from app.services.metrics import registry
+from app.utils import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Counter column of each quota-limited resource
+RESOURCES = {
+    "passes": OrganizationUsage.active_passes,
+    "customers": OrganizationUsage.customers,
+    "campaigns": OrganizationUsage.campaigns,
+}
+# Organization column holding a resource's limit; other resources are only counted
+LIMITS = {
+    "passes": Organization.max_passes,
+}
+RECONCILE_PAGE_SIZE = 500
+
+quota_rejections_total = registry.counter(
+    "quota_rejections_total",
+    "Creates rejected because an organization reached its quota, by resource.",
+    ["resource"],
+)
+quota_drift_total = registry.counter(
+    "quota_drift_total",
+    "Absolute counter corrections made by quota reconciliation, by resource.",
+    ["resource"],
+)
+
+
+class QuotaExceeded(Exception):
+    """Raised when a create would take an organization over its quota."""
+
+    def __init__(self, resource: str, limit: int):
+        super().__init__(f"Your organization has reached its limit of {limit} {resource}")
+        self.resource = resource
+        self.limit = limit
+
+
+def counts_as_campaign(campaign_status: Optional[str]) -> bool:
+    """Cancelled campaigns (deleting a campaign cancels it) do not count."""
+    return campaign_status != "cancelled"
+
+
+def _count_queries(organization_id: str) -> Dict[str, Any]:
+    return {
+        "passes": select(func.count()).select_from(WalletPass).where(
+            WalletPass.organization_id == organization_id,
+            WalletPass.is_voided.is_(False),
+            WalletPass.deleted_at.is_(None),
+        ),
+        "customers": select(func.count()).select_from(Customer).where(
+            Customer.organization_id == organization_id,
+            Customer.deleted_at.is_(None),
+        ),
+        "campaigns": select(func.count()).select_from(Campaign).where(
+            Campaign.organization_id == organization_id,
+            or_(Campaign.status.is_(None), Campaign.status != "cancelled"),
+            Campaign.deleted_at.is_(None),
+        ),
+    }
+
+
+async def ensure_usage(db: AsyncSession, organization_id: str) -> bool:
+    """
+    Create an organization's usage row if it has none, seeding each counter
+    with one COUNT.
+
+    Returns:
+        bool: Whether a row was created.
+    """
+    counts = _count_queries(organization_id)
+    result = await db.execute(
+        insert(OrganizationUsage)
+        .values(
+            id=generate_uuid(),
+            organization_id=organization_id,
+            reconciled_at=datetime.utcnow(),
+            **{
+                counter.key: counts[resource].scalar_subquery()
+                for resource, counter in RESOURCES.items()
+            },
+        )
+        .on_conflict_do_nothing(index_elements=[OrganizationUsage.organization_id])
+    )
+    return bool(result.rowcount)
+
+
+async def get_usage(db: AsyncSession, organization_id: str) -> OrganizationUsage:
+    """Get an organization's usage counters, creating them on first use."""
+    usage = await OrganizationUsage.get(db, organization_id=organization_id)
+    if usage is None:
+        await ensure_usage(db, organization_id)
+        usage = await OrganizationUsage.get(db, organization_id=organization_id)
+    return usage
+
+
+async def _get_limit(db: AsyncSession, organization_id: str, resource: str) -> Optional[int]:
+    column = LIMITS.get(resource)
+    if column is None:
+        return None
+    return (await db.execute(select(column).where(Organization.id == organization_id))).scalar()
+
+
+async def remaining_quota(db: AsyncSession, organization_id: str, resource: str) -> Optional[int]:
+    """
+    How many more of a resource an organization can create.
+
+    Returns:
+        Optional[int]: The remaining quota, or None if the resource is unlimited.
+    """
+    limit = await _get_limit(db, organization_id, resource)
+    if limit is None:
+        return None
+    usage = await get_usage(db, organization_id)
+    return max(limit - getattr(usage, RESOURCES[resource].key), 0)
+
+
+async def reserve(db: AsyncSession, organization_id: str, resource: str, amount: int = 1) -> None:
+    """
+    Count `amount` new resources against an organization's quota.
+
+    The check and the increment are a single conditional UPDATE of the
+    organization's counter row, so the cost does not depend on how many rows
+    the organization has. The row stays locked until the caller commits,
+    which serializes concurrent creates of the same organization; call this
+    in the same transaction as the insert so a rollback also undoes the
+    reservation.
+
+    Args:
+        db: Database session; the caller commits.
+        organization_id: The organization creating the resources.
+        resource: One of RESOURCES.
+        amount: Number of resources being created.
+
+    Raises:
+        QuotaExceeded: If the organization does not have `amount` left.
+    """
+    if amount <= 0:
+        return
+    counter = RESOURCES[resource]
+    conditions = [OrganizationUsage.organization_id == organization_id]
+    limit_column = LIMITS.get(resource)
+    if limit_column is not None:
+        limit = select(limit_column).where(Organization.id == organization_id).scalar_subquery()
+        conditions.append(or_(limit.is_(None), counter + amount <= limit))
+    statement = (
+        update(OrganizationUsage)
+        .where(*conditions)
+        .values({counter.key: counter + amount})
+        .execution_options(synchronize_session=False)
+    )
+
+    if (await db.execute(statement)).rowcount:
+        return
+    # No counter row yet: create it, or wait for a concurrent transaction that
+    # is creating it to commit, and check the seeded counts on the retry.
+    # Unlimited resources are only counted; reconciliation fixes any miss.
+    await ensure_usage(db, organization_id)
+    if (await db.execute(statement)).rowcount or limit_column is None:
+        return
+
+    quota_rejections_total.inc(1, resource)
+    raise QuotaExceeded(resource, await _get_limit(db, organization_id, resource))
+
+
+async def release(db: AsyncSession, organization_id: str, resource: str, amount: int = 1) -> None:
+    """Return quota when resources are voided or deleted, in the caller's transaction."""
+    if amount <= 0:
+        return
+    counter = RESOURCES[resource]
+    await db.execute(
+        update(OrganizationUsage)
+        .where(OrganizationUsage.organization_id == organization_id)
+        .values({counter.key: func.greatest(counter - amount, 0)})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reconcile_usage(db: AsyncSession, organization_id: str) -> Dict[str, int]:
+    """
+    Recount an organization's resources and correct its counters.
+
+    Returns:
+        Dict[str, int]: The correction applied to each counter.
+    """
+    await ensure_usage(db, organization_id)
+    # Creates and voids update the counters in the same transaction as the
+    # rows, so once the counter row is locked none are in flight and the
+    # counts below (each a new snapshot) match the counters exactly.
+    usage = (
+        await db.execute(
+            select(OrganizationUsage)
+            .where(OrganizationUsage.organization_id == organization_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    ).scalar_one()
+
+    drift = {}
+    for resource, query in _count_queries(organization_id).items():
+        key = RESOURCES[resource].key
+        count = (await db.execute(query)).scalar_one()
+        drift[resource] = count - getattr(usage, key)
+        setattr(usage, key, count)
+    usage.reconciled_at = datetime.utcnow()
+    return drift
+
+
+@job_handler("quotas.reconcile", max_attempts=1)
+async def run_reconcile(ctx: JobContext) -> Dict[str, int]:
+    """Reconcile the counters of every organization, one short transaction each."""
+    organizations = corrected = 0
+    last_id = None
+    while True:
+        async with sessionmanager.session() as db:
+            query = select(Organization.id).order_by(Organization.id).limit(RECONCILE_PAGE_SIZE)
+            if last_id is not None:
+                query = query.where(Organization.id > last_id)
+            organization_ids = list((await db.execute(query)).scalars())
+        if not organization_ids:
+            break
+
+        for organization_id in organization_ids:
+            async with sessionmanager.session() as db:
+                drift = await reconcile_usage(db, organization_id)
+            for resource, amount in drift.items():
+                if amount:
+                    quota_drift_total.inc(abs(amount), resource)
+                    corrected += 1
+                    logger.warning(
+                        "Corrected %s counter of organization %s by %+d",
+                        resource, organization_id, amount,
+                    )
+        organizations += len(organization_ids)
+        last_id = organization_ids[-1]
+        await ctx.progress(organizations=organizations)
+
+    return {"organizations": organizations, "corrected": corrected}
+
+
+quota_reconciler = PeriodicJob("quotas.reconcile", settings.QUOTA_RECONCILE_INTERVAL_SECONDS)
@@ -0,0 +1,226 @@
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database.models.organisation import Organization
+from app.services.metrics import registry
+from app.utils import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Base limits per class of endpoint for the free tier, scaled by
+# RATE_LIMIT_TIER_MULTIPLIERS: sustained requests per second, burst size
+# and requests in flight at once.
+LIMIT_CLASSES: Dict[str, Dict[str, float]] = {
+    "write": {"rate": 5.0, "burst": 20.0, "concurrency": 4},
+    "bulk": {"rate": 0.2, "burst": 2.0, "concurrency": 1},
+}
+# How long a concurrency slot survives a crashed request before it expires
+CONCURRENCY_LEASE_SECONDS = 120
+# How long to serve limits from memory after Redis fails
+REDIS_RETRY_SECONDS = 30.0
+TIER_CACHE_SECONDS = 60.0
+
+rate_limit_rejections_total = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by per-organization limits, by limit class and reason.",
+    ["limit_class", "reason"],
+)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an organization is over one of its limits."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason} limit exceeded")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# Refill the bucket for the time elapsed and take `cost` tokens if available.
+# Returns {allowed, milliseconds until enough tokens are available}.
+_TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens, ts = tonumber(state[1]) or burst, tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed, wait = 0, 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = math.ceil((cost - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait}
+"""
+
+# Drop expired leases and add a new one if fewer than `limit` are held.
+_ACQUIRE_SLOT_SCRIPT = """
+local now, limit, lease_ms = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now + lease_ms, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], lease_ms)
+return 1
+"""
+
+
+class MemoryRateLimiter:
+    """Per-process token buckets and concurrency counters."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._slots: Dict[str, Dict[str, float]] = {}
+
+    async def take_token(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+    async def acquire_slot(self, key: str, limit: int, lease: str) -> bool:
+        now = time.monotonic()
+        slots = self._slots.setdefault(key, {})
+        for expired in [held for held, expires in slots.items() if expires <= now]:
+            del slots[expired]
+        if len(slots) >= limit:
+            return False
+        slots[lease] = now + CONCURRENCY_LEASE_SECONDS
+        return True
+
+    async def release_slot(self, key: str, lease: str) -> None:
+        self._slots.get(key, {}).pop(lease, None)
+
+
+class RedisRateLimiter:
+    """Token buckets and concurrency leases shared by every API process."""
+
+    def __init__(self, redis, prefix: str = "ratelimit"):
+        self._redis = redis
+        self._prefix = prefix
+        self._token_bucket = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._acquire = redis.register_script(_ACQUIRE_SLOT_SCRIPT)
+
+    async def take_token(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        allowed, wait_ms = await self._token_bucket(
+            keys=[f"{self._prefix}:bucket:{key}"],
+            args=[rate, burst, int(time.time() * 1000), cost],
+        )
+        return 0.0 if allowed else wait_ms / 1000.0
+
+    async def acquire_slot(self, key: str, limit: int, lease: str) -> bool:
+        acquired = await self._acquire(
+            keys=[f"{self._prefix}:slots:{key}"],
+            args=[int(time.time() * 1000), limit, CONCURRENCY_LEASE_SECONDS * 1000, lease],
+        )
+        return bool(acquired)
+
+    async def release_slot(self, key: str, lease: str) -> None:
+        await self._redis.zrem(f"{self._prefix}:slots:{key}", lease)
+
+
+class TenantRateLimiter:
+    """
+    Per-organization token-bucket rate limits and concurrency caps.
+
+    Limits are shared through Redis when it is configured. If Redis fails the
+    limiter falls back to per-process limits for REDIS_RETRY_SECONDS instead
+    of failing requests or waiting on connection timeouts.
+    """
+
+    def __init__(self):
+        self._memory = MemoryRateLimiter()
+        self._redis: Optional[RedisRateLimiter] = None
+        self._redis_down_until = 0.0
+        self._tiers: Dict[str, Tuple[str, float]] = {}
+
+    def _backend(self):
+        if settings.RATE_LIMIT_BACKEND != "redis" or time.monotonic() < self._redis_down_until:
+            return self._memory
+        if self._redis is None:
+            from app.services.redis import get_redis
+
+            self._redis = RedisRateLimiter(get_redis())
+        return self._redis
+
+    async def _call(self, method: str, *args):
+        backend = self._backend()
+        try:
+            return await getattr(backend, method)(*args)
+        except Exception:
+            if backend is self._memory:
+                raise
+            logger.warning("Redis rate limiter unavailable; using per-process limits", exc_info=True)
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return await getattr(self._memory, method)(*args)
+
+    async def get_tier(self, db: AsyncSession, organization_id: str) -> str:
+        """Look up an organization's subscription tier, cached for TIER_CACHE_SECONDS."""
+        cached = self._tiers.get(organization_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        tier = (
+            await db.execute(
+                select(Organization.subscription_tier).where(Organization.id == organization_id)
+            )
+        ).scalar() or "free"
+        self._tiers[organization_id] = (tier, time.monotonic() + TIER_CACHE_SECONDS)
+        return tier
+
+    def limits(self, limit_class: str, tier: str) -> Dict[str, float]:
+        base = LIMIT_CLASSES[limit_class]
+        multiplier = settings.RATE_LIMIT_TIER_MULTIPLIERS.get(tier, 1.0)
+        return {
+            "rate": base["rate"] * multiplier,
+            "burst": base["burst"] * multiplier,
+            "concurrency": max(1, math.floor(base["concurrency"] * multiplier)),
+        }
+
+    async def acquire(self, organization_id: str, tier: str, limit_class: str) -> str:
+        """
+        Take a token and a concurrency slot for a request.
+
+        Returns:
+            str: The lease to pass to `release` when the request finishes.
+
+        Raises:
+            RateLimitExceeded: If the organization is over its rate or concurrency limit.
+        """
+        limits = self.limits(limit_class, tier)
+        key = f"{limit_class}:{organization_id}"
+
+        wait = await self._call("take_token", key, limits["rate"], limits["burst"])
+        if wait > 0:
+            rate_limit_rejections_total.inc(1, limit_class, "rate")
+            raise RateLimitExceeded("rate", wait)
+
+        lease = generate_uuid()
+        if not await self._call("acquire_slot", key, int(limits["concurrency"]), lease):
+            rate_limit_rejections_total.inc(1, limit_class, "concurrency")
+            # Slots free up as soon as a running request finishes
+            raise RateLimitExceeded("concurrency", 1.0)
+        return lease
+
+    async def release(self, organization_id: str, limit_class: str, lease: str) -> None:
+        try:
+            await self._call("release_slot", f"{limit_class}:{organization_id}", lease)
+        except Exception:
+            # The lease expires on its own
+            logger.exception("Failed to release concurrency slot")
+
+
+tenant_rate_limiter = TenantRateLimiter()
@@ -0,0 +1,211 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, String, column, or_, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models.wallet_pass import WalletPass
+from app.services.analytics import event_row, insert_events
+from app.services.metrics import registry
+from app.utils import generate_update_tag, is_uuid
+
+
+# Outcomes of a redemption attempt
+REDEEMED = "redeemed"
+ALREADY_REDEEMED = "already_redeemed"
+VOIDED = "voided"
+EXPIRED = "expired"
+NOT_FOUND = "not_found"
+
+pass_redemptions_total = registry.counter(
+    "pass_redemptions_total",
+    "Pass redemption attempts, by outcome.",
+    ["result"],
+)
+
+
+def redeemable(now: datetime) -> List[Any]:
+    """Conditions matching passes that can still be redeemed at `now`."""
+    return [
+        WalletPass.is_redeemed.is_not(True),
+        WalletPass.is_voided.is_not(True),
+        or_(WalletPass.expiration_date.is_(None), WalletPass.expiration_date > now),
+    ]
+
+
+def _failure_reason(wallet_pass: Any) -> str:
+    if wallet_pass.is_redeemed:
+        return ALREADY_REDEEMED
+    if wallet_pass.is_voided:
+        return VOIDED
+    return EXPIRED
+
+
+async def redeem_pass(
+    db: AsyncSession,
+    organization_id: Optional[str],
+    pass_id: Optional[str] = None,
+    serial_number: Optional[str] = None,
+    template_id: Optional[str] = None,
+) -> Tuple[str, Optional[WalletPass]]:
+    """
+    Redeem a pass by id or serial number with one conditional UPDATE.
+
+    The redeemable check is part of the UPDATE's WHERE clause, so two
+    scanners redeeming the same pass at once cannot both succeed. Only a
+    failed attempt reads the pass again to report why.
+
+    Args:
+        db: Database session; the caller commits.
+        organization_id: Restrict to passes of this organization (None for superusers).
+        pass_id: Id of the pass.
+        serial_number: Serial number of the pass, as encoded in its barcode.
+        template_id: Restrict to passes of this template, e.g. the event being scanned.
+
+    Returns:
+        tuple: The outcome and the pass (None when not found).
+    """
+    if pass_id is not None:
+        # Ids come from URLs; the database rejects anything that isn't a UUID
+        if not is_uuid(pass_id):
+            pass_redemptions_total.inc(1, NOT_FOUND)
+            return NOT_FOUND, None
+        scope = [WalletPass.id == pass_id]
+    else:
+        scope = [WalletPass.serial_number == serial_number]
+    if organization_id is not None:
+        scope.append(WalletPass.organization_id == organization_id)
+    if template_id is not None:
+        scope.append(WalletPass.template_id == template_id)
+
+    now = datetime.utcnow()
+    redeemed = (
+        await db.execute(
+            update(WalletPass)
+            .where(*scope, *redeemable(now))
+            .values(is_redeemed=True, redeemed_at=now, last_updated_tag=generate_update_tag())
+            .returning(WalletPass)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+    ).scalar()
+    if redeemed is not None:
+        pass_redemptions_total.inc(1, REDEEMED)
+        return REDEEMED, redeemed
+
+    wallet_pass = (await db.execute(select(WalletPass).where(*scope))).scalar()
+    result = NOT_FOUND if wallet_pass is None else _failure_reason(wallet_pass)
+    pass_redemptions_total.inc(1, result)
+    return result, wallet_pass
+
+
+async def redeem_scans(
+    db: AsyncSession,
+    organization_id: Optional[str],
+    scans: List[Tuple[str, Optional[datetime]]],
+    template_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Redeem a batch of scanned serial numbers, e.g. synced by an offline scanner.
+
+    All scans are applied with one UPDATE joined to a VALUES list; each pass
+    is redeemed at its earliest scan time. Passes that were not redeemed are
+    then read with one SELECT to report why. Redeem events are written in
+    the same transaction.
+
+    Args:
+        db: Database session; the caller commits.
+        organization_id: Restrict to passes of this organization (None for superusers).
+        scans: (serial number, scan time) pairs; a missing time means now.
+        template_id: Restrict to passes of this template, e.g. the event being scanned.
+
+    Returns:
+        list: One result per distinct serial number, in scan order, with the
+            pass' id and template when it was found.
+    """
+    now = datetime.utcnow()
+    scanned_at: Dict[str, datetime] = {}
+    for serial_number, scanned in scans:
+        if scanned is not None and scanned.tzinfo is not None:
+            scanned = scanned.astimezone(timezone.utc).replace(tzinfo=None)
+        # Scanner clocks can run ahead; never record a redemption in the future
+        if scanned is None or scanned > now:
+            scanned = now
+        if serial_number not in scanned_at or scanned < scanned_at[serial_number]:
+            scanned_at[serial_number] = scanned
+    if not scanned_at:
+        return []
+
+    batch = values(
+        column("serial_number", String), column("scanned_at", DateTime), name="scans"
+    ).data(list(scanned_at.items()))
+    conditions = [WalletPass.serial_number == batch.c.serial_number, *redeemable(now)]
+    if organization_id is not None:
+        conditions.append(WalletPass.organization_id == organization_id)
+    if template_id is not None:
+        conditions.append(WalletPass.template_id == template_id)
+    redeemed = (
+        await db.execute(
+            update(WalletPass.__table__)
+            .where(*conditions)
+            .values(
+                is_redeemed=True,
+                redeemed_at=batch.c.scanned_at,
+                last_updated_tag=generate_update_tag(),
+            )
+            .returning(
+                WalletPass.id,
+                WalletPass.serial_number,
+                WalletPass.template_id,
+                WalletPass.organization_id,
+                WalletPass.campaign_id,
+                WalletPass.customer_id,
+                WalletPass.redeemed_at,
+            )
+        )
+    ).all()
+
+    results = {
+        row.serial_number: {
+            "serial_number": row.serial_number,
+            "status": REDEEMED,
+            "wallet_pass_id": row.id,
+            "template_id": row.template_id,
+            "redeemed_at": row.redeemed_at,
+        }
+        for row in redeemed
+    }
+    if redeemed:
+        await insert_events(db, [
+            event_row(
+                "redeem",
+                row.organization_id,
+                campaign_id=row.campaign_id,
+                wallet_pass_id=row.id,
+                customer_id=row.customer_id,
+                occurred_at=row.redeemed_at,
+            )
+            for row in redeemed
+        ])
+
+    missed = [serial_number for serial_number in scanned_at if serial_number not in results]
+    if missed:
+        query = select(WalletPass).where(WalletPass.serial_number.in_(missed))
+        if organization_id is not None:
+            query = query.where(WalletPass.organization_id == organization_id)
+        if template_id is not None:
+            query = query.where(WalletPass.template_id == template_id)
+        for wallet_pass in (await db.execute(query)).scalars():
+            results[wallet_pass.serial_number] = {
+                "serial_number": wallet_pass.serial_number,
+                "status": _failure_reason(wallet_pass),
+                "wallet_pass_id": wallet_pass.id,
+                "template_id": wallet_pass.template_id,
+                "redeemed_at": wallet_pass.redeemed_at,
+            }
+
+    ordered = []
+    for serial_number in scanned_at:
+        result = results.get(serial_number) or {"serial_number": serial_number, "status": NOT_FOUND}
+        pass_redemptions_total.inc(1, result["status"])
+        ordered.append(result)
+    return ordered
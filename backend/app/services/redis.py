@@ -0,0 +1,36 @@
+from app.settings import settings
+
+
+_client = None
+
+
+def get_redis():
+    """
+    Get the shared asyncio Redis client, creating it on first use.
+
+    The client holds a connection pool and connects lazily, so calling this
+    does not touch the network.
+
+    Returns:
+        redis.asyncio.Redis: The shared client.
+    """
+    global _client
+    if _client is None:
+        import redis.asyncio as aioredis
+
+        _client = aioredis.Redis(
+            host=settings.REDIS_SERVER,
+            port=settings.REDIS_PORT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+            health_check_interval=30,
+        )
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client and its connection pool."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
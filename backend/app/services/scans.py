@@ -0,0 +1,445 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.wallet_pass import WalletPass
+from app.services import redemption
+from app.services.analytics import analytics_buffer
+from app.services.metrics import registry
+from app.utils import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+# Results of a hot-set lookup
+MISS = 0
+ACCEPTED = 1
+SEEN = 2
+
+PRELOAD_PAGE_SIZE = 5000
+FLUSH_BATCH_SIZE = 1000
+# How long one process may hold the write-behind lock
+FLUSH_LOCK_SECONDS = 30
+# How long to validate against the database after Redis fails
+REDIS_RETRY_SECONDS = 30.0
+
+scan_validations_total = registry.counter(
+    "scan_validations_total",
+    "Door scans validated, by outcome and by where the answer came from.",
+    ["result", "source"],
+)
+scan_write_behind_total = registry.counter(
+    "scan_write_behind_total",
+    "Cached scan acceptances written to the database, by database outcome.",
+    ["result"],
+)
+
+
+# Take a serial out of the hot set and queue its redemption, or report that
+# it was already taken. Returns {ACCEPTED|SEEN, pass id} or {MISS}.
+_TAKE_SCRIPT = """
+local pass_id = redis.call('HGET', KEYS[1], ARGV[1])
+if pass_id then
+  redis.call('HDEL', KEYS[1], ARGV[1])
+  redis.call('HSET', KEYS[2], ARGV[1], pass_id)
+  redis.call('PEXPIRE', KEYS[2], ARGV[3])
+  redis.call('RPUSH', KEYS[3], ARGV[2])
+  return {1, pass_id}
+end
+pass_id = redis.call('HGET', KEYS[2], ARGV[1])
+if pass_id then
+  return {2, pass_id}
+end
+return {0}
+"""
+
+# Replace the hot set with the freshly loaded one, minus serials taken while
+# it was loading. Returns the number of serials in the new hot set.
+_SWAP_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  redis.call('RENAME', KEYS[1], KEYS[2])
+  local taken = redis.call('HKEYS', KEYS[3])
+  for i = 1, #taken, 1000 do
+    redis.call('HDEL', KEYS[2], unpack(taken, i, math.min(i + 999, #taken)))
+  end
+  redis.call('PEXPIRE', KEYS[2], ARGV[1])
+else
+  redis.call('DEL', KEYS[2])
+end
+if redis.call('EXISTS', KEYS[3]) == 1 then
+  redis.call('PEXPIRE', KEYS[3], ARGV[1])
+end
+return redis.call('HLEN', KEYS[2])
+"""
+
+
+class MemoryScanCache:
+    """
+    Per-process hot sets. Only correct when a single API process serves
+    the scanners; otherwise each process would accept the same pass once.
+    """
+
+    def __init__(self):
+        self._hot: Dict[str, Dict[str, str]] = {}
+        self._taken: Dict[str, Dict[str, str]] = {}
+        self._expires: Dict[str, float] = {}
+        self._pending: List[str] = []
+
+    def _expire(self, template_id: str) -> None:
+        if self._expires.get(template_id, float("inf")) <= time.monotonic():
+            self._hot.pop(template_id, None)
+            self._taken.pop(template_id, None)
+            self._expires.pop(template_id, None)
+
+    async def load(self, template_id: str, pages, ttl: int) -> int:
+        loaded: Dict[str, str] = {}
+        async for page in pages:
+            loaded.update(page)
+        self._expire(template_id)
+        taken = self._taken.setdefault(template_id, {})
+        for serial_number in taken:
+            loaded.pop(serial_number, None)
+        self._hot[template_id] = loaded
+        self._expires[template_id] = time.monotonic() + ttl
+        return len(loaded)
+
+    async def close(self, template_id: str) -> None:
+        self._hot.pop(template_id, None)
+        self._taken.pop(template_id, None)
+        self._expires.pop(template_id, None)
+
+    async def take(self, template_id: str, serial_number: str, payload: str, ttl: int) -> Tuple[int, Optional[str]]:
+        self._expire(template_id)
+        pass_id = self._hot.get(template_id, {}).pop(serial_number, None)
+        if pass_id is not None:
+            self._taken.setdefault(template_id, {})[serial_number] = pass_id
+            self._pending.append(payload)
+            return ACCEPTED, pass_id
+        pass_id = self._taken.get(template_id, {}).get(serial_number)
+        if pass_id is not None:
+            return SEEN, pass_id
+        return MISS, None
+
+    async def forget(self, template_id: str, serial_number: str, pass_id: Optional[str]) -> None:
+        self._hot.get(template_id, {}).pop(serial_number, None)
+        if pass_id is not None and template_id in self._hot:
+            self._taken.setdefault(template_id, {})[serial_number] = pass_id
+
+    async def pending(self, count: int) -> List[str]:
+        return self._pending[:count]
+
+    async def ack(self, count: int) -> None:
+        del self._pending[:count]
+
+    async def lock(self) -> bool:
+        return True
+
+    async def unlock(self) -> None:
+        pass
+
+
+class RedisScanCache:
+    """Hot sets and the write-behind queue shared by every API process."""
+
+    def __init__(self, redis, prefix: str = "scan"):
+        self._redis = redis
+        self._prefix = prefix
+        self._take = redis.register_script(_TAKE_SCRIPT)
+        self._swap = redis.register_script(_SWAP_SCRIPT)
+
+    def _keys(self, template_id: str) -> Tuple[str, str]:
+        return f"{self._prefix}:hot:{template_id}", f"{self._prefix}:taken:{template_id}"
+
+    async def load(self, template_id: str, pages, ttl: int) -> int:
+        hot, taken = self._keys(template_id)
+        loading = f"{hot}:loading:{generate_uuid()}"
+        try:
+            async for page in pages:
+                if page:
+                    await self._redis.hset(loading, mapping=page)
+                    await self._redis.expire(loading, ttl)
+            return await self._swap(keys=[loading, hot, taken], args=[ttl * 1000])
+        finally:
+            await self._redis.delete(loading)
+
+    async def close(self, template_id: str) -> None:
+        await self._redis.delete(*self._keys(template_id))
+
+    async def take(self, template_id: str, serial_number: str, payload: str, ttl: int) -> Tuple[int, Optional[str]]:
+        hot, taken = self._keys(template_id)
+        result = await self._take(
+            keys=[hot, taken, f"{self._prefix}:pending"],
+            args=[serial_number, payload, ttl * 1000],
+        )
+        pass_id = result[1].decode() if len(result) > 1 else None
+        return int(result[0]), pass_id
+
+    async def forget(self, template_id: str, serial_number: str, pass_id: Optional[str]) -> None:
+        hot, taken = self._keys(template_id)
+        if await self._redis.hdel(hot, serial_number) and pass_id is not None:
+            await self._redis.hset(taken, serial_number, pass_id)
+
+    async def pending(self, count: int) -> List[str]:
+        return [item.decode() for item in await self._redis.lrange(f"{self._prefix}:pending", 0, count - 1)]
+
+    async def ack(self, count: int) -> None:
+        await self._redis.ltrim(f"{self._prefix}:pending", count, -1)
+
+    async def lock(self) -> bool:
+        return bool(
+            await self._redis.set(f"{self._prefix}:flush-lock", "1", nx=True, ex=FLUSH_LOCK_SECONDS)
+        )
+
+    async def unlock(self) -> None:
+        await self._redis.delete(f"{self._prefix}:flush-lock")
+
+
+class ScanValidator:
+    """
+    Validate door scans against a hot set of redeemable serial numbers.
+
+    Opening a template for scanning loads the serial numbers of its
+    redeemable passes into the hot set. A scan then takes its serial out of
+    the set and queues the redemption in one cache operation, and a
+    background task writes queued redemptions to the database in batches
+    (`redemption.redeem_scans`). Serials that are not in the hot set, and
+    every scan while the cache is unavailable, are redeemed directly with
+    the conditional UPDATE of `redemption.redeem_pass`.
+
+    The database stays the source of truth: the write-behind uses the same
+    conditional UPDATE, so a pass accepted from the cache that was redeemed
+    or voided some other way in the meantime is not redeemed twice. Such
+    conflicts are counted in `scan_write_behind_total` and logged.
+    """
+
+    def __init__(self, flush_interval: float = 0.5):
+        self.flush_interval = flush_interval
+        self._memory = MemoryScanCache()
+        self._redis: Optional[RedisScanCache] = None
+        self._redis_down_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _backend(self):
+        if settings.SCAN_CACHE_BACKEND != "redis":
+            return self._memory
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            from app.services.redis import get_redis
+
+            self._redis = RedisScanCache(get_redis())
+        return self._redis
+
+    async def _call(self, method: str, *args):
+        # Returns None when the cache is unavailable
+        backend = self._backend()
+        if backend is None:
+            return None
+        try:
+            return await getattr(backend, method)(*args)
+        except Exception:
+            if backend is self._memory:
+                raise
+            logger.warning("Redis scan cache unavailable; validating against the database", exc_info=True)
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+
+    async def open(self, db: AsyncSession, template_id: str) -> Optional[int]:
+        """
+        Load the redeemable passes of a template into its hot set.
+
+        Passes expiring before the hot set does are left out, so they are
+        always checked against the database. Reopening a template reloads
+        it, e.g. after issuing more passes.
+
+        Returns:
+            Optional[int]: Number of serials loaded, or None if the cache is unavailable.
+        """
+        ttl = settings.SCAN_HOT_SET_TTL_SECONDS
+        conditions = [
+            WalletPass.template_id == template_id,
+            *redemption.redeemable(datetime.utcnow() + timedelta(seconds=ttl)),
+        ]
+
+        async def pages():
+            last_id = None
+            while True:
+                query = (
+                    select(WalletPass.id, WalletPass.serial_number)
+                    .where(*conditions)
+                    .order_by(WalletPass.id)
+                    .limit(PRELOAD_PAGE_SIZE)
+                )
+                if last_id is not None:
+                    query = query.where(WalletPass.id > last_id)
+                rows = (await db.execute(query)).all()
+                if not rows:
+                    return
+                yield {row.serial_number: row.id for row in rows}
+                last_id = rows[-1].id
+
+        return await self._call("load", template_id, pages(), ttl)
+
+    async def close(self, template_id: str) -> None:
+        """Drop a template's hot set; queued redemptions are still written."""
+        await self._call("close", template_id)
+
+    async def validate(
+        self,
+        organization_id: str,
+        template_id: str,
+        serial_number: str,
+        scanned_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Validate and redeem one scan.
+
+        Args:
+            organization_id: Organization the scanner belongs to.
+            template_id: Template (event) being scanned.
+            serial_number: Scanned serial number.
+            scanned_at: When the pass was scanned; defaults to now.
+
+        Returns:
+            dict: The serial number, its `redemption` outcome, the pass id
+            and whether the answer came from the cache.
+        """
+        if scanned_at is not None and scanned_at.tzinfo is not None:
+            scanned_at = scanned_at.astimezone(timezone.utc).replace(tzinfo=None)
+        payload = json.dumps({
+            "organization_id": organization_id,
+            "serial_number": serial_number,
+            "scanned_at": (scanned_at or datetime.utcnow()).isoformat(),
+        })
+        found = await self._call(
+            "take", template_id, serial_number, payload, settings.SCAN_HOT_SET_TTL_SECONDS
+        )
+        if found is not None and found[0] != MISS:
+            result = redemption.REDEEMED if found[0] == ACCEPTED else redemption.ALREADY_REDEEMED
+            scan_validations_total.inc(1, result, "cache")
+            return {
+                "serial_number": serial_number,
+                "status": result,
+                "wallet_pass_id": found[1],
+                "cached": True,
+            }
+
+        async with sessionmanager.session() as db:
+            result, wallet_pass = await redemption.redeem_pass(
+                db, organization_id, serial_number=serial_number, template_id=template_id
+            )
+            # Read before the session commits and expires the pass
+            redeemed = wallet_pass and {
+                "wallet_pass_id": wallet_pass.id,
+                "campaign_id": wallet_pass.campaign_id,
+                "customer_id": wallet_pass.customer_id,
+            }
+        scan_validations_total.inc(1, result, "database")
+        if result == redemption.REDEEMED:
+            analytics_buffer.record("redeem", organization_id, **redeemed)
+        if redeemed and result in (redemption.REDEEMED, redemption.ALREADY_REDEEMED):
+            await self._call("forget", template_id, serial_number, redeemed["wallet_pass_id"])
+        return {
+            "serial_number": serial_number,
+            "status": result,
+            "wallet_pass_id": redeemed["wallet_pass_id"] if redeemed else None,
+            "cached": False,
+        }
+
+    async def forget(self, template_id: str, serial_number: str, pass_id: Optional[str] = None) -> None:
+        """
+        Take a pass out of its template's hot set after it was redeemed
+        (pass `pass_id`) or voided some other way.
+        """
+        try:
+            await self._call("forget", template_id, serial_number, pass_id)
+        except Exception:
+            # The write-behind still refuses the pass
+            logger.exception("Failed to remove %s from the scan hot set", serial_number)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write the next batch of cached acceptances to the database.
+
+        A batch is only removed from the queue after its transaction
+        commits. Replaying a batch after a crash is harmless because
+        redeeming is idempotent.
+
+        Returns:
+            int: Number of scans written.
+        """
+        backend = self._backend()
+        if backend is None:
+            return 0
+        try:
+            if not await backend.lock():
+                return 0
+        except Exception:
+            logger.warning("Redis scan cache unavailable; write-behind paused", exc_info=True)
+            return 0
+        try:
+            items = await backend.pending(FLUSH_BATCH_SIZE)
+            if not items:
+                return 0
+            scans: Dict[str, List[Tuple[str, datetime]]] = defaultdict(list)
+            for item in items:
+                scan = json.loads(item)
+                scans[scan["organization_id"]].append(
+                    (scan["serial_number"], datetime.fromisoformat(scan["scanned_at"]))
+                )
+            async with sessionmanager.session() as db:
+                results = []
+                for organization_id, organization_scans in scans.items():
+                    results.extend(await redemption.redeem_scans(db, organization_id, organization_scans))
+            await backend.ack(len(items))
+
+            for result in results:
+                scan_write_behind_total.inc(1, result["status"])
+                if result["status"] != redemption.REDEEMED:
+                    logger.warning(
+                        "Scan of %s was accepted from the cache but not redeemed: %s",
+                        result["serial_number"], result["status"],
+                    )
+            return len(items)
+        except Exception:
+            logger.exception("Failed to write cached scans; retrying")
+            return 0
+        finally:
+            try:
+                await backend.unlock()
+            except Exception:
+                # The lock expires on its own
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Drain a backlog without waiting between batches
+            while await self.flush() >= FLUSH_BATCH_SIZE:
+                pass
+
+
+scan_validator = ScanValidator(flush_interval=settings.SCAN_FLUSH_INTERVAL_SECONDS)
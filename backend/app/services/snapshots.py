@@ -0,0 +1,176 @@
+import hashlib
+import hmac
+import struct
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models.wallet_pass import WalletPass
+from app.services import redemption
+from app.services.metrics import record_cache_lookup
+
+
+# Snapshot layout, big-endian: header (magic, entry count), then one entry per
+# valid pass sorted by serial hash, so scanners can binary search it in place:
+# the serial hash and the pass' expiry in Unix seconds (0 = never expires).
+SNAPSHOT_MAGIC = b"PXS1"
+SNAPSHOT_HEADER = struct.Struct(">4sI")
+SNAPSHOT_ENTRY = struct.Struct(">QI")
+
+SNAPSHOT_FETCH_SIZE = 10000
+# Larger deltas tell the scanner to download a new snapshot instead
+MAX_DELTA_ENTRIES = 5000
+# Update tags come from each process' clock and can commit out of order, so
+# deltas repeat the changes of this window before the scanner's tag
+DELTA_OVERLAP_SECONDS = 5
+# Rebuild cached snapshots at least this often, even without a newer tag
+SNAPSHOT_CACHE_SECONDS = 600.0
+
+# Snapshots keyed by template id, campaign id and update tag, with their expiry
+_snapshots: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_SNAPSHOT_CACHE_SIZE = 16
+
+
+def serial_hash(serial_number: str) -> int:
+    """64-bit hash identifying a serial number in snapshots and deltas (BLAKE2b, 8 bytes)."""
+    return int.from_bytes(hashlib.blake2b(serial_number.encode(), digest_size=8).digest(), "big")
+
+
+def _expiry(expiration_date: Optional[datetime]) -> int:
+    if expiration_date is None:
+        return 0
+    return int(expiration_date.replace(tzinfo=timezone.utc).timestamp())
+
+
+def pack_snapshot(rows: List[Tuple[str, Optional[datetime]]]) -> bytes:
+    """Hash, sort and pack (serial number, expiration date) rows into a snapshot."""
+    entries = sorted((serial_hash(serial_number), _expiry(expires)) for serial_number, expires in rows)
+    body = bytearray(SNAPSHOT_HEADER.size + SNAPSHOT_ENTRY.size * len(entries))
+    SNAPSHOT_HEADER.pack_into(body, 0, SNAPSHOT_MAGIC, len(entries))
+    offset = SNAPSHOT_HEADER.size
+    for entry in entries:
+        SNAPSHOT_ENTRY.pack_into(body, offset, *entry)
+        offset += SNAPSHOT_ENTRY.size
+    return bytes(body)
+
+
+def sign_snapshot(body: bytes, key: str) -> str:
+    """HMAC-SHA256 of a snapshot, keyed with the scanner's token."""
+    return hmac.new(key.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _scope(template_id: str, campaign_id: Optional[str]) -> List[Any]:
+    conditions = [WalletPass.template_id == template_id]
+    if campaign_id is not None:
+        conditions.append(WalletPass.campaign_id == campaign_id)
+    return conditions
+
+
+async def get_snapshot(
+    db: AsyncSession, template_id: str, campaign_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Get the snapshot of the passes of a template that scanners may accept.
+
+    Every change to a pass (issue, void, redemption, template edit) bumps
+    its `last_updated_tag`, so the newest tag of the scope identifies the
+    snapshot: it is cached until a newer tag appears and later changes are
+    fetched with `get_delta` from that tag. The passes are read through a
+    server-side cursor and packed in a worker thread.
+
+    Args:
+        db: Database session.
+        template_id: Template (event) being scanned.
+        campaign_id: Only include the passes of this campaign.
+
+    Returns:
+        dict: The packed `body`, its update `tag` and its entry `count`.
+    """
+    scope = _scope(template_id, campaign_id)
+    # Read before the passes, so changes made while streaming are in later deltas
+    tag = (
+        await db.execute(select(func.max(WalletPass.last_updated_tag)).where(*scope))
+    ).scalar() or ""
+
+    key = (template_id, campaign_id or "", tag)
+    cached = _snapshots.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        _snapshots.move_to_end(key)
+        record_cache_lookup("scan_snapshot", True)
+        return cached[1]
+    record_cache_lookup("scan_snapshot", False)
+
+    rows: List[Tuple[str, Optional[datetime]]] = []
+    result = await db.stream(
+        select(WalletPass.serial_number, WalletPass.expiration_date)
+        .where(*scope, *redemption.redeemable(datetime.utcnow()))
+        .execution_options(yield_per=SNAPSHOT_FETCH_SIZE)
+    )
+    async for partition in result.partitions():
+        rows.extend(partition)
+    body = await run_in_threadpool(pack_snapshot, rows)
+
+    snapshot = {"body": body, "tag": tag, "count": len(rows)}
+    _snapshots[key] = (time.monotonic() + SNAPSHOT_CACHE_SECONDS, snapshot)
+    if len(_snapshots) > _SNAPSHOT_CACHE_SIZE:
+        _snapshots.popitem(last=False)
+    return snapshot
+
+
+async def get_delta(
+    db: AsyncSession, template_id: str, since: str, campaign_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Changes to the passes of a snapshot's scope since an update tag.
+
+    Args:
+        db: Database session.
+        template_id: Template (event) being scanned.
+        since: Tag of the scanner's snapshot or last delta.
+        campaign_id: Only include the passes of this campaign.
+
+    Returns:
+        dict: The new `tag`, and `changes` (serial hash in hex, whether the
+        pass is valid, its expiry) or `reset` when the scanner should
+        download a new snapshot instead.
+    """
+    floor = ""
+    if since.isdigit():
+        floor = f"{max(int(since) - DELTA_OVERLAP_SECONDS * 1_000_000, 0):017d}"
+    rows = (
+        await db.execute(
+            select(
+                WalletPass.serial_number,
+                WalletPass.is_redeemed,
+                WalletPass.is_voided,
+                WalletPass.expiration_date,
+                WalletPass.last_updated_tag,
+            )
+            .where(*_scope(template_id, campaign_id), WalletPass.last_updated_tag > floor)
+            .order_by(WalletPass.last_updated_tag)
+            .limit(MAX_DELTA_ENTRIES + 1)
+        )
+    ).all()
+    if len(rows) > MAX_DELTA_ENTRIES:
+        return {"tag": since, "reset": True, "changes": []}
+
+    now = datetime.utcnow()
+    return {
+        "tag": max([since, *(row.last_updated_tag for row in rows)]),
+        "reset": False,
+        "changes": [
+            {
+                "serial_hash": f"{serial_hash(row.serial_number):016x}",
+                "valid": not row.is_redeemed and not row.is_voided and (
+                    row.expiration_date is None or row.expiration_date > now
+                ),
+                "expires": _expiry(row.expiration_date),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,150 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database.models.analytics import OrganizationHourlyStats
+from app.database.models.campaign import Campaign
+from app.database.models.organisation import Organization
+from app.services.analytics import EVENT_COLUMNS
+from app.services.metrics import record_cache_lookup
+from app.services.quotas import get_usage
+
+
+TOP_CAMPAIGNS = 5
+
+# Computed stats keyed by (organization id, hours, days), with their expiry
+_cache: "OrderedDict[Tuple[str, int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_CACHE_SIZE = 1024
+
+
+async def get_organization_stats(
+    db: AsyncSession, organization_id: str, hours: int = 48, days: int = 30
+) -> Dict[str, Any]:
+    """
+    Dashboard statistics of an organization.
+
+    Everything is read from maintained aggregates: totals from the
+    organization's usage counters, series from `organization_hourly_stats`
+    and campaign performance from the campaign counters. The cost depends on
+    the number of buckets, not on how many passes or events the organization
+    has. Results are cached for STATS_CACHE_SECONDS.
+
+    Args:
+        db: Database session.
+        organization_id: The organization to describe.
+        hours: Number of hourly buckets, ending with the current hour.
+        days: Number of daily buckets, ending today (UTC).
+
+    Returns:
+        dict: Stats in the shape of `OrganizationStats`.
+    """
+    key = (organization_id, hours, days)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        _cache.move_to_end(key)
+        record_cache_lookup("organization_stats", True)
+        return cached[1]
+    record_cache_lookup("organization_stats", False)
+
+    now = datetime.utcnow()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    first_hour = current_hour - timedelta(hours=hours - 1)
+    first_day = current_hour.replace(hour=0) - timedelta(days=days - 1)
+
+    usage = await get_usage(db, organization_id)
+    max_passes = (
+        await db.execute(select(Organization.max_passes).where(Organization.id == organization_id))
+    ).scalar()
+
+    counts = [getattr(OrganizationHourlyStats, name) for name in EVENT_COLUMNS.values()]
+    hourly = await db.execute(
+        select(OrganizationHourlyStats.hour, *counts).where(
+            OrganizationHourlyStats.organization_id == organization_id,
+            OrganizationHourlyStats.hour >= first_hour,
+        )
+    )
+    day = cast(OrganizationHourlyStats.hour, Date)
+    daily = await db.execute(
+        select(day, *(func.sum(count) for count in counts))
+        .where(
+            OrganizationHourlyStats.organization_id == organization_id,
+            OrganizationHourlyStats.hour >= first_day,
+        )
+        .group_by(day)
+    )
+
+    campaigns = await db.execute(
+        select(
+            Campaign.id,
+            Campaign.name,
+            Campaign.status,
+            Campaign.send_count,
+            Campaign.open_count,
+            Campaign.conversion_count,
+        )
+        .where(Campaign.organization_id == organization_id)
+        .order_by(Campaign.send_count.desc().nulls_last(), Campaign.id)
+        .limit(TOP_CAMPAIGNS)
+    )
+
+    stats = {
+        "totals": {
+            "active_passes": usage.active_passes,
+            "max_passes": max_passes,
+            "customers": usage.customers,
+            "campaigns": usage.campaigns,
+            "passes_issued": usage.passes_issued,
+            "passes_redeemed": usage.passes_redeemed,
+        },
+        "hourly": _series(
+            {row[0]: row[1:] for row in hourly}, first_hour, timedelta(hours=1), hours
+        ),
+        "daily": _series(
+            {datetime.combine(row[0], datetime.min.time()): row[1:] for row in daily},
+            first_day,
+            timedelta(days=1),
+            days,
+        ),
+        "top_campaigns": [
+            {
+                "id": campaign.id,
+                "name": campaign.name,
+                "status": campaign.status,
+                "send_count": campaign.send_count or 0,
+                "open_count": campaign.open_count or 0,
+                "conversion_count": campaign.conversion_count or 0,
+                "conversion_rate": (
+                    round(campaign.conversion_count / campaign.send_count, 4)
+                    if campaign.send_count and campaign.conversion_count is not None
+                    else None
+                ),
+            }
+            for campaign in campaigns
+        ],
+        "generated_at": now,
+    }
+
+    _cache[key] = (time.monotonic() + settings.STATS_CACHE_SECONDS, stats)
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return stats
+
+
+def _series(
+    buckets: Dict[datetime, Tuple], first: datetime, step: timedelta, count: int
+) -> List[Dict[str, Any]]:
+    # One entry per bucket, including the ones without events
+    series = []
+    for index in range(count):
+        start = first + step * index
+        values = buckets.get(start) or (0,) * len(EVENT_COLUMNS)
+        series.append({
+            "start": start,
+            **{name: int(value or 0) for name, value in zip(EVENT_COLUMNS.values(), values)},
+        })
+    return series
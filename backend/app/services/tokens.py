@@ -0,0 +1,170 @@
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.settings import settings
+from app.services.metrics import record_cache_lookup
+
+
+ALGORITHM = "HS256"
+
+# Verified tokens keyed by the token itself, with their expiry (Unix seconds).
+# Identical token strings carry identical signatures, so a hit skips the
+# signature check and the JSON parsing; the key only changes on restart.
+_verified: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_TOKEN_CACHE_SIZE = 4096
+
+
+class TokenError(Exception):
+    """Raised when a token is malformed, badly signed or expired."""
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def _json(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+
+
+class HmacTokenBackend:
+    """
+    HS256 tokens with the standard library.
+
+    The key is absorbed into an HMAC object once and copied per token, which
+    skips re-keying, and the header every token we issue carries is compared
+    as bytes instead of being decoded. Tokens are interchangeable with
+    python-jose's.
+    """
+
+    def __init__(self, key: str):
+        self._mac = hmac.new(key.encode(), digestmod=hashlib.sha256)
+        self._header = _b64encode(_json({"alg": ALGORITHM, "typ": "JWT"}))
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return _b64encode(mac.digest())
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        signing_input = self._header + b"." + _b64encode(_json(claims))
+        return (signing_input + b"." + self._signature(signing_input)).decode()
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            if header != self._header and json.loads(_b64decode(header)).get("alg") != ALGORITHM:
+                raise TokenError("Unsupported token algorithm")
+            if not hmac.compare_digest(self._signature(signing_input), signature):
+                raise TokenError("Invalid token signature")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, AttributeError) as e:
+            raise TokenError("Malformed token") from e
+        if not isinstance(claims, dict):
+            raise TokenError("Malformed token")
+
+        exp = claims.get("exp")
+        if exp is not None and (not isinstance(exp, (int, float)) or exp < time.time()):
+            raise TokenError("Token has expired")
+        return claims
+
+
+class JoseTokenBackend:
+    """HS256 tokens with python-jose (the previous implementation)."""
+
+    def __init__(self, key: str):
+        from jose import jwt
+
+        self._jwt = jwt
+        self._key = key
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return self._jwt.encode(claims, self._key, algorithm=ALGORITHM)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        from jose import JWTError
+
+        try:
+            return self._jwt.decode(token, self._key, algorithms=[ALGORITHM])
+        except JWTError as e:
+            raise TokenError(str(e)) from e
+
+
+_backend: Optional[Any] = None
+
+
+def get_token_backend() -> Any:
+    """Get the configured token backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.JWT_BACKEND == "jose":
+            _backend = JoseTokenBackend(settings.SECRET_KEY)
+        else:
+            _backend = HmacTokenBackend(settings.SECRET_KEY)
+    return _backend
+
+
+def encode_token(claims: Dict[str, Any]) -> str:
+    """
+    Sign claims into a token.
+
+    Args:
+        claims: Token claims; datetimes (e.g. `exp`) are converted to Unix seconds.
+
+    Returns:
+        str: The signed token.
+    """
+    claims = {
+        name: calendar.timegm(value.utctimetuple()) if isinstance(value, datetime) else value
+        for name, value in claims.items()
+    }
+    return get_token_backend().encode(claims)
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a token and return its claims.
+
+    Recently verified tokens are answered from an LRU cache until they
+    expire, so a client sending the same token on every request pays for
+    the signature check once.
+
+    Args:
+        token: The token to verify.
+
+    Returns:
+        dict: The token's claims; shared with the cache, do not modify.
+
+    Raises:
+        TokenError: If the token is malformed, badly signed or expired.
+    """
+    entry = _verified.get(token)
+    if entry is not None:
+        expires_at, claims = entry
+        if expires_at >= time.time():
+            _verified.move_to_end(token)
+            record_cache_lookup("token", True)
+            return claims
+        del _verified[token]
+
+    record_cache_lookup("token", False)
+    claims = get_token_backend().decode(token)
+    # Tokens without an expiry are verified every time
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        _verified[token] = (exp, claims)
+        if len(_verified) > _TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return claims
@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.database.models.campaign import Campaign
+from app.database.models.customer import Customer, customer_campaign
+from app.database.models.location import Location
+from app.database.models.tombstone import archived_row
+from app.database.models.wallet_pass import WalletPass
+from app.services.jobs import JobContext, PeriodicJob, job_handler
+from app.services.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+# Soft-deleting models whose tombstones are purged, with the conditions a
+# tombstone must meet: rows still referenced by other rows are kept.
+PURGEABLE = {
+    "customer": (Customer, [~exists().where(WalletPass.customer_id == Customer.id)]),
+    "location": (Location, [~exists().where(Campaign.location_id == Location.id)]),
+}
+# Association rows removed together with a purged row
+LINKS = {
+    "customer": [customer_campaign.c.customer_id],
+}
+PURGE_BATCH_SIZE = 500
+
+tombstones_purged_total = registry.counter(
+    "tombstones_purged_total",
+    "Soft-deleted rows archived and removed by the purger, by table.",
+    ["table"],
+)
+
+
+async def purge_tombstones(
+    db: AsyncSession, table_name: str, cutoff: datetime, batch_size: int = PURGE_BATCH_SIZE
+) -> int:
+    """
+    Archive and delete one batch of a table's tombstones.
+
+    Rows deleted before `cutoff` are locked with SKIP LOCKED, so concurrent
+    purgers take different batches, then deleted with RETURNING and copied
+    into `archived_row` in the same transaction.
+
+    Args:
+        db: Database session; the caller commits.
+        table_name: One of PURGEABLE.
+        cutoff: Purge rows soft-deleted before this time.
+        batch_size: Maximum number of rows to purge.
+
+    Returns:
+        int: Number of rows purged.
+    """
+    model, conditions = PURGEABLE[table_name]
+    ids = list(
+        (
+            await db.execute(
+                select(model.id)
+                .where(model.deleted_at < cutoff, *conditions)
+                .order_by(model.deleted_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).scalars()
+    )
+    if not ids:
+        return 0
+    # Loads fastapi, which job workers otherwise never import
+    from fastapi.encoders import jsonable_encoder
+
+    for link in LINKS.get(table_name, []):
+        await db.execute(delete(link.table).where(link.in_(ids)))
+    table = model.__table__
+    rows = (
+        await db.execute(delete(table).where(table.c.id.in_(ids)).returning(*table.columns))
+    ).mappings().all()
+    await db.execute(
+        insert(archived_row),
+        [
+            {
+                "table_name": table_name,
+                "row_id": row["id"],
+                "organization_id": row.get("organization_id"),
+                "data": jsonable_encoder(dict(row)),
+                "deleted_at": row["deleted_at"],
+            }
+            for row in rows
+        ],
+    )
+    return len(rows)
+
+
+@job_handler("tombstones.purge", max_attempts=1)
+async def run_purge(ctx: JobContext) -> Dict[str, Any]:
+    """Purge tombstones older than TOMBSTONE_RETENTION_DAYS, one short transaction per batch."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+    purged = {}
+    for table_name in PURGEABLE:
+        purged[table_name] = 0
+        while True:
+            async with sessionmanager.session() as db:
+                count = await purge_tombstones(db, table_name, cutoff)
+            purged[table_name] += count
+            tombstones_purged_total.inc(count, table_name)
+            await ctx.progress(**purged)
+            if count < PURGE_BATCH_SIZE:
+                break
+        if purged[table_name]:
+            logger.info("Purged %d %s tombstones", purged[table_name], table_name)
+    return purged
+
+
+tombstone_purger = PeriodicJob("tombstones.purge", settings.TOMBSTONE_PURGE_INTERVAL_SECONDS)
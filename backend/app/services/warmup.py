@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.services.images import start_process_pool
+from app.services.pass_bundles import load_signing_credentials
+from app.services.previews import preload_rendered_previews
+from app.services.redis import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _warm_database() -> None:
+    async def ping() -> None:
+        async with sessionmanager.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    # Held concurrently, so each ping opens its own pooled connection
+    await asyncio.gather(*(ping() for _ in range(max(settings.WARMUP_DB_CONNECTIONS, 1))))
+
+
+async def _warm_redis() -> None:
+    await get_redis().ping()
+
+
+async def _warm_signing_credentials() -> None:
+    if await run_in_threadpool(load_signing_credentials) is None:
+        logger.warning("Pass signing certificates are missing; passes will be unsigned")
+
+
+async def _warm_template_previews() -> None:
+    await run_in_threadpool(preload_rendered_previews)
+
+
+def _uses_redis() -> bool:
+    return "redis" in (settings.JOB_BACKEND, settings.RATE_LIMIT_BACKEND, settings.SCAN_CACHE_BACKEND)
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[None]]) -> str:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(step(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up of %s timed out", name)
+        return "timeout"
+    except Exception as e:
+        logger.warning("Warm-up of %s failed: %r", name, e)
+        return f"error: {e.__class__.__name__}"
+    logger.info("Warmed up %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+    return "ok"
+
+
+async def warm_up() -> Dict[str, str]:
+    """
+    Open connections and fill caches before the process serves requests.
+
+    Runs from the lifespan startup, so uvicorn only accepts connections once
+    the database pool, Redis, the pass signing certificates, the rendered
+    preview cache and the image process pool are ready. Every step is best
+    effort: a failure is logged and the dependency is set up lazily on first
+    use, as it would be without warm-up (the readiness probe reports it).
+
+    Returns:
+        dict: Outcome of each step ("ok", "timeout" or "error: ...").
+    """
+    steps: Dict[str, Callable[[], Awaitable[None]]] = {
+        "database": _warm_database,
+        "signing_credentials": _warm_signing_credentials,
+        "template_previews": _warm_template_previews,
+        "process_pool": start_process_pool,
+    }
+    if _uses_redis():
+        steps["redis"] = _warm_redis
+    results = await asyncio.gather(*(_run_step(name, step) for name, step in steps.items()))
+    return dict(zip(steps, results))
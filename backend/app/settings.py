@@ -9,18 +9,30 @@ class Settings(BaseSettings):
     ENV: str = "development"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    JWT_BACKEND: str = "hmac"  # hmac (stdlib, precomputed key) or jose (python-jose)
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     
+    # Server (`python -m app.server`)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    WEB_CONCURRENCY: int = 0  # API worker processes; 0 = one per CPU. Each has its own DB pool
+    SERVER_KEEPALIVE_SECONDS: int = 5  # Keep shorter than the proxy's upstream keep-alive
+    GRACEFUL_SHUTDOWN_SECONDS: float = 30.0  # Time to finish in-flight requests and jobs on shutdown
+    WARMUP_DB_CONNECTIONS: int = 5  # Connections opened at startup; at most the pool size
+    WARMUP_TIMEOUT_SECONDS: float = 10.0  # Per warm-up step; startup continues after it
+    
     # Database
     POSTGRES_SERVER: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     POSTGRES_DSN: Optional[PostgresDsn] = None
+    DB_QUERY_CACHE_SIZE: int = 1200  # Compiled statements kept per engine (SQLAlchemy's default is 500)
     
     # Redis
     REDIS_SERVER: str
     REDIS_PORT: int = 6379
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 2.0
     
     # Apple Pass
     APPLE_PASS_TYPE_IDENTIFIER: str
@@ -29,6 +41,73 @@ class Settings(BaseSettings):
     APPLE_PRIVATE_KEY_PATH: str
     APPLE_WWDR_CERTIFICATE_PATH: str
     
+    # Passes
+    MAX_BATCH_PASSES: int = 10000
+    MAX_BATCH_REDEMPTIONS: int = 1000
+    PASS_WEB_SERVICE_URL: Optional[str] = None  # e.g. https://example.com/api; enables device updates
+    
+    # Background jobs
+    JOB_BACKEND: str = "memory"  # memory (in-process, dev/tests) or redis
+    JOB_WORKERS_IN_PROCESS: bool = True  # Disable when `python -m app.worker` runs separately
+    JOB_QUEUE_CONCURRENCY: Dict[str, int] = {"default": 4, "bulk": 2, "push": 1}
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 2.0
+    JOB_VISIBILITY_TIMEOUT_SECONDS: float = 300.0
+    JOB_RESULT_TTL_SECONDS: int = 86400
+    
+    # Per-organization rate limits
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "redis"  # redis (shared, falls back to memory) or memory
+    RATE_LIMIT_TIER_MULTIPLIERS: Dict[str, float] = {"free": 1.0, "basic": 4.0, "premium": 16.0}
+    
+    # Quotas
+    QUOTA_RECONCILE_INTERVAL_SECONDS: float = 3600.0  # 0 disables periodic recounts
+    
+    # Soft deletes
+    TOMBSTONE_RETENTION_DAYS: int = 30  # Soft-deleted rows are archived after this long
+    TOMBSTONE_PURGE_INTERVAL_SECONDS: float = 3600.0  # 0 disables the purger
+    
+    # Analytics
+    ANALYTICS_FLUSH_INTERVAL_SECONDS: float = 2.0  # How often buffered events are written
+    ANALYTICS_MAX_BUFFERED_EVENTS: int = 100000  # Events beyond this are dropped (and counted)
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: float = 60.0  # 0 disables rollups
+    MAX_ANALYTICS_INGEST_EVENTS: int = 5000  # Per POST /analytics/events request
+    STATS_CACHE_SECONDS: float = 30.0  # How long dashboard stats are cached per process
+    
+    # Door scanning
+    SCAN_CACHE_BACKEND: str = "redis"  # redis (shared) or memory (single API process only)
+    SCAN_HOT_SET_TTL_SECONDS: int = 12 * 3600  # How long an opened template stays cached
+    SCAN_FLUSH_INTERVAL_SECONDS: float = 0.5  # How often cached redemptions are written
+    SCAN_TOKEN_EXPIRE_MINUTES: int = 12 * 60  # Lifetime of scanner tokens
+    
+    # Push updates
+    PUSH_ENABLED: bool = False
+    PUSH_APNS_URL: str = "https://api.push.apple.com"  # e.g. http://localhost:8090 for the mock server
+    PUSH_COALESCE_WINDOW_SECONDS: float = 2.0
+    PUSH_MAX_CONCURRENCY: int = 100
+    PUSH_MAX_PER_SECOND: float = 1000.0
+    PUSH_MAX_RETRIES: int = 3
+    PUSH_MAX_CONNECTIONS: int = 4
+    
+    # Static files and uploads
+    STATIC_ROOT: str = "app/static"
+    STATIC_URL: str = "/static"
+    SERVE_STATIC_FILES: bool = True  # Disable when nginx serves STATIC_ROOT directly
+    UPLOAD_TMP_DIR: Optional[str] = None  # Defaults to the system temp directory
+    MAX_IMAGE_UPLOAD_BYTES: int = 5 * 1024 * 1024
+    IMAGE_PROCESS_POOL_SIZE: int = 2
+    
+    # Instrumentation
+    DB_INSTRUMENTATION_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: Optional[bool] = None  # Defaults to on in development
+    SLOW_QUERY_THRESHOLD_MS: Optional[float] = 200.0
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    METRICS_ENABLED: bool = True
+    LOOP_LAG_SAMPLE_INTERVAL_SECONDS: float = 0.5
+    LOOP_WATCHDOG_ENABLED: bool = False
+    LOOP_WATCHDOG_THRESHOLD_MS: float = 100.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    
     @field_validator("POSTGRES_DSN", mode="after")
     def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
         if isinstance(v, str):
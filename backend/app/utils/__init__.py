@@ -1,11 +1,86 @@
+import os
 import uuid
 import re
-from typing import Any, Dict, List, Union
+import time
+from email.utils import formatdate
+from typing import Annotated, Any, Dict, List, Optional, Union
+
+from pydantic import AfterValidator
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (RFC 9562 version 7).
+
+    The first 48 bits are the Unix time in milliseconds and the rest is
+    random, so keys generated close together land on the same index pages.
+    Not for secrets: use `uuid.uuid4()` for tokens and serial numbers.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | 0x7 << 76  # version
+    value = value & ~(0x3 << 62) | 0x2 << 62  # variant
+    return uuid.UUID(int=value)
 
 
 def generate_uuid() -> str:
-    """Generate a UUID string."""
-    return str(uuid.uuid4())
+    """Generate a time-ordered UUID string (used for primary keys)."""
+    return str(uuid7())
+
+
+def is_uuid(value: Any) -> bool:
+    """Whether a value is a UUID string (e.g. before looking up a key taken from a URL)."""
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def _canonical_uuid(value: str) -> str:
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise ValueError("must be a UUID")
+
+
+# Id sent by a client (request field or query parameter): anything but a UUID
+# is rejected with a 422 before it reaches a UUID column
+UUIDStr = Annotated[str, AfterValidator(_canonical_uuid)]
+
+
+def static_file_path(url: Any, static_url: str, static_root: str) -> Optional[str]:
+    """
+    Map a URL under `static_url` to its file in `static_root`.
+
+    Image URLs are client-supplied, so paths that resolve outside the root
+    (`/static/../..`, symlinks) are rejected.
+
+    Returns:
+        str: The file path, or None if the URL is not a static file under the root.
+    """
+    prefix = static_url + "/"
+    if not isinstance(url, str) or not url.startswith(prefix):
+        return None
+    root = os.path.realpath(static_root)
+    try:
+        path = os.path.realpath(os.path.join(root, url[len(prefix):]))
+    except ValueError:
+        return None
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+def generate_update_tag() -> str:
+    """Generate a pass update tag; tags sort lexicographically in time order."""
+    return f"{time.time_ns() // 1000:017d}"
+
+
+def update_tag_to_http_date(tag: Optional[str]) -> Optional[str]:
+    """Format a pass update tag as an HTTP date (for Last-Modified headers)."""
+    if not tag or not tag.isdigit():
+        return None
+    return formatdate(int(tag) / 1_000_000, usegmt=True)
 
 
 def pascal_to_snake(name: str) -> str:
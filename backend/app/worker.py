@@ -0,0 +1,71 @@
+"""
+Run background job workers separately from the API.
+
+    python -m app.worker                 # every queue in JOB_QUEUE_CONCURRENCY
+    python -m app.worker --queues bulk   # only some queues
+
+Requires JOB_BACKEND=redis; set JOB_WORKERS_IN_PROCESS=false on the API so
+jobs are only run here.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from typing import List, Optional
+
+from app.settings import settings
+from app.database import sessionmanager
+from app.services.jobs import Worker, get_job_backend
+from app.services.push import push_dispatcher
+from app.services.redis import close_redis
+
+# Modules that register job handlers
+import app.services.analytics  # noqa: F401
+import app.services.pass_issuance  # noqa: F401
+import app.services.quotas  # noqa: F401
+import app.services.tombstones  # noqa: F401
+
+
+logger = logging.getLogger("app.worker")
+
+
+async def run(queues: Optional[List[str]] = None) -> None:
+    concurrency = {
+        queue: count
+        for queue, count in settings.JOB_QUEUE_CONCURRENCY.items()
+        if not queues or queue in queues
+    }
+    worker = Worker(get_job_backend(), concurrency)
+    sessionmanager.init()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    worker.start()
+    logger.info("Worker started with queues %s", concurrency)
+    await stopping.wait()
+
+    # Finish running jobs; unfinished deliveries are claimed by other workers
+    logger.info("Worker stopping")
+    await worker.stop(timeout=settings.GRACEFUL_SHUTDOWN_SECONDS)
+    await push_dispatcher.stop()
+    await close_redis()
+    await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--queues", help="Comma-separated queues to consume (default: all)")
+    args = parser.parse_args()
+
+    if settings.JOB_BACKEND != "redis":
+        parser.error("a separate worker needs JOB_BACKEND=redis")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args.queues.split(",") if args.queues else None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import os
+
+# Settings the application requires; the tests below never reach these services
+for name, value in {
+    "SECRET_KEY": "test-secret-key",
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "wallet_pass_manager",
+    "REDIS_SERVER": "localhost",
+    "APPLE_PASS_TYPE_IDENTIFIER": "pass.com.example.test",
+    "APPLE_TEAM_IDENTIFIER": "TEAMID",
+    "APPLE_CERTIFICATE_PATH": "/dev/null",
+    "APPLE_PRIVATE_KEY_PATH": "/dev/null",
+    "APPLE_WWDR_CERTIFICATE_PATH": "/dev/null",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_request_metrics_use_full_route_templates():
+    client = TestClient(app)
+
+    # Unauthenticated, so the routes answer without touching the database
+    client.get("/api/v1/passes/")
+    client.get("/api/v1/passes/0190f000-0000-7000-8000-000000000000")
+
+    metrics = client.get("/metrics").text
+    assert 'route="/api/v1/passes/"' in metrics
+    assert 'route="/api/v1/passes/{pass_id}"' in metrics
+    assert 'route="/{pass_id}"' not in metrics